@@ -0,0 +1,77 @@
+"""
+Test-set inference: the notebook's per-image predict_image() loop vs.
+inference.Predictor, in images/second (CPU).
+
+Writes `--images` synthetic 1024x1024 grayscale PNGs and runs the notebook's
+model (InceptionV3 with weights=None, so it runs offline; the cost is the
+same with the ImageNet weights) over all of them with:
+
+    per-image   load_image() + model.predict() on a batch of one (original)
+    batched     Predictor.predict(): fixed-size batches through a tf.function,
+                decoding the next batch while the model runs
+
+Both must give the same confidences.
+
+Usage:
+    python benchmarks/batch_inference.py --images 256 --batch-size 32
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")
+
+import numpy as np
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+sys.path.insert(1, os.path.dirname(os.path.abspath(__file__)))
+
+from head_training import notebook_model
+from image_io import LOAD_WORKERS, load_image
+from image_loading import synthetic_xrays
+from inference import Predictor
+
+
+def per_image(model, paths, size):
+    # The notebook's evaluation loop before inference.py
+    confidences = []
+    for path in paths:
+        expanded = np.expand_dims(load_image(path, size), axis=0)
+        confidences.append(model.predict(expanded, verbose=0)[0][0])
+    return np.array(confidences)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=256)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--image-size", type=int, default=299)
+    parser.add_argument("--workers", type=int, default=LOAD_WORKERS)
+    args = parser.parse_args()
+    size = (args.image_size, args.image_size)
+
+    with tempfile.TemporaryDirectory() as folder:
+        paths = synthetic_xrays(folder, args.images, "png")
+        model = notebook_model(size)[0]
+        print(f"{args.images} x 1024x1024 png -> {args.image_size}x{args.image_size}, "
+              f"batch size {args.batch_size}, {args.workers} workers, {os.cpu_count()} CPUs")
+        print(f"{'':>10} {'images/s':>9} {'total s':>8}")
+
+        predictor = Predictor(model, args.batch_size, args.workers)
+        # Trace both graphs outside the timing
+        per_image(model, paths[:1], size)
+        predictor.confidences(paths[:1])
+
+        start = time.perf_counter()
+        expected = per_image(model, paths, size)
+        elapsed = time.perf_counter() - start
+        print(f"{'per-image':>10} {len(paths) / elapsed:>9.1f} {elapsed:>8.1f}")
+
+        start = time.perf_counter()
+        results = predictor.predict(paths)
+        elapsed = time.perf_counter() - start
+        print(f"{'batched':>10} {len(paths) / elapsed:>9.1f} {elapsed:>8.1f}")
+        print(f"\nmax |confidence difference|: {np.abs(results['confidence'].to_numpy() - expected).max():.2e}")
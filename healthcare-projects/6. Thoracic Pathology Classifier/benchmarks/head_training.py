@@ -0,0 +1,121 @@
+"""
+Phase-one (frozen backbone) training time: the full model on images vs. the
+head on cached backbone features (features.py), CPU only.
+
+Writes `--images` synthetic grayscale PNGs, builds the image cache and runs
+`--epochs` epochs of the notebook's first model.fit() with:
+
+    full model   augmentation + InceptionV3 + head on every image, every epoch (original)
+    features     build_features() once (plus `--views` augmented views per
+                 training image), then the head alone on the cached features
+
+InceptionV3 is built with weights=None so the benchmark runs offline; the
+forward pass costs the same with the ImageNet weights.
+
+Usage:
+    python benchmarks/head_training.py --images 128 --epochs 3 --views 2
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")
+
+import pandas as pd
+import tensorflow as tf
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+sys.path.insert(1, os.path.dirname(os.path.abspath(__file__)))
+
+from features import CachedFeatures, build_features, make_head
+from image_cache import ImageCache, build_cache
+from image_loading import synthetic_xrays
+from splits import make_split
+
+# Keras warns that fit() does not shuffle tf.data inputs; the datasets shuffle themselves
+warnings.filterwarnings("ignore", message="`shuffle=True` was passed")
+
+
+class EpochTimes(tf.keras.callbacks.Callback):
+    def on_train_begin(self, logs=None):
+        self.times = []
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self.start = time.perf_counter()
+
+    def on_epoch_end(self, epoch, logs=None):
+        self.times.append(time.perf_counter() - self.start)
+
+
+def notebook_model(image_size):
+    # Section 3 of the notebook
+    base_model = tf.keras.applications.InceptionV3(input_shape=image_size + (3,), include_top=False, weights=None)
+    base_model.trainable = False
+    data_augmentation = tf.keras.Sequential([
+        tf.keras.layers.RandomFlip("horizontal"),
+        tf.keras.layers.RandomRotation(0.2),
+        tf.keras.layers.RandomZoom(0.2),
+    ])
+    dropout = tf.keras.layers.Dropout(0.5)
+    classifier = tf.keras.layers.Dense(1, activation="sigmoid")
+    inputs = tf.keras.Input(shape=image_size + (3,))
+    x = data_augmentation(inputs)
+    x = tf.keras.applications.inception_v3.preprocess_input(x)
+    x = base_model(x, training=False)
+    x = tf.keras.layers.GlobalAveragePooling2D()(x)
+    outputs = classifier(dropout(x))
+    return tf.keras.Model(inputs, outputs), base_model, data_augmentation, [dropout, classifier]
+
+
+def fit(model, train, validation, epochs):
+    model.compile(optimizer=tf.keras.optimizers.Adam(), loss="binary_crossentropy", metrics=["accuracy"])
+    timer = EpochTimes()
+    model.fit(train, epochs=epochs, validation_data=validation, callbacks=[timer], verbose=0)
+    return timer.times
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=128)
+    parser.add_argument("--epochs", type=int, default=3)
+    parser.add_argument("--views", type=int, default=2)
+    parser.add_argument("--image-size", type=int, default=299)
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args()
+    image_size = (args.image_size, args.image_size)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        rootdir = os.path.join(tmp, "images") + "/"
+        os.makedirs(rootdir)
+        paths = synthetic_xrays(rootdir, args.images, "png", side=512)
+        half = args.images // 2
+        df = pd.DataFrame({"filename": [os.path.basename(path) for path in paths],
+                           "label": ["Cardiomegaly"] * half + ["No Finding"] * (args.images - half)})
+        split = make_split(df, "Cardiomegaly", rootdir=rootdir)
+        image_cache = ImageCache(build_cache(split, os.path.join(tmp, "cache"), image_size))
+        train = (split["split"] == "train").sum()
+        print(f"{train} training + {len(split) - train} validation images at {args.image_size}x{args.image_size}, "
+              f"{args.epochs} epochs, {os.cpu_count()} CPUs")
+
+        model, base_model, data_augmentation, head_layers = notebook_model(image_size)
+        full_times = fit(model, image_cache.dataset("train", args.batch_size),
+                         image_cache.dataset("test", args.batch_size), args.epochs)
+        print(f"{'':>12} {'once s':>7} {'epoch s':>8} {'total s':>8}")
+        print(f"{'full model':>12} {0:>7.1f} {sum(full_times) / len(full_times):>8.2f} {sum(full_times):>8.1f}")
+
+        start = time.perf_counter()
+        folder = build_features(base_model, image_cache, tf.keras.applications.inception_v3.preprocess_input,
+                                os.path.join(tmp, "features"), data_augmentation, args.views, args.batch_size)
+        once = time.perf_counter() - start
+        features = CachedFeatures(folder)
+        head = make_head(features.dimension, head_layers)
+        times = fit(head, features.dataset("train", args.batch_size),
+                    features.dataset("test", args.batch_size), args.epochs)
+        print(f"{'features':>12} {once:>7.1f} {sum(times) / len(times):>8.2f} {once + sum(times):>8.1f}")
+        full_epoch = sum(full_times) / len(full_times)
+        print(f"\nAt the notebook's 40 epochs: full model {40 * full_epoch:.0f}s, "
+              f"features {once + 40 * sum(times) / len(times):.0f}s")
@@ -0,0 +1,118 @@
+"""
+Image loading: the notebook's original load_image_into_numpy_array() vs.
+image_io.py, in images/second and peak RSS.
+
+Writes `--images` synthetic 1024x1024 grayscale X-ray-like files (PNG, as in
+the course's labels.csv images, or JPEG, as in the NIH download) to a temp
+folder, then loads every one at 299x299 with:
+
+    legacy      Image.open().resize() + np.array(image.getdata()) (original)
+    image_io    load_image(), one file at a time
+    batched     load_images() in batches of --batch-size on --workers threads
+
+Each method runs in its own process, so its peak RSS (VmHWM) is its own.
+PNG pixels must match the original exactly; JPEGs decoded at reduced scale
+(Image.draft) differ by a few gray levels.
+
+Usage:
+    python benchmarks/image_loading.py --images 300 --format png
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+import image_io
+
+METHODS = ("legacy", "image_io", "batched")
+
+
+def legacy_load(path, size):
+    # The notebook before image_io.py
+    image = Image.open(path).resize(size)
+    image = image.convert('RGB')
+    (im_width, im_height) = image.size
+    return np.array(image.getdata()).reshape((im_height, im_width, 3)).astype(np.uint8)
+
+
+def synthetic_xrays(folder, n, image_format, side=1024):
+    # Smooth anatomy-like shapes plus noise, so the files compress like real radiographs
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:side, 0:side] / side
+    paths = []
+    for i in range(n):
+        cx, cy = rng.uniform(0.35, 0.65, 2)
+        body = np.exp(-((x - cx) ** 2 + (y - cy) ** 2) / rng.uniform(0.05, 0.12))
+        pixels = np.clip(200 * body + rng.normal(0, 8, (side, side)), 0, 255).astype(np.uint8)
+        path = os.path.join(folder, f"{i:05d}.{'jpg' if image_format == 'jpeg' else 'png'}")
+        options = {"quality": 90} if image_format == "jpeg" else {}
+        Image.fromarray(pixels, "L").save(path, format=image_format.upper(), **options)
+        paths.append(path)
+    return paths
+
+
+def peak_rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+
+
+def child(method, folder, batch_size, workers):
+    paths = sorted(os.path.join(folder, name) for name in os.listdir(folder))
+    size = image_io.IMAGE_SIZE
+    before = peak_rss_mb()
+    checksum = 0
+    start = time.perf_counter()
+    if method == "legacy":
+        for path in paths:
+            checksum += int(legacy_load(path, size)[0, 0, 0])
+    elif method == "image_io":
+        for path in paths:
+            checksum += int(image_io.load_image(path, size)[0, 0, 0])
+    else:
+        for _, batch in image_io.iter_batches(paths, batch_size, size, workers):
+            checksum += int(batch[:, 0, 0, 0].sum())
+    elapsed = time.perf_counter() - start
+    peak = peak_rss_mb()
+    print(json.dumps({"images_per_s": len(paths) / elapsed, "peak_rss_mb": peak,
+                      "rss_increase_mb": peak - before, "checksum": checksum}))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=300)
+    parser.add_argument("--format", choices=("png", "jpeg"), default="png")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=image_io.LOAD_WORKERS)
+    parser.add_argument("--child", choices=METHODS, help=argparse.SUPPRESS)
+    parser.add_argument("--folder", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.folder, args.batch_size, args.workers)
+        sys.exit()
+
+    with tempfile.TemporaryDirectory() as folder:
+        synthetic_xrays(folder, args.images, args.format)
+        print(f"{args.images} x 1024x1024 {args.format} -> 299x299, {args.workers} workers")
+        print(f"{'':>10} {'images/s':>9} {'peak RSS MB':>12} {'RSS +MB':>8}")
+        checksums = set()
+        for method in METHODS:
+            command = [sys.executable, os.path.abspath(__file__), "--child", method, "--folder", folder,
+                       "--batch-size", str(args.batch_size), "--workers", str(args.workers)]
+            result = json.loads(subprocess.run(command, capture_output=True, text=True, check=True).stdout)
+            checksums.add(result["checksum"])
+            print(f"{method:>10} {result['images_per_s']:>9.1f} {result['peak_rss_mb']:>12.1f} "
+                  f"{result['rss_increase_mb']:>8.1f}")
+        if len(checksums) > 1 and args.format == "png":
+            print("warning: the methods decoded different pixels")
@@ -0,0 +1,86 @@
+"""
+Training input pipeline: images/second and CPU epoch time (no model, no GPU)
+for one pass over the training split.
+
+Writes `--images` synthetic 1024x1024 grayscale PNGs and a split manifest
+to a temp folder, then iterates the training split `--epochs` times with:
+
+    directory   image_dataset_from_directory() on the <train> folder (original)
+    manifest    splits.make_dataset(): tf.data decode + resize from the manifest
+    cache       ImageCache.dataset() on memory-mapped uint8 shards
+    cache RAM   the same with the shards loaded into memory
+
+The one-off build_cache() time is reported separately.
+
+Usage:
+    python benchmarks/input_pipeline.py --images 1000 --epochs 3
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")
+
+import pandas as pd
+import tensorflow as tf
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+sys.path.insert(1, os.path.dirname(os.path.abspath(__file__)))
+
+from image_cache import ImageCache, build_cache
+from image_loading import synthetic_xrays
+from splits import make_dataset, make_split, materialize
+
+IMAGE_SIZE = (299, 299)
+
+
+def epochs(dataset, n):
+    times, images = [], 0
+    for _ in range(n):
+        start = time.perf_counter()
+        for batch, _ in dataset:
+            images += int(batch.shape[0])
+        times.append(time.perf_counter() - start)
+    return images / sum(times), times
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=1000)
+    parser.add_argument("--epochs", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=64)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        rootdir = os.path.join(tmp, "images") + "/"
+        os.makedirs(rootdir)
+        paths = synthetic_xrays(rootdir, args.images, "png")
+        half = args.images // 2
+        df = pd.DataFrame({"filename": [os.path.basename(path) for path in paths],
+                           "label": ["Cardiomegaly"] * half + ["No Finding"] * (args.images - half)})
+        split = make_split(df, "Cardiomegaly", rootdir=rootdir)
+        materialize(split, os.path.join(tmp, "layout"))
+
+        print(f"{(split['split'] == 'train').sum()} training images, 1024x1024 png -> 299x299, "
+              f"{os.cpu_count()} CPUs")
+        print(f"{'':>10} {'images/s':>9} {'epoch s':>8}   per epoch")
+        datasets = {
+            "directory": lambda: tf.keras.utils.image_dataset_from_directory(
+                os.path.join(tmp, "layout", "train"), shuffle=True, batch_size=args.batch_size,
+                image_size=IMAGE_SIZE, verbose=False),
+            "manifest": lambda: make_dataset(split, "train", IMAGE_SIZE, args.batch_size),
+        }
+        start = time.perf_counter()
+        folder = build_cache(split, os.path.join(tmp, "cache"), IMAGE_SIZE)
+        build_seconds = time.perf_counter() - start
+        datasets["cache"] = lambda: ImageCache(folder).dataset("train", args.batch_size)
+        datasets["cache RAM"] = lambda: ImageCache(folder, in_memory=True).dataset("train", args.batch_size)
+
+        for name, make in datasets.items():
+            rate, times = epochs(make(), args.epochs)
+            print(f"{name:>10} {rate:>9.1f} {sum(times) / len(times):>8.2f}   "
+                  + " ".join(f"{seconds:.2f}" for seconds in times))
+        print(f"\nbuild_cache(): {build_seconds:.1f}s once for {len(split)} images (train + test)")
@@ -0,0 +1,87 @@
+"""
+Preparing a finding's train/test split: copying images (the notebook before
+splits.py) vs. a split manifest vs. a hard-linked folder layout.
+
+Writes a synthetic labels.csv and `--images` files of `--kb` KB to a temp
+folder, then prepares the split for each of `--findings` findings with:
+
+    copy        shutil.copy into <finding>/train|test/positive|negative (original)
+    manifest    make_split() + save_split(): one CSV per finding
+    hardlinks   make_split() + materialize(): the same layout, no data copied
+
+and reports the time and the bytes of image data written.
+
+Usage:
+    python benchmarks/split_prep.py --images 5000 --kb 200 --findings 3
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+from splits import NEGATIVE_LABEL, make_split, materialize, save_split, split_path
+
+FINDINGS = ["Cardiomegaly", "Effusion", "Infiltration", "Atelectasis", "Nodule", "Mass"]
+
+
+def copy_split(df, finding, rootdir, train_ratio=0.8):
+    # The notebook before splits.py
+    positives = df.loc[df["label"] == finding]
+    negatives = df.loc[df["label"] == NEGATIVE_LABEL]
+    n = len(positives)
+    train_n = int(n * train_ratio)
+    written = 0
+    for part, folder in ((positives[:train_n], "train/positive"), (positives[train_n:], "test/positive"),
+                         (negatives[:train_n], "train/negative"), (negatives[train_n:n], "test/negative")):
+        os.makedirs(rootdir + finding + "/" + folder, exist_ok=True)
+        for filename in part["filename"]:
+            shutil.copy(rootdir + filename, rootdir + finding + "/" + folder + "/" + filename)
+            written += os.path.getsize(rootdir + filename)
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=5000)
+    parser.add_argument("--kb", type=int, default=200, help="size of each image file")
+    parser.add_argument("--findings", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    findings = FINDINGS[:args.findings]
+    # Half "No Finding", the rest spread over the findings, as in CXR8
+    labels = rng.choice([NEGATIVE_LABEL] + findings, size=args.images,
+                        p=[0.5] + [0.5 / len(findings)] * len(findings))
+    df = pd.DataFrame({"filename": [f"{i:08d}_000.png" for i in range(args.images)], "label": labels})
+
+    with tempfile.TemporaryDirectory() as tmp:
+        rootdir = os.path.join(tmp, "images") + "/"
+        os.makedirs(rootdir)
+        payload = os.urandom(args.kb * 1024)
+        for filename in df["filename"]:
+            with open(rootdir + filename, "wb") as f:
+                f.write(payload)
+        print(f"{args.images} images x {args.kb} KB, {len(findings)} findings")
+        print(f"{'':>10} {'seconds':>9} {'MB written':>11}")
+
+        start = time.perf_counter()
+        written = sum(copy_split(df, finding, rootdir) for finding in findings)
+        print(f"{'copy':>10} {time.perf_counter() - start:>9.2f} {written / 2 ** 20:>11.1f}")
+
+        start = time.perf_counter()
+        for finding in findings:
+            save_split(make_split(df, finding, rootdir=rootdir), split_path(finding, os.path.join(tmp, "splits")))
+        print(f"{'manifest':>10} {time.perf_counter() - start:>9.2f} {0:>11.1f}")
+
+        start = time.perf_counter()
+        for finding in findings:
+            materialize(make_split(df, finding, rootdir=rootdir), os.path.join(tmp, "layout", finding))
+        print(f"{'hardlinks':>10} {time.perf_counter() - start:>9.2f} {0:>11.1f}")
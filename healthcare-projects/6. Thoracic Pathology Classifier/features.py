@@ -0,0 +1,172 @@
+"""
+Cached frozen-backbone features for the head-training phase.
+
+While base_model.trainable is False, every epoch of the first model.fit()
+ran the whole InceptionV3 forward pass on every image only to train
+GlobalAveragePooling + Dropout + Dense. Nothing before the Dropout changes
+during that phase, so build_features() runs the backbone (plus
+preprocess_input and the pooling) once per image and stores the pooled
+vectors, and the head trains on those:
+
+- features are float32 .npy memmaps (2048 floats per image for
+  InceptionV3) in a folder keyed by the backbone's name, a hash of its
+  weights, the image size, the number of augmented views and the image
+  cache they were computed from (see image_cache.py),
+- augmentation, which ran before the backbone on every step, becomes
+  `views` precomputed augmented copies of each training image; each epoch
+  picks one of the views (or the plain image) per example at random,
+- CachedFeatures.dataset() serves (features, labels) batches to tf.data,
+  and make_head() builds a model over the features from the same layer
+  objects as the full model, so the trained weights carry straight into
+  the fine-tuning phase.
+
+benchmarks/head_training.py compares phase-one epoch time with and without
+the cache.
+"""
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+
+FEATURE_VERSION = 1
+FEATURE_DIR = "feature_cache"
+
+
+def weights_digest(model):
+    digest = hashlib.sha1()
+    for weights in model.get_weights():
+        digest.update(np.ascontiguousarray(weights).tobytes())
+    return digest.hexdigest()[:12]
+
+
+def feature_key(backbone, image_cache, views):
+    width, height = image_cache.image_size
+    return (f"{backbone.name}-{weights_digest(backbone)}-{width}x{height}-{views}views-v{FEATURE_VERSION}-"
+            f"{os.path.basename(os.path.normpath(image_cache.folder))}")
+
+
+def make_extractor(backbone, preprocess):
+    """image (0-255) -> pooled backbone features, as in the full model with training=False."""
+    import tensorflow as tf
+
+    inputs = tf.keras.Input(shape=backbone.input_shape[1:])
+    x = preprocess(inputs)
+    x = backbone(x, training=False)
+    outputs = tf.keras.layers.GlobalAveragePooling2D()(x)
+    return tf.keras.Model(inputs, outputs)
+
+
+def build_features(backbone, image_cache, preprocess, cache_dir=FEATURE_DIR, augmentation=None, views=0,
+                   batch_size=64, seed=0):
+    """
+    Pooled features of every image in `image_cache`, plus `views` augmented
+    views of each training image (`augmentation` is applied with
+    training=True). Reuses the folder if it is already built; returns it.
+    """
+    import tensorflow as tf
+
+    if views and augmentation is None:
+        raise ValueError("augmented views need an augmentation model")
+    folder = os.path.join(cache_dir, feature_key(backbone, image_cache, views))
+    if os.path.exists(os.path.join(folder, "index.json")):
+        return folder
+    partial = folder + ".partial"
+    shutil.rmtree(partial, ignore_errors=True)
+    os.makedirs(partial)
+
+    extractor = make_extractor(backbone, preprocess)
+    dimension = extractor.output_shape[-1]
+
+    @tf.function(reduce_retracing=True)
+    def extract(images, augment):
+        images = tf.cast(tf.repeat(images[..., None], 3, axis=-1), tf.float32)
+        if augment:
+            images = augmentation(images, training=True)
+        return extractor(images, training=False)
+
+    def fill(name, rows, augment):
+        array = np.lib.format.open_memmap(os.path.join(partial, name), mode="w+", dtype=np.float32,
+                                          shape=(len(rows), dimension))
+        for start in range(0, len(rows), batch_size):
+            batch = image_cache.get(rows[start:start + batch_size])
+            array[start:start + len(batch)] = extract(batch, augment).numpy()
+        array.flush()
+
+    tf.random.set_seed(seed)
+    fill("features.npy", np.arange(len(image_cache)), False)
+    train_rows = np.flatnonzero(image_cache.manifest["split"].to_numpy() == "train")
+    for view in range(views):
+        fill(f"view-{view + 1:02d}.npy", train_rows, True)
+    np.save(os.path.join(partial, "train_rows.npy"), train_rows)
+    image_cache.manifest.to_csv(os.path.join(partial, "manifest.csv"), index=False)
+    with open(os.path.join(partial, "index.json"), "w") as f:
+        json.dump({"version": FEATURE_VERSION, "backbone": backbone.name, "dimension": int(dimension),
+                   "views": views, "image_cache": image_cache.folder}, f)
+    os.rename(partial, folder)
+    return folder
+
+
+class CachedFeatures:
+    def __init__(self, folder, in_memory=False):
+        import pandas as pd
+
+        with open(os.path.join(folder, "index.json")) as f:
+            self.index = json.load(f)
+        if self.index["version"] != FEATURE_VERSION:
+            raise ValueError(f"{folder} was built by feature version {self.index['version']}, "
+                             f"this code is version {FEATURE_VERSION}; run build_features() again")
+        self.folder = folder
+        self.dimension = self.index["dimension"]
+        self.manifest = pd.read_csv(os.path.join(folder, "manifest.csv"), dtype={"split": str, "label": str})
+        self.targets = self.manifest["target"].to_numpy("int32")
+        mode = None if in_memory else "r"
+        self.features = np.load(os.path.join(folder, "features.npy"), mmap_mode=mode)
+        self.views = [np.load(os.path.join(folder, f"view-{view + 1:02d}.npy"), mmap_mode=mode)
+                      for view in range(self.index["views"])]
+        train_rows = np.load(os.path.join(folder, "train_rows.npy"))
+        self._view_row = np.full(len(self.features), -1, dtype=np.int64)
+        self._view_row[train_rows] = np.arange(len(train_rows))
+
+    def gather(self, rows, views):
+        """Features of `rows`, each from its view (0 = the plain image)."""
+        features = self.features[rows]
+        for view in np.unique(views[views > 0]):
+            mask = views == view
+            features[mask] = self.views[view - 1][self._view_row[rows[mask]]]
+        return features
+
+    def dataset(self, name="train", batch_size=64, shuffle=None, seed=None):
+        """A tf.data.Dataset of (float32 features (batch, dimension), int32 labels) for one split."""
+        import tensorflow as tf
+
+        rows = np.flatnonzero(self.manifest["split"].to_numpy() == name)
+        shuffle = name == "train" if shuffle is None else shuffle
+        # Augmented views exist for training rows only
+        view_count = len(self.views) if name == "train" else 0
+        rng = np.random.default_rng(seed)
+
+        def load(batch_rows):
+            views = rng.integers(0, view_count + 1, len(batch_rows)) if view_count else np.zeros(len(batch_rows), int)
+            return self.gather(batch_rows, views), self.targets[batch_rows]
+
+        def to_tensors(batch_rows):
+            features, labels = tf.numpy_function(load, [batch_rows], (tf.float32, tf.int32))
+            return tf.ensure_shape(features, (None, self.dimension)), tf.ensure_shape(labels, (None,))
+
+        dataset = tf.data.Dataset.from_tensor_slices(rows)
+        if shuffle:
+            dataset = dataset.shuffle(len(rows), seed=seed, reshuffle_each_iteration=True)
+        return dataset.batch(batch_size).map(to_tensors).prefetch(tf.data.AUTOTUNE)
+
+
+def make_head(dimension, layers):
+    """A model over cached features that reuses the full model's head `layers` (after the pooling)."""
+    import tensorflow as tf
+
+    inputs = tf.keras.Input(shape=(dimension,))
+    x = inputs
+    for layer in layers:
+        x = layer(x)
+    return tf.keras.Model(inputs, x)
@@ -0,0 +1,136 @@
+"""
+Preprocessed image cache for repeated training runs.
+
+Both training phases (40 + 40 epochs) used to decode and resize every PNG
+from disk on every epoch. build_cache() does that once per split: every
+image is decoded, resized and stored as one grayscale uint8 channel in
+memory-mapped .npy shards (SHARD_SIZE images each), next to the split
+manifest and an index.json. ImageCache streams it back to tf.data:
+
+- the cache folder is keyed by image size, CACHE_VERSION (bump it when the
+  preprocessing changes) and a hash of the file list, so a finding's split
+  is preprocessed once and reused by every later run,
+- images stay uint8 and single-channel on disk, 1/12 of float32 RGB. The
+  model normalizes them itself (preprocess_input), so dataset() only
+  broadcasts to 3 channels and casts to float32 (0-255), batch by batch,
+- each epoch reshuffles the row indices; batches are gathered from the
+  shards (page cache, or RAM with in_memory=True) by parallel map calls and
+  prefetched with AUTOTUNE, so the input pipeline stays ahead of the model,
+- the cache is written to a temporary folder and renamed when complete, so
+  an interrupted build is never mistaken for a finished one.
+
+Images are resized by image_io (the same bicubic filter as inference in the
+notebook), not tf.image.resize. benchmarks/input_pipeline.py measures
+images/second and epoch time against decoding from disk.
+"""
+import hashlib
+import json
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from image_io import LOAD_WORKERS, load_gray
+
+CACHE_VERSION = 1
+CACHE_DIR = "image_cache"
+SHARD_SIZE = 2048
+
+
+def cache_key(filepaths, image_size, version=CACHE_VERSION):
+    digest = hashlib.sha1("\n".join(filepaths).encode("utf-8")).hexdigest()[:12]
+    return f"{image_size[0]}x{image_size[1]}-v{version}-{digest}"
+
+
+def build_cache(split, cache_dir=CACHE_DIR, image_size=(299, 299), shard_size=SHARD_SIZE, workers=LOAD_WORKERS):
+    """
+    Preprocess every image of a split manifest (see splits.py) into the cache,
+    unless it is already there. Returns the cache folder.
+    """
+    folder = os.path.join(cache_dir, cache_key(list(split["filepath"]), image_size))
+    if os.path.exists(os.path.join(folder, "index.json")):
+        return folder
+    partial = folder + ".partial"
+    shutil.rmtree(partial, ignore_errors=True)
+    os.makedirs(partial)
+
+    paths = list(split["filepath"])
+    width, height = image_size
+    shards = []
+    with ThreadPoolExecutor(max(1, workers)) as pool:
+        for start in range(0, len(paths), shard_size):
+            name = f"images-{len(shards):05d}.npy"
+            count = min(shard_size, len(paths) - start)
+            shard = np.lib.format.open_memmap(os.path.join(partial, name), mode="w+", dtype=np.uint8,
+                                              shape=(count, height, width))
+            # Decoded straight into the memory-mapped shard
+            list(pool.map(lambda i: load_gray(paths[start + i], image_size, shard[i]), range(count)))
+            shard.flush()
+            del shard
+            shards.append({"file": name, "rows": count})
+    split.reset_index(drop=True).to_csv(os.path.join(partial, "manifest.csv"), index=False)
+    with open(os.path.join(partial, "index.json"), "w") as f:
+        json.dump({"version": CACHE_VERSION, "image_size": list(image_size), "count": len(paths),
+                   "shards": shards}, f)
+    os.rename(partial, folder)
+    return folder
+
+
+class ImageCache:
+    def __init__(self, folder, in_memory=False):
+        with open(os.path.join(folder, "index.json")) as f:
+            self.index = json.load(f)
+        if self.index["version"] != CACHE_VERSION:
+            raise ValueError(f"{folder} was built by preprocessing version {self.index['version']}, "
+                             f"this code is version {CACHE_VERSION}; run build_cache() again")
+        self.folder = folder
+        self.image_size = tuple(self.index["image_size"])
+        self.manifest = pd.read_csv(os.path.join(folder, "manifest.csv"), dtype={"split": str, "label": str})
+        mode = None if in_memory else "r"
+        self.shards = [np.load(os.path.join(folder, shard["file"]), mmap_mode=mode) for shard in self.index["shards"]]
+        self.offsets = np.cumsum([0] + [shard["rows"] for shard in self.index["shards"]])
+        self.targets = self.manifest["target"].to_numpy("int32")
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    def get(self, rows):
+        """(n, H, W) uint8 images for manifest rows, in the order given."""
+        rows = np.asarray(rows, dtype=np.int64)
+        images = np.empty((len(rows),) + self.shards[0].shape[1:], dtype=np.uint8)
+        shard_of = np.searchsorted(self.offsets, rows, side="right") - 1
+        for shard in np.unique(shard_of):
+            mask = shard_of == shard
+            local = rows[mask] - self.offsets[shard]
+            # Sorted reads are sequential on disk
+            order = np.argsort(local)
+            images[np.flatnonzero(mask)[order]] = self.shards[shard][local[order]]
+        return images
+
+    def dataset(self, name="train", batch_size=64, shuffle=None, seed=None):
+        """
+        A tf.data.Dataset of (float32 images (batch, H, W, 3) in 0-255, int32
+        labels) for one split, like splits.make_dataset() but without decoding.
+        """
+        import tensorflow as tf
+
+        rows = np.flatnonzero(self.manifest["split"].to_numpy() == name)
+        width, height = self.image_size
+        shuffle = name == "train" if shuffle is None else shuffle
+
+        def gather(batch_rows):
+            return self.get(batch_rows), self.targets[batch_rows]
+
+        def load(batch_rows):
+            images, labels = tf.numpy_function(gather, [batch_rows], (tf.uint8, tf.int32))
+            images = tf.ensure_shape(images, (None, height, width))
+            labels = tf.ensure_shape(labels, (None,))
+            return tf.cast(tf.repeat(images[..., None], 3, axis=-1), tf.float32), labels
+
+        dataset = tf.data.Dataset.from_tensor_slices(rows)
+        if shuffle:
+            dataset = dataset.shuffle(len(rows), seed=seed, reshuffle_each_iteration=True)
+        dataset = dataset.batch(batch_size).map(load, num_parallel_calls=tf.data.AUTOTUNE, deterministic=not shuffle)
+        return dataset.prefetch(tf.data.AUTOTUNE)
@@ -0,0 +1,114 @@
+"""
+Fast chest X-ray loading for preview and inference.
+
+The notebook's original load_image_into_numpy_array() went through
+`np.array(image.getdata())`, which builds a Python tuple per pixel and an
+int64 array (8 bytes per channel) before casting back to uint8: about 270k
+tuples and 2 MB of int64 for every 299x299 image. Here:
+
+- PIL buffers become uint8 arrays directly through the array interface
+  (`np.asarray`), one memcpy and no per-pixel Python objects,
+- CXR8 images are grayscale: they are decoded and resized as one channel
+  and only broadcast to the 3 channels InceptionV3 expects as a read-only
+  view (np.broadcast_to), so the RGB copy is never made,
+- JPEGs are decoded at reduced scale when the target size allows it
+  (Image.draft), which skips most of the IDCT work for 1024px sources,
+- load_images() decodes and resizes a list of files on a thread pool into
+  one preallocated (N, H, W) batch; Pillow releases the GIL while decoding
+  and resizing, so threads scale with cores,
+- iter_batches() does the same one batch ahead of the consumer, so decoding
+  overlaps with whatever runs on the previous batch (e.g. the model).
+
+benchmarks/image_loading.py compares images/second and peak RSS with the
+original function.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+IMAGE_SIZE = (299, 299)  # (width, height) for InceptionV3
+LOAD_WORKERS = min(8, os.cpu_count() or 1)
+
+
+def to_rgb_view(gray):
+    """(..., H, W) uint8 -> (..., H, W, 3) read-only view of the same memory."""
+    return np.broadcast_to(gray[..., None], gray.shape + (3,))
+
+
+def load_image_into_numpy_array(image):
+    """
+    Drop-in replacement for the notebook helper: a PIL image -> (H, W, 3)
+    uint8. Grayscale images come back as a read-only 3-channel view; use
+    np.array(result) if you need to write to it.
+    """
+    if image.mode == "RGB":
+        return np.asarray(image)
+    if image.mode == "L":
+        return to_rgb_view(np.asarray(image))
+    return np.asarray(image.convert("RGB"))
+
+
+def _open(path, size):
+    image = Image.open(path)
+    if image.format == "JPEG":
+        # Decode at 1/2, 1/4 or 1/8 scale as long as the result is still >= size
+        image.draft("L", size)
+    if image.mode != "L":
+        # A few CXR8 files are RGBA; the X-ray itself is gray in every channel
+        image = image.convert("L")
+    if image.size != size:
+        # Same filter as the original helper's Image.resize(), so PNG pixels are identical
+        image = image.resize(size, Image.BICUBIC)
+    return image
+
+
+def load_gray(path, size=IMAGE_SIZE, out=None):
+    """One file -> (H, W) uint8, decoded and resized as a single channel (into `out` if given)."""
+    array = np.asarray(_open(path, size))
+    if out is None:
+        return array
+    out[...] = array
+    return out
+
+
+def load_image(path, size=IMAGE_SIZE):
+    """One file -> (H, W, 3) uint8 (a view over one grayscale channel)."""
+    return to_rgb_view(load_gray(path, size))
+
+
+def load_images(paths, size=IMAGE_SIZE, workers=LOAD_WORKERS, pool=None):
+    """
+    Files -> (N, H, W, 3) uint8 batch, decoded in parallel straight into one
+    (N, H, W) buffer and broadcast to 3 channels as a view.
+    """
+    paths = list(paths)
+    batch = np.empty((len(paths), size[1], size[0]), dtype=np.uint8)
+    if pool is not None:
+        list(pool.map(lambda i: load_gray(paths[i], size, batch[i]), range(len(paths))))
+    elif workers > 1 and len(paths) > 1:
+        with ThreadPoolExecutor(workers) as executor:
+            list(executor.map(lambda i: load_gray(paths[i], size, batch[i]), range(len(paths))))
+    else:
+        for i, path in enumerate(paths):
+            load_gray(path, size, batch[i])
+    return to_rgb_view(batch)
+
+
+def iter_batches(paths, batch_size=64, size=IMAGE_SIZE, workers=LOAD_WORKERS):
+    """
+    Yield (paths, (n, H, W, 3) uint8) batches in order, decoding the next
+    batch on the thread pool while the caller works on the current one.
+    """
+    paths = list(paths)
+    chunks = [paths[i:i + batch_size] for i in range(0, len(paths), batch_size)]
+    if not chunks:
+        return
+    with ThreadPoolExecutor(max(1, workers)) as pool, ThreadPoolExecutor(1) as prefetch:
+        pending = prefetch.submit(load_images, chunks[0], size, pool=pool)
+        for i, chunk in enumerate(chunks):
+            batch = pending.result()
+            if i + 1 < len(chunks):
+                pending = prefetch.submit(load_images, chunks[i + 1], size, pool=pool)
+            yield chunk, batch
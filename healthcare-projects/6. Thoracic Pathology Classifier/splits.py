@@ -0,0 +1,123 @@
+"""
+Train/test splits as manifests instead of copied folders.
+
+The notebook used to shutil.copy every positive and negative image into
+<finding>/train|test/positive|negative before training, and again for every
+new `finding`. A split is now a small CSV manifest: one row per image with
+its row in labels.csv, its path, its 0/1 target and its split. Training and
+evaluation read the images straight from the original folder, so switching
+findings writes one CSV and copies nothing:
+
+- make_split() picks the same images as the notebook did (the first
+  TRAIN_RATIO of the positives and as many negatives for training, the
+  rest of the positives and as many negatives for testing),
+- save_split() / load_split() keep the manifest (splits/<finding>.csv by
+  default), so a split is reproducible and can be shared,
+- make_dataset() turns one split into a tf.data pipeline (parallel decode
+  and resize, batch, prefetch) with the same float32 images and 0/1 labels
+  as image_dataset_from_directory() on the copied folders,
+- materialize() builds the old folder layout from hard links (symlinks
+  across file systems) for tools that need directories; it never copies.
+"""
+import os
+
+import pandas as pd
+
+TRAIN_RATIO = 0.8
+NEGATIVE_LABEL = "No Finding"
+SPLIT_DIR = "splits"
+CLASS_DIRS = {0: "negative", 1: "positive"}
+
+
+def make_split(labels, finding, train_ratio=TRAIN_RATIO, rootdir="", negative_label=NEGATIVE_LABEL):
+    """
+    labels.csv (a path or DataFrame with "filename" and "label") -> split
+    manifest with columns row, filename, filepath, label ("pos"/"neg"),
+    target (1/0) and split ("train"/"test").
+    """
+    df = pd.read_csv(labels) if isinstance(labels, str) else labels
+    positives = df.loc[df["label"] == finding]
+    negatives = df.loc[df["label"] == negative_label]
+    n = len(positives)
+    if n == 0:
+        raise ValueError(f"No studies labelled {finding!r} in labels.csv")
+    train_n = int(n * train_ratio)
+    parts = [
+        (positives[:train_n], "pos", "train"),
+        (positives[train_n:], "pos", "test"),
+        (negatives[:train_n], "neg", "train"),
+        (negatives[train_n:n], "neg", "test"),
+    ]
+    split = pd.concat([
+        pd.DataFrame({"row": part.index, "filename": part["filename"].values, "label": label, "split": name})
+        for part, label, name in parts
+    ], ignore_index=True)
+    split["filepath"] = rootdir + split["filename"]
+    split["target"] = (split["label"] == "pos").astype("int32")
+    return split[["row", "filename", "filepath", "label", "target", "split"]]
+
+
+def split_path(finding, split_dir=SPLIT_DIR):
+    return os.path.join(split_dir, f"{finding}.csv")
+
+
+def save_split(split, path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    split.to_csv(path, index=False)
+    return path
+
+
+def load_split(path, rootdir=None):
+    """A saved manifest; `rootdir` re-points the file paths (e.g. on another machine)."""
+    split = pd.read_csv(path, dtype={"filename": str, "filepath": str, "label": str, "split": str})
+    if rootdir is not None:
+        split["filepath"] = rootdir + split["filename"]
+    return split
+
+
+def make_dataset(split, name="train", image_size=(299, 299), batch_size=64, shuffle=None, seed=None):
+    """
+    A tf.data.Dataset of (float32 images (batch, H, W, 3) in 0-255, int32
+    labels) for one split, like image_dataset_from_directory(). Training
+    data is reshuffled every epoch unless shuffle=False.
+    """
+    import tensorflow as tf
+
+    rows = split.loc[split["split"] == name]
+    dataset = tf.data.Dataset.from_tensor_slices((rows["filepath"].tolist(), rows["target"].to_numpy("int32")))
+    if shuffle or (shuffle is None and name == "train"):
+        dataset = dataset.shuffle(len(rows), seed=seed, reshuffle_each_iteration=True)
+
+    def decode(path, label):
+        image = tf.io.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+        # Bilinear, like image_dataset_from_directory()
+        return tf.image.resize(image, image_size), label
+
+    dataset = dataset.map(decode, num_parallel_calls=tf.data.AUTOTUNE)
+    return dataset.batch(batch_size).prefetch(tf.data.AUTOTUNE)
+
+
+def materialize(split, target_dir, symlink=False):
+    """
+    Lay the split out as <target_dir>/<train|test>/<positive|negative>/<file>
+    with hard links (or symlinks), for tools that only read directories.
+    Returns the number of links created; existing links are kept.
+    """
+    created = 0
+    for row in split.itertuples():
+        folder = os.path.join(target_dir, row.split, CLASS_DIRS[row.target])
+        os.makedirs(folder, exist_ok=True)
+        destination = os.path.join(folder, row.filename)
+        if os.path.lexists(destination):
+            continue
+        source = os.path.abspath(row.filepath)
+        if symlink:
+            os.symlink(source, destination)
+        else:
+            try:
+                os.link(source, destination)
+            except OSError:
+                # Different file system (or no hard links): link by name instead
+                os.symlink(source, destination)
+        created += 1
+    return created
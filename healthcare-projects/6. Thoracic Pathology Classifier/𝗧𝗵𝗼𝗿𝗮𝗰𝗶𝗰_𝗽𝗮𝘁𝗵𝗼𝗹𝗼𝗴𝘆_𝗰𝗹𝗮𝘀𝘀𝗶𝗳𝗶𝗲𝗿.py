@@ -59,11 +59,9 @@ LEARNING_RATE = 0.0001
 repo_url = 'https://github.com/adleberg/medical-ai'
 IMAGE_HEIGHT, IMAGE_WIDTH = 299, 299
 
-def load_image_into_numpy_array(image):
-    image = image.convert('RGB')
-    (im_width, im_height) = image.size
-    return np.array(image.getdata()).reshape(
-        (im_height, im_width, 3)).astype(np.uint8)
+# Image files -> uint8 arrays without per-pixel Python objects; grayscale X-rays are decoded
+# once and viewed as 3 channels (image_io.py, next to this notebook)
+from image_io import load_image, load_images
 
 print("Welcome! Downloading some things... this will take a minute.")
 
@@ -115,53 +113,27 @@ train_labels = pd.concat([positives[:TRAIN_N], negatives[:TRAIN_N]])
 test_labels = pd.concat([positives[TRAIN_N:], negatives[TRAIN_N:n]])
 
 """## 2. Preparing the Data
-Now, we've figured out what we want our model to take a look at. Behind the scenes, we just need to sort the data into two folders: one with negative cases and one with positive cases.
+Now, we've figured out what we want our model to take a look at. Behind the scenes, we just need to record which images are positive and negative cases, and which ones we train and test on.
 """
 
+# The split is a manifest of labels.csv rows (splits.py, next to this notebook): the images
+# stay where they are, so trying another finding copies nothing
+from splits import make_split, save_split, split_path
+
 rootdir = "/content/medical-ai/images/"
-os.makedirs(rootdir+finding+"/test/positive",  exist_ok=True)
-os.makedirs(rootdir+finding+"/test/negative",  exist_ok=True)
-os.makedirs(rootdir+finding+"/train/positive", exist_ok=True)
-os.makedirs(rootdir+finding+"/train/negative", exist_ok=True)
-
-# copy images to new directories for training purposes
-for idx, image in positives[:TRAIN_N].iterrows():
-  source = rootdir+image["filename"]
-  dst = rootdir+finding+"/train/positive/"+image["filename"]
-  shutil.copy(source, dst)
-
-for idx, image in positives[TRAIN_N:].iterrows():
-  source = rootdir+image["filename"]
-  dst = rootdir+finding+"/test/positive/"+image["filename"]
-  shutil.copy(source, dst)
-
-for idx, image in negatives[:TRAIN_N].iterrows():
-  source = rootdir+image["filename"]
-  dst = rootdir+finding+"/train/negative/"+image["filename"]
-  shutil.copy(source, dst)
-
-for idx, image in negatives[TRAIN_N:n].iterrows():
-  source = rootdir+image["filename"]
-  dst = rootdir+finding+"/test/negative/"+image["filename"]
-  shutil.copy(source, dst)
-
-print("Done moving "+str(n*2)+" images to positive and negative folders.")
+split = make_split(df, finding, TRAIN_RATIO, rootdir=rootdir)
+save_split(split, split_path(finding, "/content/splits"))
+
+print("Split "+str(len(split))+" images into train and test: "+split_path(finding, "/content/splits"))
 
 from PIL import Image, ImageDraw, ImageFont
 
 # load images into memory for visualization
-positive_imgs, negative_imgs = [], []
 IMAGE_HEIGHT, IMAGE_WIDTH = 299, 299
 
-for idx, row in positives[:6].iterrows():
-  image_path = rootdir+row["filename"]
-  image = Image.open(image_path).resize((IMAGE_WIDTH, IMAGE_HEIGHT))
-  positive_imgs.append(load_image_into_numpy_array(image))
-
-for idx, row in negatives[:6].iterrows():
-  image_path = rootdir+row["filename"]
-  image = Image.open(image_path).resize((IMAGE_WIDTH, IMAGE_HEIGHT))
-  negative_imgs.append(load_image_into_numpy_array(image))
+# decoded and resized in parallel, one batch per class
+positive_imgs = list(load_images(rootdir+positives[:6]["filename"], (IMAGE_WIDTH, IMAGE_HEIGHT)))
+negative_imgs = list(load_images(rootdir+negatives[:6]["filename"], (IMAGE_WIDTH, IMAGE_HEIGHT)))
 
 for idx, img in enumerate(positive_imgs[:6]):
   plt.subplot(2, 3, idx+1)
@@ -197,21 +169,16 @@ x = tf.keras.layers.Dense(1, activation='sigmoid')(x)
 model = Model(pre_trained_model.input, x)
 model.compile(loss='binary_crossentropy', optimizer='adam', metrics=['acc'])
 
-# Define our example directories and files
-base_dir = rootdir = "/content/medical-ai/images/"
-train_dir = os.path.join(base_dir, finding, 'train')
-test_dir = os.path.join(base_dir, finding, 'test')
-
-train_pos_dir = os.path.join(train_dir, 'positive')
-train_neg_dir = os.path.join(train_dir, 'negative')
-test_pos_dir = os.path.join(test_dir, 'positive')
-test_neg_dir = os.path.join(test_dir, 'negative')
-
 BATCH_SIZE = 64
 IMG_SIZE = (299, 299)
 IMG_SHAPE = IMG_SIZE + (3,)
-train_dataset = tf.keras.utils.image_dataset_from_directory(train_dir, shuffle=True, batch_size=BATCH_SIZE, image_size=IMG_SIZE)
-validation_dataset = tf.keras.utils.image_dataset_from_directory(test_dir, shuffle=True, batch_size=BATCH_SIZE, image_size=IMG_SIZE)
+# Every image is decoded and resized once into a uint8 cache on disk (image_cache.py); all
+# epochs of both training phases stream from it instead of decoding the PNGs again.
+# (splits.make_dataset(split, "train", ...) decodes from disk on every epoch instead.)
+from image_cache import ImageCache, build_cache
+image_cache = ImageCache(build_cache(split, "/content/image_cache", IMG_SIZE))
+train_dataset = image_cache.dataset("train", batch_size=BATCH_SIZE)
+validation_dataset = image_cache.dataset("test", batch_size=BATCH_SIZE)
 
 """## 3.1 Define the Base Model
 We use the InceptionV3 model pre-trained on the ImageNet dataset as our base model.
@@ -244,8 +211,14 @@ x = data_augmentation(inputs) # Apply data augmentation
 x = tf.keras.applications.inception_v3.preprocess_input(x)
 x = base_model(x, training=False)
 x = tf.keras.layers.GlobalAveragePooling2D()(x)
-x = tf.keras.layers.Dropout(0.5)(x)
-outputs = tf.keras.layers.Dense(1, activation='sigmoid')(x)
+# The head: the only layers trained while the base model is frozen (section 4)
+head_layers = [
+  tf.keras.layers.Dropout(0.5),
+  tf.keras.layers.Dense(1, activation='sigmoid'),
+]
+for layer in head_layers:
+  x = layer(x)
+outputs = x
 
 # Define the complete model
 model = tf.keras.Model(inputs, outputs)
@@ -275,11 +248,26 @@ Finally, let's train the model using the features we extracted. We'll train on a
 # Set the number of epochs for initial training
 initial_epochs = 40
 
-# Train the model with early stopping
-history = model.fit(
-    train_dataset,
+# While the base model is frozen only the head learns, so run the base model once per image
+# (plus AUGMENTED_VIEWS augmented copies of each training image) and train the head on the
+# cached features (features.py). The head shares its layers with `model`.
+from features import CachedFeatures, build_features, make_head
+AUGMENTED_VIEWS = 4
+features = CachedFeatures(build_features(
+    base_model, image_cache, tf.keras.applications.inception_v3.preprocess_input, "/content/feature_cache",
+    augmentation=data_augmentation, views=AUGMENTED_VIEWS, batch_size=BATCH_SIZE))
+head = make_head(features.dimension, head_layers)
+head.compile(
+    optimizer=tf.keras.optimizers.Adam(),
+    loss='binary_crossentropy',
+    metrics=['accuracy']
+)
+
+# Train the head with early stopping
+history = head.fit(
+    features.dataset("train", batch_size=BATCH_SIZE),
     epochs=initial_epochs,
-    validation_data=validation_dataset,
+    validation_data=features.dataset("test", batch_size=BATCH_SIZE),
     callbacks=[early_stopping]
 )
 
@@ -359,15 +347,13 @@ In this section we will investigate how it works on different parts.
 """
 
 def predict_image(filename):
-  image = Image.open(filename).resize((IMAGE_HEIGHT, IMAGE_WIDTH))
-  image_np = load_image_into_numpy_array(image)
+  image_np = load_image(filename, (IMAGE_WIDTH, IMAGE_HEIGHT))
   expanded = np.expand_dims(image_np, axis=0)
   return model.predict(expanded)[0][0]
 
 def show_df_row(row):
   image_path = row["filepath"]
-  image = Image.open(image_path).resize((IMAGE_WIDTH, IMAGE_HEIGHT))
-  img = load_image_into_numpy_array(image)
+  img = load_image(image_path, (IMAGE_WIDTH, IMAGE_HEIGHT))
   expanded = np.expand_dims(img, axis=0)
   pred = model.predict(expanded)[0][0]
   guess = "neg"
@@ -379,21 +365,13 @@ def show_df_row(row):
   plt.show()
   return
 
-results = []
-for image in os.listdir(test_neg_dir):
-  filename = test_neg_dir+"/"+image
-  confidence = predict_image(filename)
-  guess = 'pos' if confidence > 0.5 else 'neg'
-  results.append([filename, image, "neg", guess, confidence])
-
-for image in os.listdir(test_pos_dir):
-  filename = test_pos_dir+"/"+image
-  confidence = predict_image(filename)
-  guess = 'pos' if confidence > 0.5 else 'neg'
-  results.append([filename, image, "pos", guess, confidence])
-
-sorted_results = sorted(results, key=lambda x: x[4], reverse=True)
-df = pd.DataFrame(data=sorted_results, columns=["filepath","filename","label","guess","confidence"])
+# The whole test split in fixed-size batches, decoding the next batch while the model runs on
+# the current one (inference.py), instead of one model.predict() per image
+from inference import Predictor
+predictor = Predictor(model, batch_size=BATCH_SIZE)
+df = predictor.predict(split.loc[split["split"] == "test"])
+df = df.sort_values("confidence", ascending=False, ignore_index=True)
+sorted_results = df.values.tolist()
 
 print("Done inference!")
 
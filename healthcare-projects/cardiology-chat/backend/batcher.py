@@ -0,0 +1,68 @@
+"""
+Micro-batching of query embeddings.
+
+Under concurrent load every /chat call used to make its own single-text
+embed_query request. EmbeddingBatcher collects the questions that arrive
+within EMBED_BATCH_WAIT_MS of the first one (or until EMBED_BATCH_MAX have
+queued), embeds them with one batched call, and hands each waiting request
+its own vector. Identical questions in a batch are embedded once.
+
+Fewer upstream calls means less time queued behind the provider's
+concurrency and rate limits, which is what drives p99 up at high QPS; the
+price is at most max_wait of extra latency for the first request of a batch.
+"""
+import asyncio
+import os
+
+EMBED_BATCH_WAIT_MS = float(os.getenv("EMBED_BATCH_WAIT_MS", "10"))
+EMBED_BATCH_MAX = int(os.getenv("EMBED_BATCH_MAX", "32"))
+
+
+class EmbeddingBatcher:
+    def __init__(self, embed_fn, max_wait=EMBED_BATCH_WAIT_MS / 1000, max_batch=EMBED_BATCH_MAX):
+        """embed_fn(texts) -> vectors; blocking, it runs in a worker thread."""
+        self.embed_fn = embed_fn
+        self.max_wait = max_wait
+        self.max_batch = max_batch
+        self._pending = []  # (text, future)
+        self._timer = None
+        self._tasks = set()
+        self.stats = {"requests": 0, "calls": 0, "largest_batch": 0}
+
+    async def embed(self, text):
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((text, future))
+        self.stats["requests"] += 1
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            # Keep a reference, or the task can be garbage collected mid-flight.
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch):
+        texts = list(dict.fromkeys(text for text, _ in batch))
+        self.stats["calls"] += 1
+        self.stats["largest_batch"] = max(self.stats["largest_batch"], len(texts))
+        try:
+            vectors = await asyncio.to_thread(self.embed_fn, texts)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        by_text = dict(zip(texts, vectors))
+        for text, future in batch:
+            # A request whose client went away has already been cancelled.
+            if not future.done():
+                future.set_result(by_text[text])
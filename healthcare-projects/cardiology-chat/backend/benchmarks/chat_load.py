@@ -0,0 +1,90 @@
+"""
+Load test for /chat against local stub backends.
+
+Fires `--requests` questions at the app with an increasing number of
+concurrent clients and reports throughput and latency, plus how long the
+`/` health check takes while the chat load is running. With the blocking
+pipeline every level served ~1 request at a time; now throughput should
+scale with clients up to MAX_CONCURRENT_CHATS.
+
+Usage (from the backend folder):
+    python benchmarks/chat_load.py --requests 64 --levels 1 2 4 8 16 32
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import stubs
+
+stubs.install()
+
+import httpx
+import main
+
+# Measure the uncached pipeline: with the answer cache on, every repeated question
+# would skip embedding and generation after its first request
+main.embedding_cache.max_entries = 0
+main.semantic_cache.max_entries = 0
+
+QUESTIONS = [
+    "How long do heart attacks last?",
+    "What are the symptoms of heart failure?",
+    "What causes atrial fibrillation?",
+    "How is high blood pressure treated?",
+]
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+async def run_level(client, concurrency, total):
+    latencies = []
+    health = []
+    pending = iter(range(total))
+
+    async def worker():
+        for i in pending:
+            start = time.perf_counter()
+            response = await client.post("/chat", json={"question": QUESTIONS[i % len(QUESTIONS)]})
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+    async def probe():
+        while len(latencies) < total:
+            start = time.perf_counter()
+            await client.get("/")
+            health.append(time.perf_counter() - start)
+            await asyncio.sleep(0.05)
+
+    start = time.perf_counter()
+    probe_task = asyncio.create_task(probe())
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    await probe_task
+    return total / elapsed, latencies, health
+
+
+async def main_async(args):
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        print(f"{'clients':>8} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'health p99 ms':>14}")
+        for concurrency in args.levels:
+            throughput, latencies, health = await run_level(client, concurrency, args.requests)
+            print(f"{concurrency:>8} {throughput:>8.1f} {percentile(latencies, 50) * 1000:>8.0f} "
+                  f"{percentile(latencies, 99) * 1000:>8.0f} {percentile(health, 99) * 1000:>14.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--generate-latency", type=float, default=stubs.latency["generate"])
+    args = parser.parse_args()
+    stubs.latency["generate"] = args.generate_latency
+    asyncio.run(main_async(args))
@@ -0,0 +1,90 @@
+"""
+Retrieval quality and prompt size: whole-file document vs. section chunks.
+
+Embeds the knowledge base both ways with a local bag-of-words embedder
+(stubs.fake_vector, so no API calls), runs a set of questions with a known
+answer section, and reports for top_k=3:
+
+    hit@1 / hit@3   the expected section is the first / among the retrieved chunks
+    relevant share  fraction of the context characters that come from that section
+    context tokens  mean size of the "Medical Context" block sent to Gemini
+
+Usage (from the backend folder):
+    python benchmarks/chunking_quality.py --chunk-size 1000 --chunk-overlap 150
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chunking import chunk_document
+from prompt import count_tokens
+from stubs import fake_vector
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "medical_data.txt")
+
+# (question, expected section number)
+QUESTIONS = [
+    ("What are the symptoms of heart failure?", "1"),
+    ("Why does fluid build up in the legs with congestive heart failure?", "1"),
+    ("What is coronary artery disease and what causes plaque?", "2"),
+    ("What are the risk factors for CAD?", "2"),
+    ("What is atrial fibrillation?", "3"),
+    ("How is a slow heartbeat like bradycardia treated?", "3"),
+    ("What blood pressure reading counts as elevated?", "4"),
+    ("What is a normal blood pressure?", "4"),
+    ("What are the warning signs of a heart attack?", "5"),
+    ("What is a myocardial infarction?", "5"),
+    ("How does angioplasty and stenting work?", "6"),
+    ("What happens during a pacemaker procedure?", "6"),
+]
+
+def relevant_chars(text, section):
+    # Characters of `text` that belong to `section` (whole-file chunks span many).
+    total, current = 0, None
+    for line in text.splitlines(keepends=True):
+        if line.startswith("## "):
+            current = line[3:].split(".", 1)[0]
+        if current == section:
+            total += len(line)
+    return total
+
+
+def evaluate(name, chunks, top_k):
+    vectors = [fake_vector(chunk["text"]) for chunk in chunks]
+    hit1 = hit3 = 0
+    shares, tokens = [], []
+    for question, section in QUESTIONS:
+        query = fake_vector(question)
+        scores = [sum(a * b for a, b in zip(query, vector)) for vector in vectors]
+        ranked = sorted(range(len(chunks)), key=lambda i: scores[i], reverse=True)[:top_k]
+        retrieved = [chunks[i]["text"] for i in ranked]
+        context = "\n\n".join(retrieved)
+
+        hit1 += relevant_chars(retrieved[0], section) > 0
+        hit3 += any(relevant_chars(text, section) > 0 for text in retrieved)
+        shares.append(relevant_chars(context, section) / len(context))
+        tokens.append(count_tokens(context))
+
+    n = len(QUESTIONS)
+    print(f"{name:>12} {len(chunks):>7} {hit1 / n:>6.2f} {hit3 / n:>6.2f} "
+          f"{sum(shares) / n:>15.2f} {sum(tokens) / n:>15.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=150)
+    parser.add_argument("--top-k", type=int, default=3)
+    args = parser.parse_args()
+
+    with open(DATA_PATH, encoding="utf-8") as f:
+        text = f.read()
+    whole = [{"id": "0", "text": text}]
+    chunked = chunk_document(text, source="data/medical_data.txt",
+                             chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap)
+
+    print(f"{'':>12} {'chunks':>7} {'hit@1':>6} {'hit@3':>6} {'relevant share':>15} {'context tokens':>15}")
+    evaluate("whole file", whole, args.top_k)
+    evaluate("chunked", chunked, args.top_k)
@@ -0,0 +1,90 @@
+"""
+Query embedding: one call per request vs. micro-batched (EmbeddingBatcher).
+
+Questions arrive open-loop (Poisson) at each `--qps` level for `--seconds`.
+The stub provider answers a call after `--latency` plus `--per-text` per
+text, and serves at most `--provider-concurrency` calls at once; the rest
+queue, as they do behind a real API's concurrency and rate limits. Reports
+upstream calls and end-to-end p50 / p99 per mode.
+
+Usage (from the backend folder):
+    python benchmarks/embed_batching.py --qps 50 200 400 --wait-ms 10 --max-batch 32
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batcher import EmbeddingBatcher
+from stubs import fake_vector
+
+
+class Provider:
+    def __init__(self, latency, per_text, concurrency):
+        self.latency = latency
+        self.per_text = per_text
+        self.slots = threading.Semaphore(concurrency)
+        self.calls = 0
+
+    def embed_documents(self, texts, **kwargs):
+        with self.slots:
+            self.calls += 1
+            time.sleep(self.latency + self.per_text * len(texts))
+            return [fake_vector(text) for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+async def load(embed, qps, seconds):
+    latencies = []
+
+    async def one(i):
+        start = time.perf_counter()
+        await embed(f"question number {i} about heart failure")
+        latencies.append(time.perf_counter() - start)
+
+    tasks = []
+    deadline = time.perf_counter() + seconds
+    i = 0
+    while time.perf_counter() < deadline:
+        tasks.append(asyncio.create_task(one(i)))
+        i += 1
+        await asyncio.sleep(random.expovariate(qps))
+    await asyncio.gather(*tasks)
+    return np.percentile(latencies, 50) * 1000, np.percentile(latencies, 99) * 1000, len(latencies)
+
+
+async def main(args):
+    # Enough threads that the provider's own limit, not ours, is the bottleneck.
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(256))
+    print(f"{'qps':>6} {'mode':>9} {'requests':>9} {'calls':>6} {'p50 ms':>8} {'p99 ms':>8}")
+    for qps in args.qps:
+        provider = Provider(args.latency, args.per_text, args.provider_concurrency)
+        p50, p99, n = await load(lambda text: asyncio.to_thread(provider.embed_query, text), qps, args.seconds)
+        print(f"{qps:>6} {'single':>9} {n:>9} {provider.calls:>6} {p50:>8.0f} {p99:>8.0f}")
+
+        provider = Provider(args.latency, args.per_text, args.provider_concurrency)
+        batcher = EmbeddingBatcher(provider.embed_documents, max_wait=args.wait_ms / 1000, max_batch=args.max_batch)
+        p50, p99, n = await load(batcher.embed, qps, args.seconds)
+        print(f"{qps:>6} {'batched':>9} {n:>9} {provider.calls:>6} {p50:>8.0f} {p99:>8.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--qps", type=float, nargs="+", default=[50, 200, 400])
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per provider call")
+    parser.add_argument("--per-text", type=float, default=0.0005, help="extra seconds per text in a call")
+    parser.add_argument("--provider-concurrency", type=int, default=8)
+    parser.add_argument("--wait-ms", type=float, default=10)
+    parser.add_argument("--max-batch", type=int, default=32)
+    asyncio.run(main(parser.parse_args()))
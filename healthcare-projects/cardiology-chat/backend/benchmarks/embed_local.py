@@ -0,0 +1,80 @@
+"""
+Local MiniLM embeddings: sentences/second and sentences/second per core, for
+each runtime and worker layout.
+
+Encodes `--sentences` sentences from the knowledge base with LocalEmbeddings
+for every `--runtimes` x `--workers` combination (after a warm-up batch) and
+reports throughput, throughput per core used, single-query p50 latency and
+the mean cosine similarity to the float32 torch vectors (1.0 = identical).
+
+workers 0 is one in-process model on `--threads` torch threads (0 = all
+cores); workers N > 1 is N processes with one thread each.
+
+Needs sentence-transformers (plus optimum[onnxruntime] for onnx) and the
+model in model_cache/ (`EMBEDDING_BACKEND=local python download_model.py`).
+
+Usage (from the backend folder):
+    python benchmarks/embed_local.py --runtimes torch int8 onnx --workers 0 2 4
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from local_embeddings import LocalEmbeddings
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "medical_data.txt")
+
+
+def load_sentences(n):
+    with open(DATA_PATH, encoding="utf-8") as f:
+        parts = [s.strip() for s in re.split(r"(?<=[.!?])\s+|\n+", f.read()) if len(s.strip()) > 20]
+    return [parts[i % len(parts)] for i in range(n)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sentences", type=int, default=2000)
+    parser.add_argument("--runtimes", nargs="+", default=["torch", "int8", "onnx"])
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 2, 4])
+    parser.add_argument("--threads", type=int, default=0, help="torch threads for workers=0 (0 = all cores)")
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    texts = load_sentences(args.sentences)
+    try:
+        reference = np.asarray(LocalEmbeddings("torch", workers=0).embed_documents(texts[:256]))
+    except (ImportError, RuntimeError) as e:
+        sys.exit(f"Cannot load the local model: {e}")
+    import torch
+
+    print(f"{len(texts)} sentences, {os.cpu_count()} CPUs")
+    print(f"{'runtime':>8} {'workers':>8} {'cores':>6} {'sent/s':>8} {'sent/s/core':>12} {'query p50 ms':>13} {'cosine':>7}")
+    for runtime in args.runtimes:
+        for workers in args.workers:
+            try:
+                embeddings = LocalEmbeddings(runtime, args.batch_size, workers, args.threads)
+                embeddings.embed_documents(texts[:args.batch_size * max(workers, 1)])
+            except (ImportError, RuntimeError, ValueError) as e:
+                print(f"{runtime:>8} {workers:>8}  skipped: {e}")
+                continue
+            cores = workers if workers > 1 else (args.threads or torch.get_num_threads())
+
+            start = time.perf_counter()
+            vectors = embeddings.embed_documents(texts)
+            rate = len(texts) / (time.perf_counter() - start)
+
+            latencies = []
+            for text in texts[:20]:
+                start = time.perf_counter()
+                embeddings.embed_query(text)
+                latencies.append(time.perf_counter() - start)
+            cosine = float(np.mean(np.sum(np.asarray(vectors[:256]) * reference, axis=1)))
+            embeddings.close()
+            print(f"{runtime:>8} {workers:>8} {cores:>6} {rate:>8.0f} {rate / cores:>12.0f} "
+                  f"{np.percentile(latencies, 50) * 1000:>13.1f} {cosine:>7.4f}")
@@ -0,0 +1,102 @@
+"""
+Hybrid retrieval: BM25 latency, and hit@3 of dense vs. BM25 vs. fused results.
+
+Indexes the knowledge base chunks (plus `--filler` synthetic report pages, to
+see how the lexical side scales) in a LexicalIndex and a LocalIndex, then
+runs questions built around exact clinical terms with a known answer
+section. Dense vectors come from the offline stub embedder
+(stubs.fake_vector), so the hit rates are a sanity check of the fusion, not a
+measurement of Gemini embeddings; the BM25 latency is real.
+
+Usage (from the backend folder):
+    python benchmarks/hybrid_search.py --filler 5000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chunking import chunk_document
+from lexical import LexicalIndex, reciprocal_rank_fusion
+from stubs import fake_vector
+from vectorstore import LocalIndex
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "medical_data.txt")
+
+# (question, answer sections)
+QUESTIONS = [
+    ("When is CRT used?", {"1"}),
+    ("What does dyspnea mean?", {"1"}),
+    ("Who gets ICDs?", {"1", "3"}),
+    ("What is CABG?", {"2", "6"}),
+    ("Are statins prescribed for it?", {"2"}),
+    ("Is ranolazine a heart medicine?", {"2"}),
+    ("What does an echocardiogram show?", {"6"}),
+    ("Do thrombolytics help?", {"5"}),
+    ("What is catheter ablation?", {"3"}),
+    ("Are thiazide diuretics used?", {"4"}),
+    ("aldosterone antagonists", {"1"}),
+    ("ARBs", {"4"}),
+]
+
+FILLER_WORDS = ("patient presented with chest pain troponin negative ecg sinus rhythm follow up clinic "
+                "discharge summary medication reconciliation blood pressure heart rate stable").split()
+
+
+def filler_pages(n, rng):
+    for i in range(n):
+        text = " ".join(rng.choice(FILLER_WORDS, size=300))
+        yield {"id": f"filler-{i}", "text": text, "metadata": {"text": text, "source": "filler.pdf", "section": ""}}
+
+
+def hit_rate(rankings, expected):
+    return np.mean([bool({m["metadata"]["section"].split(".", 1)[0].lstrip("# ") for m in ranking[:3]} & sections)
+                    for ranking, sections in zip(rankings, expected)])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filler", type=int, default=5000, help="synthetic report pages added to the corpus")
+    parser.add_argument("--candidates", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=50, help="timed passes over the questions")
+    args = parser.parse_args()
+
+    with open(DATA_PATH, encoding="utf-8") as f:
+        chunks = chunk_document(f.read(), source="medical_data.txt")
+    chunks += list(filler_pages(args.filler, np.random.default_rng(0)))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        lexical = LexicalIndex(os.path.join(tmp, "lexical.db"))
+        dense = LocalIndex(os.path.join(tmp, "vectors"))
+        start = time.perf_counter()
+        for i in range(0, len(chunks), 500):
+            lexical.add(chunks[i:i + 500])
+        print(f"{len(chunks)} chunks, BM25 index built in {time.perf_counter() - start:.2f}s")
+        for i in range(0, len(chunks), 500):
+            dense.upsert([(c["id"], fake_vector(c["text"]), c["metadata"]) for c in chunks[i:i + 500]])
+
+        times = []
+        for _ in range(args.repeat):
+            for question, _ in QUESTIONS:
+                start = time.perf_counter()
+                lexical.search(question, args.candidates)
+                times.append(time.perf_counter() - start)
+        print(f"BM25 search: p50 {np.percentile(times, 50) * 1e6:.0f} us, p99 {np.percentile(times, 99) * 1e6:.0f} us")
+
+        dense_rankings, keyword_rankings, fused_rankings = [], [], []
+        for question, _ in QUESTIONS:
+            dense_matches = dense.query(fake_vector(question), top_k=args.candidates, include_metadata=True)["matches"]
+            keyword_matches = lexical.search(question, args.candidates)
+            dense_rankings.append(dense_matches)
+            keyword_rankings.append(keyword_matches)
+            fused_rankings.append(reciprocal_rank_fusion([dense_matches, keyword_matches], top_k=3))
+
+    expected = [sections for _, sections in QUESTIONS]
+    print(f"hit@3  dense {hit_rate(dense_rankings, expected):.2f}  "
+          f"bm25 {hit_rate(keyword_rankings, expected):.2f}  "
+          f"hybrid {hit_rate(fused_rankings, expected):.2f}")
@@ -0,0 +1,92 @@
+"""
+Sequential vs. pipelined ingestion against the stub backends.
+
+Feeds `--docs` synthetic documents (each costing `--load-latency` to load,
+like a PDF page being parsed) through:
+
+    sequential  load everything, then embed batch N, upsert batch N, repeat
+    pipelined   IngestPipeline: load/chunk/embed/upsert threads with bounded
+                queues, coalesced upserts
+
+and prints wall time plus the per-stage timing table, which names the
+bottleneck stage.
+
+Usage (from the backend folder):
+    python benchmarks/ingest_pipeline.py --docs 400
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import stubs
+from manifest import Manifest
+from pipeline import IngestPipeline, StageTimer
+from scheduler import EmbeddingScheduler
+
+
+def documents(n, load_latency):
+    for i in range(n):
+        time.sleep(load_latency)
+        yield {"id": f"doc-{i}", "text": f"synthetic cardiology note number {i} about heart failure"}
+
+
+def chunk(doc):
+    return [{"id": doc["id"], "text": doc["text"], "metadata": {"text": doc["text"], "source": "bench"}}]
+
+
+def sequential(args, index, embedder):
+    timer = StageTimer()
+    start = time.perf_counter()
+    docs = []
+    for doc in documents(args.docs, args.load_latency):
+        docs.append(doc)
+    timer.add("load", time.perf_counter() - start, len(docs))
+    chunks = [c for doc in docs for c in chunk(doc)]
+    for i in range(0, len(chunks), args.batch):
+        batch = chunks[i:i + args.batch]
+        with timer.track("embed", len(batch)):
+            vectors = embedder.embed_documents([c["text"] for c in batch])
+        with timer.track("upsert", len(batch)):
+            index.upsert(vectors=[(c["id"], v, c["metadata"]) for c, v in zip(batch, vectors)])
+    return time.perf_counter() - start, timer
+
+
+def pipelined(args, index, embedder, manifest_path):
+    scheduler = EmbeddingScheduler(embedder.embed_documents, requests_per_minute=1e6,
+                                   initial_batch_size=args.batch, max_batch_size=args.batch,
+                                   max_in_flight=args.in_flight)
+    pipeline = IngestPipeline(index, Manifest(manifest_path), embedder.embed_documents, chunk,
+                              scheduler=scheduler, upsert_batch_size=args.upsert_batch)
+    start = time.perf_counter()
+    pipeline.run(documents(args.docs, args.load_latency))
+    return time.perf_counter() - start, pipeline.timer
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=400)
+    parser.add_argument("--batch", type=int, default=20, help="texts per embedding call")
+    parser.add_argument("--upsert-batch", type=int, default=100)
+    parser.add_argument("--in-flight", type=int, default=1, help="concurrent embedding calls in the pipeline")
+    parser.add_argument("--load-latency", type=float, default=0.002)
+    parser.add_argument("--embed-latency", type=float, default=0.08)
+    parser.add_argument("--upsert-latency", type=float, default=0.05)
+    args = parser.parse_args()
+    stubs.latency["embed"] = args.embed_latency
+    stubs.latency["upsert"] = args.upsert_latency
+
+    embedder = stubs.FakeEmbeddings()
+    seq_time, seq_timer = sequential(args, stubs.FakeIndex(), embedder)
+    with tempfile.TemporaryDirectory() as tmp:
+        stubs.reset_calls()
+        pipe_time, pipe_timer = pipelined(args, stubs.FakeIndex(), embedder, os.path.join(tmp, "manifest.db"))
+        upserts = stubs.calls["upsert"]
+
+    print(f"sequential: {seq_time:.2f}s, {-(-args.docs // args.batch)} upsert calls")
+    print(seq_timer.report())
+    print(f"\npipelined:  {pipe_time:.2f}s, {upserts} upsert calls")
+    print(pipe_timer.report())
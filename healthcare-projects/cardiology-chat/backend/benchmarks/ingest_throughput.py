@@ -0,0 +1,114 @@
+"""
+Ingestion throughput: the old fixed-batch loop vs. EmbeddingScheduler.
+
+The stub embedder enforces a requests-per-minute quota (sliding window) and
+a max batch size, answers each call after `--latency` seconds, and raises a
+"429 Resource exhausted" error past the quota, like the Gemini API. Time is
+compressed: one "minute" lasts `--minute` real seconds, and every sleep in
+the old loop is scaled the same way.
+
+Reports chunks/minute, calls, rate-limit errors and chunks lost, next to the
+ceiling the quota allows (quota x max batch).
+
+Usage (from the backend folder):
+    python benchmarks/ingest_throughput.py --chunks 3000 --quota 60 --minute 3
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scheduler import EmbeddingScheduler
+
+
+class RateLimited(Exception):
+    pass
+
+
+class QuotaEmbedder:
+    def __init__(self, quota, minute, latency, max_batch):
+        self.quota = quota
+        self.minute = minute
+        self.latency = latency
+        self.max_batch = max_batch
+        self.calls = deque()
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        with self._lock:
+            now = time.monotonic()
+            while self.calls and now - self.calls[0] > self.minute:
+                self.calls.popleft()
+            if len(self.calls) >= self.quota:
+                self.errors += 1
+                raise RateLimited("429 Resource exhausted: quota exceeded")
+            self.calls.append(now)
+        if len(texts) > self.max_batch:
+            raise ValueError(f"at most {self.max_batch} texts per request")
+        time.sleep(self.latency)
+        return [[0.0] * 8 for _ in texts]
+
+
+def legacy_loop(chunks, embedder, scale):
+    # The loop ingest.py used to run, with its sleeps scaled to the compressed minute.
+    stored = 0
+    batch_size = 10
+    for i in range(0, len(chunks), batch_size):
+        try:
+            vectors = embedder.embed_documents([c["text"] for c in chunks[i:i + batch_size]])
+            stored += len(vectors)
+            time.sleep(2 * scale)
+        except Exception:
+            time.sleep(10 * scale)
+    return stored
+
+
+def report(name, stored, total, elapsed, minute, calls, errors):
+    per_minute = stored / (elapsed / minute)
+    print(f"{name:>10} {per_minute:>14.0f} {calls:>6} {errors:>12} {total - stored:>6} {elapsed:>8.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=3000)
+    parser.add_argument("--quota", type=int, default=60, help="requests per minute")
+    parser.add_argument("--max-batch", type=int, default=100)
+    parser.add_argument("--minute", type=float, default=3.0, help="real seconds per simulated minute")
+    parser.add_argument("--latency", type=float, default=0.02)
+    args = parser.parse_args()
+    scale = args.minute / 60
+
+    chunks = [{"id": str(i), "text": f"chunk {i}", "metadata": {"source": "bench"}} for i in range(args.chunks)]
+    print(f"quota ceiling: {args.quota * args.max_batch} chunks/minute")
+    print(f"{'':>10} {'chunks/minute':>14} {'calls':>6} {'rate limited':>12} {'lost':>6} {'real s':>8}")
+
+    embedder = QuotaEmbedder(args.quota, args.minute, args.latency, args.max_batch)
+    start = time.monotonic()
+    stored = legacy_loop(chunks, embedder, scale)
+    report("old loop", stored, len(chunks), time.monotonic() - start, args.minute,
+           len(chunks) // 10, embedder.errors)
+
+    embedder = QuotaEmbedder(args.quota, args.minute, args.latency, args.max_batch)
+    stored = 0
+
+    def on_batch(items, vectors):
+        global stored
+        stored += len(vectors)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        scheduler = EmbeddingScheduler(
+            embedder.embed_documents,
+            requests_per_minute=args.quota / scale,
+            max_batch_size=args.max_batch,
+            base_delay=1.0 * scale,
+            max_delay=60 * scale,
+            dead_letter_path=os.path.join(tmp, "dead_letter.jsonl"),
+        )
+        stats = scheduler.run(chunks, on_batch)
+    report("scheduler", stored, len(chunks), stats["elapsed"], args.minute, stats["calls"], embedder.errors)
@@ -0,0 +1,81 @@
+"""
+PDF text extraction throughput: pages/second vs. number of worker processes.
+
+Writes a synthetic multi-page PDF (`--pages` pages of `--lines` lines of
+report-like text each) to a temp file, then extracts it with
+pdf_text.iter_pages for every worker count in `--workers` (1 = in-process,
+the old serial loop) and checks that every run returns the same pages in
+the same order.
+
+Usage (from the backend folder):
+    python benchmarks/pdf_extract.py --pages 300 --workers 1 2 4
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pdf_text
+
+
+def synthetic_pdf(pages, lines):
+    # Minimal PDF 1.4: catalog, page tree, one Helvetica font, then a page + content stream per page.
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        ("<< /Type /Pages /Kids [%s] /Count %d >>"
+         % (" ".join(f"{4 + 2 * i} 0 R" for i in range(pages)), pages)).encode(),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for i in range(pages):
+        text = " ".join(
+            f"({f'Page {i + 1} line {n}: ejection fraction 35 percent, troponin elevated, sinus rhythm'}) Tj 0 -14 Td"
+            for n in range(lines)
+        )
+        stream = f"BT /F1 10 Tf 40 760 Td {text} ET".encode()
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>".encode())
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += b"".join(f"{offset:010d} 00000 n \n".encode() for offset in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return out
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--lines", type=int, default=45, help="text lines per page")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--pages-per-task", type=int, default=pdf_text.PDF_PAGES_PER_TASK)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "synthetic.pdf")
+        with open(path, "wb") as f:
+            f.write(synthetic_pdf(args.pages, args.lines))
+        print(f"{args.pages} pages, {os.path.getsize(path) / 1e6:.1f} MB, {os.cpu_count()} CPUs")
+        print(f"{'workers':>8} {'seconds':>8} {'pages/s':>8} {'speedup':>8}")
+
+        expected = None
+        baseline = None
+        for workers in args.workers:
+            if workers > 1:
+                # Start the pool first, so process start-up isn't billed to the first run.
+                pdf_text.get_pool(workers).submit(pdf_text.page_count, path).result()
+            start = time.perf_counter()
+            pages = list(pdf_text.iter_pages(path, workers=workers, pages_per_task=args.pages_per_task))
+            elapsed = time.perf_counter() - start
+            expected = expected or pages
+            assert pages == expected, f"{workers} workers returned different pages"
+            baseline = baseline or elapsed
+            print(f"{workers:>8} {elapsed:>8.2f} {len(pages) / elapsed:>8.1f} {baseline / elapsed:>7.2f}x")
@@ -0,0 +1,66 @@
+"""
+Quantized local index: memory per vector, queries/second and recall@k.
+
+Loads the same `--vectors` synthetic embeddings (see vector_search.py) into a
+LocalIndex per configuration and runs `--queries` single-vector queries
+against each:
+
+    float32     exact search over the uncompressed vectors (the reference)
+    int8        scalar quantization, with and without float32 re-rank
+    pq          product quantization, with and without float32 re-rank
+
+Recall@k is measured against the float32 results. "bytes/vector" is what the
+scan keeps in RAM; the float32 file stays memory-mapped for re-ranking.
+
+Usage (from the backend folder):
+    python benchmarks/quantization.py --vectors 20000 --queries 300
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import vectorstore
+from vectorstore import LocalIndex
+from vector_search import synthetic
+
+
+def run(index, queries, top_k):
+    start = time.perf_counter()
+    rows = [index.search([query], top_k)[1][0] for query in queries]
+    return len(queries) / (time.perf_counter() - start), rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--dimension", type=int, default=vectorstore.DIMENSION)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--rerank", type=int, default=vectorstore.VECTOR_RERANK, help="candidates = rerank x top-k")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    data, queries = synthetic(rng, args.vectors, args.queries, args.dimension)
+    items = [(f"v{i}", data[i], {}) for i in range(len(data))]
+
+    print(f"{args.vectors} x {args.dimension} vectors, {args.queries} queries")
+    print(f"{'':>16} {'bytes/vector':>13} {'QPS':>8} {f'recall@{args.top_k}':>9}")
+    reference = None
+    configs = [("float32", "", 0), ("int8", "int8", 0), ("int8 + rerank", "int8", args.rerank),
+               ("pq", "pq", 0), ("pq + rerank", "pq", args.rerank)]
+    for name, quantization, rerank in configs:
+        with tempfile.TemporaryDirectory() as tmp:
+            index = LocalIndex(tmp, args.dimension, ann_min_vectors=0, quantization=quantization, rerank=rerank)
+            for i in range(0, len(items), 1000):
+                index.upsert(items[i:i + 1000])
+            index.search(queries[:1], args.top_k)  # train the quantizer outside the timing
+            qps, rows = run(index, queries, args.top_k)
+        reference = reference or rows
+        recall = np.mean([len(set(r) & set(e)) / args.top_k for r, e in zip(rows, reference)])
+        print(f"{name:>16} {index.bytes_per_vector:>13} {qps:>8.0f} {recall:>9.3f}")
@@ -0,0 +1,70 @@
+"""
+Incremental re-ingestion check against the stub backends.
+
+Copies the knowledge base into a temp folder and runs ingest.py there four
+times, printing the embedding calls and chunks embedded on each run:
+
+    1. fresh index          every chunk is embedded
+    2. unchanged corpus     zero embedding calls
+    3. one section edited   only the edited chunk(s); the old ones are deleted
+    4. unchanged again      zero embedding calls
+
+Usage (from the backend folder):
+    python benchmarks/reingest.py
+"""
+import os
+import runpy
+import shutil
+import sys
+import tempfile
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+import stubs
+
+stubs.install()
+stubs.latency["embed"] = stubs.latency["upsert"] = 0
+
+
+def run_ingest(label):
+    stubs.reset_calls()
+    embedded = []
+    original = stubs.FakeEmbeddings.embed_documents
+
+    def counting(self, texts, **kwargs):
+        embedded.extend(texts)
+        return original(self, texts, **kwargs)
+
+    stubs.FakeEmbeddings.embed_documents = counting
+    try:
+        runpy.run_path(os.path.join(BACKEND, "ingest.py"), run_name="__main__")
+    finally:
+        stubs.FakeEmbeddings.embed_documents = original
+    index = stubs.FakePinecone.indexes["medical-chatbot-local"]
+    print(f"--> {label}: {stubs.calls['embed_documents']} embedding calls, "
+          f"{len(embedded)} chunks embedded, {len(index.vectors)} vectors in index\n")
+
+
+if __name__ == "__main__":
+    workdir = tempfile.mkdtemp()
+    os.makedirs(os.path.join(workdir, "data"))
+    data_path = os.path.join(workdir, "data", "medical_data.txt")
+    shutil.copy(os.path.join(BACKEND, "data", "medical_data.txt"), data_path)
+    os.environ.setdefault("PINECONE_API_KEY", "stub")
+    os.environ.setdefault("GOOGLE_API_KEY", "stub")
+    os.environ["MANIFEST_PATH"] = os.path.join(workdir, "manifest.db")
+    os.chdir(workdir)
+
+    try:
+        run_ingest("fresh index")
+        run_ingest("unchanged corpus")
+        with open(data_path, encoding="utf-8") as f:
+            text = f.read()
+        with open(data_path, "w", encoding="utf-8") as f:
+            f.write(text.replace("Less than 120/80 mm Hg.", "Below 120/80 mm Hg."))
+        run_ingest("one section edited")
+        run_ingest("unchanged again")
+    finally:
+        os.chdir(BACKEND)
+        shutil.rmtree(workdir)
@@ -0,0 +1,102 @@
+"""
+Cold start of the API: import time, client startup, warm-up and the latency
+of the first requests.
+
+Each run is a fresh Python process (in a scratch folder) that imports main,
+runs the app's startup (lifespan: building the clients, plus the warm-up
+probe with --warmup) and then sends two different questions to /chat. With
+--stubs the SDKs are replaced by the offline stubs, so the client and request
+numbers measure our own code; without it the real SDKs are imported and the
+services are called (needs the API keys in backend/.env).
+
+It also times, each in its own process, the imports that no longer happen
+when main.py is imported: pypdf (now loaded on the first upload) and
+langchain_community's HuggingFaceEmbeddings (unused, removed).
+
+Usage (from the backend folder):
+    python benchmarks/startup.py --stubs --runs 5
+    python benchmarks/startup.py --warmup
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+QUESTIONS = ["What are the symptoms of heart failure?", "How is high blood pressure treated?"]
+
+
+def child(use_stubs):
+    sys.path.insert(0, BACKEND_DIR)
+    start = time.perf_counter()
+    if use_stubs:
+        sys.path.insert(0, os.path.join(BACKEND_DIR, "benchmarks"))
+        import stubs
+
+        stubs.install()
+    import httpx
+    import main
+
+    result = {"import": time.perf_counter() - start}
+
+    async def run():
+        start = time.perf_counter()
+        async with main.app.router.lifespan_context(main.app):
+            result["startup"] = time.perf_counter() - start
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+                for name, question in zip(("first request", "second request"), QUESTIONS):
+                    start = time.perf_counter()
+                    response = await client.post("/chat", json={"question": question})
+                    response.raise_for_status()
+                    result[name] = time.perf_counter() - start
+
+    asyncio.run(run())
+    result.update({f"  {name}": seconds for name, seconds in main.clients.startup.items()})
+    print(json.dumps(result))
+
+
+def run_child(args, workdir):
+    command = [sys.executable, os.path.abspath(__file__), "--child"] + (["--stubs"] if args.stubs else [])
+    env = dict(os.environ, WARMUP="1" if args.warmup else "0")
+    output = subprocess.run(command, cwd=workdir, env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def import_time(statement):
+    code = f"import time; start = time.perf_counter(); {statement}; print(time.perf_counter() - start)"
+    return float(subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--stubs", action="store_true", help="use the offline SDK stubs")
+    parser.add_argument("--warmup", action="store_true", help="run with WARMUP=1")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.stubs)
+        sys.exit()
+
+    runs = []
+    for _ in range(args.runs):
+        with tempfile.TemporaryDirectory() as workdir:
+            runs.append(run_child(args, workdir))
+    print(f"median of {args.runs} cold starts ({'stubs' if args.stubs else 'real SDKs'}, "
+          f"warm-up {'on' if args.warmup else 'off'}):")
+    for name in runs[0]:
+        print(f"{name:<18} {statistics.median(run[name] for run in runs) * 1000:>8.0f} ms")
+
+    print("\nimports no longer paid by `import main`:")
+    for statement in ("import pypdf", "from langchain_community.embeddings import HuggingFaceEmbeddings"):
+        try:
+            print(f"{statement:<66} {import_time(statement) * 1000:>8.0f} ms")
+        except subprocess.CalledProcessError:
+            print(f"{statement:<66} not installed")
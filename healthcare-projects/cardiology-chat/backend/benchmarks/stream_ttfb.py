@@ -0,0 +1,112 @@
+"""
+Time-to-first-byte for /chat/stream vs. the blocking /chat endpoint.
+
+Runs the app under uvicorn on a local port (so chunks really go over the
+wire) against the stub backends. The stub model yields one word at a time
+spread over `--generate-latency` seconds, like a streaming Gemini response.
+
+Reports, per endpoint:
+    ttfb         first byte on the wire (the "retrieval" event for streaming)
+    first token  first generated text
+    total        full answer received
+
+It also checks the event order (retrieval -> token... -> done) and that the
+streamed tokens add up to the same answer /chat returns.
+
+Usage (from the backend folder):
+    python benchmarks/stream_ttfb.py --runs 10
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import stubs
+
+stubs.install()
+
+import httpx
+import uvicorn
+import main
+
+# Measure the uncached pipeline: with the answer cache on, every repeated question
+# would skip embedding and generation after its first request
+main.embedding_cache.max_entries = 0
+main.semantic_cache.max_entries = 0
+
+QUESTION = "What are the symptoms of heart failure?"
+
+
+def start_server(port):
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def parse_events(raw):
+    for block in raw.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        yield lines["event"], json.loads(lines["data"])
+
+
+def time_stream(client):
+    start = time.perf_counter()
+    ttfb = first_token = None
+    raw = ""
+    with client.stream("POST", "/chat/stream", json={"question": QUESTION}) as response:
+        for chunk in response.iter_text():
+            now = time.perf_counter() - start
+            if ttfb is None:
+                ttfb = now
+            raw += chunk
+            if first_token is None and "event: token" in raw:
+                first_token = now
+    total = time.perf_counter() - start
+
+    events = list(parse_events(raw))
+    names = [name for name, _ in events]
+    assert names[0] == "retrieval" and names[-1] == "done", names
+    assert set(names[1:-1]) == {"token"}, names
+    answer = "".join(data["text"] for name, data in events if name == "token")
+    return ttfb, first_token, total, answer
+
+
+def time_blocking(client):
+    start = time.perf_counter()
+    response = client.post("/chat", json={"question": QUESTION})
+    total = time.perf_counter() - start
+    return total, total, total, response.json()["answer"]
+
+
+def report(name, rows):
+    columns = list(zip(*rows))
+    ms = lambda values: statistics.median(values) * 1000
+    print(f"{name:>10} {ms(columns[0]):>9.0f} {ms(columns[1]):>12.0f} {ms(columns[2]):>9.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--generate-latency", type=float, default=1.0)
+    args = parser.parse_args()
+    stubs.latency["generate"] = args.generate_latency
+
+    server = start_server(args.port)
+    with httpx.Client(base_url=f"http://127.0.0.1:{args.port}", timeout=None) as client:
+        streamed = [time_stream(client) for _ in range(args.runs)]
+        blocking = [time_blocking(client) for _ in range(args.runs)]
+    server.should_exit = True
+
+    assert streamed[0][3].strip() == blocking[0][3].strip()
+    print(f"{'endpoint':>10} {'ttfb ms':>9} {'1st token ms':>12} {'total ms':>9}   (median of {args.runs})")
+    report("/chat", [row[:3] for row in blocking])
+    report("/stream", [row[:3] for row in streamed])
@@ -0,0 +1,199 @@
+"""
+Local stand-ins for the remote services used by the backend.
+
+The benchmarks import `main` against these stubs so they can run offline and
+measure our own request path. Every call sleeps for a fixed latency to mimic
+the network round-trip. The synchronous ones use time.sleep on purpose:
+that is exactly how the real Pinecone / embedding SDK calls behave.
+"""
+import asyncio
+import hashlib
+import math
+import re
+import sys
+import time
+import types
+
+from filters import matches as filter_matches
+
+DIMENSION = 768
+
+latency = {
+    "embed": 0.05,
+    "query": 0.03,
+    "upsert": 0.03,
+    "generate": 0.5,
+}
+
+calls = {
+    "embed_query": 0,
+    "embed_documents": 0,
+    "query": 0,
+    "upsert": 0,
+    "generate": 0,
+}
+
+
+def fake_vector(text, dimension=DIMENSION):
+    # Hashed bag-of-words, so similar texts get similar vectors.
+    vector = [0.0] * dimension
+    for token in re.findall(r"\w+", text.lower()):
+        bucket = int(hashlib.md5(token.encode()).hexdigest(), 16) % dimension
+        vector[bucket] += 1.0
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+class FakeEmbeddings:
+    def __init__(self, model=None, google_api_key=None, **kwargs):
+        self.model = model
+
+    def embed_query(self, text, **kwargs):
+        calls["embed_query"] += 1
+        time.sleep(latency["embed"])
+        return fake_vector(text)
+
+    def embed_documents(self, texts, **kwargs):
+        calls["embed_documents"] += 1
+        time.sleep(latency["embed"])
+        return [fake_vector(text) for text in texts]
+
+
+class FakeIndex:
+    def __init__(self):
+        self.vectors = {}
+
+    def upsert(self, vectors, namespace="", **kwargs):
+        calls["upsert"] += 1
+        time.sleep(latency["upsert"])
+        for item in vectors:
+            if isinstance(item, dict):
+                vector_id, values, metadata = item["id"], item["values"], item.get("metadata", {})
+            else:
+                vector_id, values, metadata = item
+            self.vectors[(namespace, vector_id)] = (values, metadata)
+        return {"upserted_count": len(vectors)}
+
+    def describe_index_stats(self, **kwargs):
+        return {"dimension": DIMENSION, "total_vector_count": len(self.vectors)}
+
+    def delete(self, ids=None, namespace="", **kwargs):
+        for vector_id in ids or []:
+            self.vectors.pop((namespace, vector_id), None)
+
+    def query(self, vector, top_k=3, include_metadata=False, namespace="", filter=None, **kwargs):
+        calls["query"] += 1
+        time.sleep(latency["query"])
+        scored = []
+        for (ns, vector_id), (values, metadata) in self.vectors.items():
+            if ns != (namespace or "") or (filter and not filter_matches(metadata, filter)):
+                continue
+            score = sum(a * b for a, b in zip(vector, values))
+            scored.append({"id": vector_id, "score": score, "metadata": metadata})
+        scored.sort(key=lambda match: match["score"], reverse=True)
+        return {"matches": scored[:top_k]}
+
+
+class FakeIndexList(list):
+    def names(self):
+        return [item["name"] for item in self]
+
+
+class FakePinecone:
+    indexes = {}
+
+    def __init__(self, api_key=None, **kwargs):
+        pass
+
+    def Index(self, name=None, host=None, **kwargs):
+        return self.indexes.setdefault(name or host, FakeIndex())
+
+    def list_indexes(self):
+        return FakeIndexList({"name": name} for name in self.indexes)
+
+    def describe_index(self, name):
+        return types.SimpleNamespace(dimension=DIMENSION, status={"ready": True})
+
+    def create_index(self, name, **kwargs):
+        self.indexes.setdefault(name, FakeIndex())
+
+    def delete_index(self, name):
+        self.indexes.pop(name, None)
+
+
+def fake_answer(prompt):
+    question = prompt.rsplit("Question:", 1)[-1].strip()
+    words = ("This is a stubbed educational answer about " + question).split()
+    return words + ["This", "content", "is", "for", "educational", "purposes", "only."]
+
+
+class FakeChunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeStream:
+    # Yields one word per chunk, spread over the generation latency.
+    def __init__(self, words):
+        self.words = words
+        self.delay = latency["generate"] / max(len(words), 1)
+
+    def __aiter__(self):
+        return self._chunks()
+
+    async def _chunks(self):
+        for word in self.words:
+            await asyncio.sleep(self.delay)
+            yield FakeChunk(word + " ")
+
+
+class FakeGenerativeModel:
+    def __init__(self, model_name=None, **kwargs):
+        self.model_name = model_name
+
+    def generate_content(self, prompt, **kwargs):
+        calls["generate"] += 1
+        time.sleep(latency["generate"])
+        return FakeChunk(" ".join(fake_answer(prompt)))
+
+    async def count_tokens_async(self, contents, **kwargs):
+        await asyncio.sleep(latency["query"])
+        return types.SimpleNamespace(total_tokens=len(str(contents).split()))
+
+    async def generate_content_async(self, prompt, stream=False, **kwargs):
+        calls["generate"] += 1
+        if stream:
+            return FakeStream(fake_answer(prompt))
+        await asyncio.sleep(latency["generate"])
+        return FakeChunk(" ".join(fake_answer(prompt)))
+
+
+def install():
+    """Register the stub SDK modules so `import main` never touches the network."""
+    pinecone = types.ModuleType("pinecone")
+    pinecone.Pinecone = FakePinecone
+    pinecone.ServerlessSpec = lambda **kwargs: kwargs
+
+    genai = types.ModuleType("google.generativeai")
+    genai.configure = lambda **kwargs: None
+    genai.GenerativeModel = FakeGenerativeModel
+
+    google_genai = types.ModuleType("langchain_google_genai")
+    google_genai.GoogleGenerativeAIEmbeddings = FakeEmbeddings
+
+    sys.modules["pinecone"] = pinecone
+    sys.modules["google.generativeai"] = genai
+    sys.modules["langchain_google_genai"] = google_genai
+    try:
+        import google
+        google.generativeai = genai
+    except ImportError:
+        google = types.ModuleType("google")
+        google.__path__ = []
+        google.generativeai = genai
+        sys.modules["google"] = google
+
+
+def reset_calls():
+    for name in calls:
+        calls[name] = 0
@@ -0,0 +1,102 @@
+"""
+Local vector index: exact search vs. HNSW, recall and latency.
+
+Fills a LocalIndex (in a temp dir) with `--vectors` clustered, low-rank random
+vectors, then for `--queries` held-out queries reports:
+
+    exact       brute-force cosine top-k, one query per call
+    exact batch the same, all queries in one matrix product
+    filter      scoped to one patient's vectors (1 / --patients of the index)
+                with a metadata filter, pre-filtered then searched exactly
+    namespace   the same vectors as their own namespace (a small index)
+    hnsw        approximate search (needs hnswlib), one query per call,
+                with recall@k against the exact results
+
+Usage (from the backend folder):
+    python benchmarks/vector_search.py --vectors 20000 --queries 500 --top-k 3
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import vectorstore
+from vectorstore import LocalIndex
+
+
+def clustered(rng, n, dimension, centers, basis):
+    # Text embeddings cluster by topic and have a low intrinsic dimension; uniform
+    # random vectors would flatter HNSW and be unfairly hard on quantization.
+    latent = centers[rng.integers(len(centers), size=n)] + 0.6 * rng.normal(size=(n, basis.shape[0]))
+    return (latent @ basis).astype(np.float32)
+
+
+def synthetic(rng, vectors, queries, dimension, rank=64):
+    basis = rng.normal(size=(rank, dimension))
+    centers = rng.normal(size=(max(1, vectors // 100), rank))
+    return clustered(rng, vectors, dimension, centers, basis), clustered(rng, queries, dimension, centers, basis)
+
+
+def latency(fn, queries):
+    times = []
+    for query in queries:
+        start = time.perf_counter()
+        fn(query)
+        times.append(time.perf_counter() - start)
+    return np.percentile(times, 50) * 1e6, np.percentile(times, 99) * 1e6
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--dimension", type=int, default=vectorstore.DIMENSION)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--ef", type=int, default=vectorstore.HNSW_EF)
+    parser.add_argument("--patients", type=int, default=100, help="the scoped queries search 1 / patients of the vectors")
+    args = parser.parse_args()
+    vectorstore.HNSW_EF = args.ef
+
+    rng = np.random.default_rng(0)
+    data, queries = synthetic(rng, args.vectors, args.queries, args.dimension)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        index = LocalIndex(tmp, args.dimension)
+        start = time.perf_counter()
+        for i in range(0, len(data), 1000):
+            index.upsert([(f"v{j}", data[j], {"text": "", "patient": f"p{j % args.patients}"})
+                          for j in range(i, min(i + 1000, len(data)))])
+        print(f"{args.vectors} x {args.dimension} vectors, loaded in {time.perf_counter() - start:.1f}s")
+        print(f"{'':>12} {'p50 us':>9} {'p99 us':>9} {'QPS':>9} {f'recall@{args.top_k}':>9}")
+
+        p50, p99 = latency(lambda q: index.query(q, top_k=args.top_k, include_metadata=True), queries)
+        print(f"{'exact':>12} {p50:>9.0f} {p99:>9.0f} {1e6 / p50:>9.0f} {1.0:>9.3f}")
+
+        start = time.perf_counter()
+        _, exact = index.search(queries, args.top_k)
+        elapsed = time.perf_counter() - start
+        print(f"{'exact batch':>12} {'':>9} {'':>9} {len(queries) / elapsed:>9.0f} {1.0:>9.3f}")
+
+        # One patient's share of the vectors, filtered in the shared index vs. in its own namespace
+        scope = {"patient": "p0"}
+        index.upsert([(f"v{j}", data[j], scope) for j in range(0, len(data), args.patients)], namespace="p0")
+        for name, kwargs in (("filter", {"filter": scope}), ("namespace", {"namespace": "p0"})):
+            p50, p99 = latency(lambda q: index.query(q, top_k=args.top_k, include_metadata=True, **kwargs), queries)
+            print(f"{name:>12} {p50:>9.0f} {p99:>9.0f} {1e6 / p50:>9.0f} {1.0:>9.3f}")
+
+        if vectorstore.hnswlib is None:
+            print(f"{'hnsw':>12} skipped: pip install hnswlib")
+        else:
+            index.ann, index.ann_min_vectors = "hnsw", 0
+            start = time.perf_counter()
+            index.search(queries[:1], args.top_k)
+            print(f"{'':>12} (HNSW graph built in {time.perf_counter() - start:.1f}s)")
+            p50, p99 = latency(lambda q: index.query(q, top_k=args.top_k), queries)
+            _, approx = index.search(queries, args.top_k)
+            recall = np.mean([len(set(a) & set(e)) / args.top_k for a, e in zip(approx, exact)])
+            print(f"{'hnsw':>12} {p50:>9.0f} {p99:>9.0f} {1e6 / p50:>9.0f} {recall:>9.3f}")
@@ -0,0 +1,184 @@
+"""
+Caches for the chat pipeline.
+
+EmbeddingCache keeps query embeddings keyed by normalized question text, so
+repeated FAQ-style questions skip the embedding round-trip. It is an LRU with
+a TTL and an entry cap, and can optionally write through to a SQLite file so
+it survives restarts.
+
+SemanticCache keeps generated answers keyed by query vector. A paraphrased
+question whose vector is within a cosine threshold of a cached one, and that
+retrieved exactly the same context IDs, gets the cached answer back.
+"""
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+
+import numpy as np
+
+
+def normalize_text(text):
+    # "How long do heart attacks last?" and "how long do  heart attacks last"
+    # should share one entry.
+    text = unicodedata.normalize("NFKC", text).casefold()
+    text = re.sub(r"\s+", " ", text)
+    return text.strip(" ?!.¿¡")
+
+
+class EmbeddingCache:
+    def __init__(self, namespace, max_entries=1024, ttl=86400, path=None):
+        self.namespace = namespace  # embedding model name, so a model switch starts cold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (created, vector)
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, created REAL, vector BLOB)"
+            )
+            self._load()
+
+    def key(self, text):
+        raw = f"{self.namespace}\x00{normalize_text(text)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, text):
+        key = self.key(text)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry[0] > self.ttl:
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return list(entry[1])
+
+    def put(self, text, vector):
+        key = self.key(text)
+        created = time.time()
+        packed = array("f", vector)
+        with self._lock:
+            self._entries[key] = (created, packed)
+            self._entries.move_to_end(key)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)", (key, created, packed.tobytes())
+                )
+                self._db.commit()
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+    def _remove(self, key):
+        self._entries.pop(key, None)
+        if self._db is not None:
+            self._db.execute("DELETE FROM embeddings WHERE key = ?", (key,))
+            self._db.commit()
+
+    def _load(self):
+        cutoff = time.time() - self.ttl
+        self._db.execute("DELETE FROM embeddings WHERE created < ?", (cutoff,))
+        self._db.execute(
+            "DELETE FROM embeddings WHERE key NOT IN "
+            "(SELECT key FROM embeddings ORDER BY created DESC LIMIT ?)", (self.max_entries,)
+        )
+        self._db.commit()
+        rows = self._db.execute(
+            "SELECT key, created, vector FROM embeddings ORDER BY created DESC LIMIT ?", (self.max_entries,)
+        ).fetchall()
+        # Oldest first, so the most recently written entries end up most recently used.
+        for key, created, blob in reversed(rows):
+            vector = array("f")
+            vector.frombytes(blob)
+            self._entries[key] = (created, vector)
+
+
+class SemanticCache:
+    def __init__(self, threshold=0.95, max_entries=512):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.generation = 0  # bumped by clear(); answers from an older generation are dropped
+        self._entries = OrderedDict()  # entry id -> (context ids, unit vector, answer)
+        self._by_context = {}  # context ids -> set of entry ids
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def lookup(self, vector, context_ids):
+        context_ids = tuple(context_ids)
+        query = _unit(vector)
+        with self._lock:
+            best_id, best_score = None, self.threshold
+            # Only entries that retrieved the same context can be reused.
+            for entry_id in self._by_context.get(context_ids, ()):
+                score = float(np.dot(query, self._entries[entry_id][1]))
+                if score >= best_score:
+                    best_id, best_score = entry_id, score
+            if best_id is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best_id)
+            self.hits += 1
+            return self._entries[best_id][2]
+
+    def store(self, vector, context_ids, answer, generation):
+        if self.max_entries <= 0:
+            return
+        context_ids = tuple(context_ids)
+        with self._lock:
+            if generation != self.generation:
+                return  # the index changed while this answer was being generated
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (context_ids, _unit(vector), answer)
+            self._by_context.setdefault(context_ids, set()).add(entry_id)
+            while len(self._entries) > self.max_entries:
+                old_id, (old_context, _, _) = self._entries.popitem(last=False)
+                bucket = self._by_context[old_context]
+                bucket.discard(old_id)
+                if not bucket:
+                    del self._by_context[old_context]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_context.clear()
+            self.generation += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def _unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
@@ -0,0 +1,62 @@
+"""
+Chunking for the knowledge base.
+
+Documents are first split on the `## N. Title` section headings, then any
+section longer than CHUNK_SIZE characters is split again with overlap. Every
+chunk carries its section heading, so a piece of "Heart Failure" still says
+so when it is retrieved on its own. Chunk IDs are content hashes: the same
+text from the same source always gets the same ID.
+"""
+import hashlib
+import os
+import re
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "1000"))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "150"))
+
+SECTION_HEADING = re.compile(r"^## \d+\..*$", re.MULTILINE)
+
+
+def split_sections(text):
+    """Return (heading, body) pairs; text before the first heading is kept if it has content."""
+    headings = list(SECTION_HEADING.finditer(text))
+    sections = []
+    preamble = text[:headings[0].start()] if headings else text
+    # A lone "# Title" line is not worth a vector of its own.
+    if preamble.strip() and not re.fullmatch(r"\s*#[^\n]*\s*", preamble):
+        sections.append(("", preamble.strip()))
+    for i, match in enumerate(headings):
+        end = headings[i + 1].start() if i + 1 < len(headings) else len(text)
+        sections.append((match.group(0).strip(), text[match.end():end].strip()))
+    return sections
+
+
+def chunk_id(source, text):
+    return hashlib.sha256(f"{source}\x00{text}".encode("utf-8")).hexdigest()[:32]
+
+
+def chunk_document(text, source, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    """Split one document into chunks: [{"id", "text", "metadata"}]."""
+    chunks = []
+    for heading, body in split_sections(text):
+        # Leave room for the heading that gets prepended to every piece.
+        size = chunk_size - len(heading) - 1
+        if len(body) <= size:
+            pieces = [body]
+        else:
+            splitter = RecursiveCharacterTextSplitter(
+                chunk_size=size,
+                chunk_overlap=min(chunk_overlap, size // 2),
+                separators=["\n\n", "\n", ". ", " ", ""],
+            )
+            pieces = splitter.split_text(body)
+        for piece in pieces:
+            chunk_text = f"{heading}\n{piece}" if heading else piece
+            chunks.append({
+                "id": chunk_id(source, chunk_text),
+                "text": chunk_text,
+                "metadata": {"text": chunk_text, "source": source, "section": heading.lstrip("# ")},
+            })
+    return chunks
@@ -0,0 +1,110 @@
+"""
+Upstream clients for the API: the vector index, the Gemini model and the
+embedding client.
+
+main.py used to build all three, and import their SDKs, at import time.
+Now:
+
+- each client is built once, on first use, behind a lock; lifespan() builds
+  them at startup in a worker thread so the first question doesn't pay for it,
+- the SDK imports (google.generativeai, langchain_google_genai, pinecone)
+  happen inside the builders, so tools and benchmarks that import main.py
+  only load what they use,
+- EMBEDDING_BACKEND=local swaps the Gemini embedding API for MiniLM on the
+  CPU (see local_embeddings.py); the index dimension follows (768 vs. 384),
+- the Pinecone index keeps up to PINECONE_POOL_SIZE persistent connections
+  (see vectorstore.py); the Gemini clients already hold one gRPC channel each,
+- with WARMUP=1, warm_up() makes one cheap call per service at startup, so
+  TLS handshakes and channel setup are done before the first request.
+"""
+import asyncio
+import os
+import threading
+import time
+
+from local_embeddings import LOCAL_DIMENSION, LOCAL_MODEL, LocalEmbeddings
+from scheduler import EMBED_RPM
+from vectorstore import DIMENSION, open_index
+
+CHAT_MODEL = "gemini-2.0-flash"
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "gemini")
+if EMBEDDING_BACKEND == "local":
+    EMBEDDING_MODEL, EMBEDDING_DIMENSION = LOCAL_MODEL, LOCAL_DIMENSION
+    # No quota on a local model, only the CPU
+    EMBEDDING_RPM = 60000
+else:
+    EMBEDDING_MODEL, EMBEDDING_DIMENSION = "models/text-embedding-004", DIMENSION
+    EMBEDDING_RPM = EMBED_RPM
+WARMUP = os.getenv("WARMUP", "0") == "1"
+
+
+def make_embeddings(backend=EMBEDDING_BACKEND):
+    if backend == "local":
+        return LocalEmbeddings()
+    if backend != "gemini":
+        raise ValueError(f"Unknown EMBEDDING_BACKEND {backend!r} (use 'gemini' or 'local')")
+    # Gemini API embeddings: multilingual, no local model to download
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+    return GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL, google_api_key=os.getenv("GOOGLE_API_KEY"))
+
+
+class Clients:
+    def __init__(self, system_instruction=None):
+        self.system_instruction = system_instruction
+        self.startup = {}  # client -> seconds to build (import + connect)
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def _get(self, name, build):
+        client = self._clients.get(name)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(name)
+                if client is None:
+                    start = time.perf_counter()
+                    client = self._clients[name] = build()
+                    self.startup[name] = time.perf_counter() - start
+        return client
+
+    @property
+    def index(self):
+        # Pinecone, or a local on-disk index with VECTOR_STORE=local
+        return self._get("index", lambda: open_index(dimension=EMBEDDING_DIMENSION))
+
+    @property
+    def model(self):
+        return self._get("model", self._build_model)
+
+    @property
+    def embeddings(self):
+        return self._get("embeddings", make_embeddings)
+
+    def _build_model(self):
+        import google.generativeai as genai
+
+        genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+        # The static rules are the system instruction, so each request only carries context + question
+        return genai.GenerativeModel(CHAT_MODEL, system_instruction=self.system_instruction)
+
+    def start(self):
+        """Build every client now (blocking; run it in a thread)."""
+        return self.index, self.model, self.embeddings
+
+    async def warm_up(self):
+        """One cheap call per service; failures are reported, not raised."""
+        probes = {
+            "index": lambda: asyncio.to_thread(self.index.describe_index_stats),
+            "embeddings": lambda: asyncio.to_thread(self.embeddings.embed_query, "warm up"),
+            "model": lambda: self.model.count_tokens_async("warm up"),
+        }
+
+        async def probe(name, call):
+            start = time.perf_counter()
+            try:
+                await call()
+                return name, time.perf_counter() - start, None
+            except Exception as e:
+                return name, time.perf_counter() - start, e
+
+        return await asyncio.gather(*(probe(name, call) for name, call in probes.items()))
@@ -1,3 +1,21 @@
-# No local model needed for Gemini Embeddings
-print("Using Google Gemini API for Embeddings (Serverless)")
-print("Skipping local model download...")
+# Downloads the local MiniLM embedding model (EMBEDDING_BACKEND=local) into model_cache/.
+# The default Gemini embeddings run on the API and need nothing local.
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+from local_embeddings import LOCAL_MODEL, MODEL_CACHE, LOCAL_EMBED_RUNTIME
+
+if os.getenv("EMBEDDING_BACKEND", "gemini") != "local":
+    print("Using Google Gemini API for Embeddings (Serverless)")
+    print("Skipping local model download... (set EMBEDDING_BACKEND=local to use MiniLM)")
+else:
+    from huggingface_hub import snapshot_download
+
+    # Config, tokenizer and safetensors weights only (not the TF / Flax / OpenVINO copies)
+    patterns = ["*.json", "*.txt", "model.safetensors"]
+    if LOCAL_EMBED_RUNTIME == "onnx":
+        patterns.append("onnx/model.onnx")
+    print(f"Downloading {LOCAL_MODEL} to {MODEL_CACHE}...")
+    path = snapshot_download(LOCAL_MODEL, cache_dir=MODEL_CACHE, allow_patterns=patterns)
+    print(f"Model ready at {path}")
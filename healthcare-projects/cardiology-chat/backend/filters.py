@@ -0,0 +1,83 @@
+"""
+Metadata filters for search.
+
+Pinecone applies a `filter` to a query inside the index, before the top-k
+cut. LocalIndex and LexicalIndex evaluate the same subset of Pinecone's
+filter language with matches(), so one filter works on every backend:
+
+    {"source": "echo_2024.pdf"}                      shorthand for $eq
+    {"doc_type": {"$in": ["echo", "ecg"]}}
+    {"uploaded_at": {"$gte": 1735689600}}
+    {"$and": [{"doc_type": "lab"}, {"page": {"$lt": 3}}]}
+
+Operators: $eq, $ne, $in, $nin, $gt, $gte, $lt, $lte, $exists, $and, $or.
+A field the metadata doesn't have fails every condition except $ne, $nin and
+{"$exists": false}.
+"""
+import operator
+
+COMPARISONS = {
+    "$eq": operator.eq,
+    "$ne": operator.ne,
+    "$gt": operator.gt,
+    "$gte": operator.ge,
+    "$lt": operator.lt,
+    "$lte": operator.le,
+    "$in": lambda value, options: value in options,
+    "$nin": lambda value, options: value not in options,
+}
+MISSING_MATCHES = ("$ne", "$nin")
+
+
+def validate(filter):
+    """Raise ValueError for a filter matches() can't evaluate."""
+    if not isinstance(filter, dict):
+        raise ValueError(f"A filter must be an object, got {filter!r}")
+    for key, condition in filter.items():
+        if key in ("$and", "$or"):
+            if not isinstance(condition, list) or not condition:
+                raise ValueError(f"{key} takes a non-empty list of filters")
+            for clause in condition:
+                validate(clause)
+        elif key.startswith("$"):
+            raise ValueError(f"Unknown filter operator {key!r}")
+        elif isinstance(condition, dict):
+            for op, value in condition.items():
+                if op not in COMPARISONS and op != "$exists":
+                    raise ValueError(f"Unknown filter operator {op!r} on {key!r}")
+                if op in ("$in", "$nin") and not isinstance(value, list):
+                    raise ValueError(f"{op} on {key!r} takes a list")
+    return filter
+
+
+def matches(metadata, filter):
+    for key, condition in filter.items():
+        if key == "$and":
+            if not all(matches(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(metadata, clause) for clause in condition):
+                return False
+        elif not _field_matches(metadata, key, condition):
+            return False
+    return True
+
+
+def _field_matches(metadata, key, condition):
+    if not isinstance(condition, dict):
+        condition = {"$eq": condition}
+    present = key in metadata
+    for op, expected in condition.items():
+        if op == "$exists":
+            ok = present == bool(expected)
+        elif not present:
+            ok = op in MISSING_MATCHES
+        else:
+            try:
+                ok = COMPARISONS[op](metadata[key], expected)
+            except TypeError:
+                # e.g. a string compared with $gt to a number
+                ok = False
+        if not ok:
+            return False
+    return True
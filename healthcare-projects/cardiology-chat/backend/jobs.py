@@ -0,0 +1,130 @@
+"""
+Background upload jobs.
+
+/upload saves the PDF under UPLOAD_DIR, records a job here and returns its id
+straight away; a small pool of workers in main.py does the parsing, embedding
+and upserting. Progress is written to SQLite as pages move through the
+pipeline, so GET /jobs/{id} can report it and a job that was interrupted
+(crash, redeploy) is picked up again on startup from the first page that was
+not finished.
+"""
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+JOBS_PATH = os.getenv("JOBS_PATH", "upload_jobs.db")
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+
+COUNTERS = ("pages_parsed", "pages_embedded", "pages_upserted", "pages_unchanged")
+UNFINISHED = ("queued", "running")
+
+
+class JobStore:
+    def __init__(self, path=JOBS_PATH):
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, filename TEXT NOT NULL, path TEXT NOT NULL, status TEXT NOT NULL, "
+                "pages_total INTEGER, pages_parsed INTEGER DEFAULT 0, pages_embedded INTEGER DEFAULT 0, "
+                "pages_upserted INTEGER DEFAULT 0, pages_unchanged INTEGER DEFAULT 0, "
+                "last_page INTEGER DEFAULT -1, message TEXT, error TEXT, created_at REAL, updated_at REAL)"
+            )
+            # Added with namespaces (see vectorstore.check_namespace()); older job tables lack them
+            columns = [row[1] for row in self._db.execute("PRAGMA table_info(jobs)")]
+            if "namespace" not in columns:
+                self._db.execute("ALTER TABLE jobs ADD COLUMN namespace TEXT NOT NULL DEFAULT ''")
+            if "doc_type" not in columns:
+                self._db.execute("ALTER TABLE jobs ADD COLUMN doc_type TEXT")
+            # Chunk ids of finished pages, so a resumed run knows they are still part of the file.
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS job_pages (job_id TEXT, page INTEGER, chunk_id TEXT, "
+                "PRIMARY KEY (job_id, page, chunk_id))"
+            )
+            self._db.commit()
+
+    def create(self, filename, path, job_id=None, namespace="", doc_type=None):
+        job_id = job_id or uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs (id, filename, path, status, namespace, doc_type, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, filename, path, "queued", namespace, doc_type, now, now),
+            )
+            self._db.commit()
+        return job_id
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def update(self, job_id, **fields):
+        fields["updated_at"] = time.time()
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._db.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+            self._db.commit()
+
+    def add(self, job_id, counter, n=1):
+        if counter not in COUNTERS:
+            raise ValueError(f"unknown counter {counter!r}")
+        with self._lock:
+            self._db.execute(
+                f"UPDATE jobs SET {counter} = {counter} + ?, updated_at = ? WHERE id = ?",
+                (n, time.time(), job_id),
+            )
+            self._db.commit()
+
+    def finish_pages(self, job_id, pages, last_page):
+        """Record finished pages ({page: [chunk ids]}) and the new contiguous high-water mark."""
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR IGNORE INTO job_pages VALUES (?, ?, ?)",
+                [(job_id, page, chunk_id) for page, ids in pages.items() for chunk_id in ids],
+            )
+            self._db.execute("UPDATE jobs SET last_page = ?, updated_at = ? WHERE id = ?",
+                             (last_page, time.time(), job_id))
+            self._db.commit()
+
+    def page_ids(self, job_id):
+        with self._lock:
+            rows = self._db.execute("SELECT chunk_id FROM job_pages WHERE job_id = ?", (job_id,))
+            return {row[0] for row in rows.fetchall()}
+
+    def unfinished(self):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id FROM jobs WHERE status IN (?, ?) ORDER BY created_at", UNFINISHED
+            )
+            return [row[0] for row in rows.fetchall()]
+
+
+class PageTracker:
+    """
+    Works out the last page up to which everything is done. Pages finish out of
+    order (empty pages at once, the rest after their upsert), and only a
+    contiguous prefix is safe to skip after a restart.
+    """
+
+    def __init__(self, store, job_id, last_page):
+        self.store = store
+        self.job_id = job_id
+        self.last_page = last_page
+        self._done = {}
+        self._lock = threading.Lock()
+
+    def page_done(self, page, chunk_ids=()):
+        with self._lock:
+            self._done.setdefault(page, []).extend(chunk_ids)
+            finished = {}
+            while self.last_page + 1 in self._done:
+                self.last_page += 1
+                finished[self.last_page] = self._done.pop(self.last_page)
+            if finished:
+                self.store.finish_pages(self.job_id, finished, self.last_page)
@@ -0,0 +1,217 @@
+"""
+Lexical (BM25) side of hybrid retrieval.
+
+Dense retrieval sometimes ranks chunks with the exact clinical term the user
+typed ("ICDs", "CRT", "dyspnea", "beta blockers") below vaguer ones.
+LexicalIndex is a small inverted index, term -> posting arrays (row, term
+frequency), kept in sync with the vector index by IngestPipeline (added after
+each upsert, removed with stale chunks) and persisted to SQLite so ingest.py
+and the API share it. BM25 scores are accumulated with NumPy over the posting
+arrays of the query terms only, which is well under a millisecond on our
+corpus.
+
+Every document belongs to a namespace (a tenant or patient, "" by default,
+as in the vector index), and search() only ranks documents of the requested
+namespace that pass the metadata `filter` (see filters.py), before the top-k
+cut. Term statistics (IDF, average length) stay corpus-wide.
+
+reciprocal_rank_fusion() merges the BM25 and dense rankings.
+"""
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from collections import Counter
+
+import numpy as np
+
+from filters import matches as filter_matches, validate as validate_filter
+
+LEXICAL_INDEX_PATH = os.getenv("LEXICAL_INDEX_PATH", "lexical_index.db")
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+STOPWORDS = frozenset("""
+a an and are as at be by can do does for from has have how i in is it its my of on or so that the their
+there these this to was what when where which who why will with you your
+el la los las un una unos unas y o de del en que es por para con como se su sus al lo qué cómo cuál
+""".split())
+
+
+def tokenize(text):
+    text = unicodedata.normalize("NFKC", text).casefold()
+    tokens = []
+    for token in re.findall(r"\w+", text):
+        if token in STOPWORDS:
+            continue
+        # Fold simple plurals so "ICDs" finds "ICD" and "arrhythmias" finds "arrhythmia".
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+class LexicalIndex:
+    def __init__(self, path=LEXICAL_INDEX_PATH, k1=BM25_K1, b=BM25_B):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS documents (id TEXT PRIMARY KEY, terms TEXT NOT NULL, metadata TEXT)"
+        )
+        columns = [row[1] for row in self._db.execute("PRAGMA table_info(documents)")]
+        if "namespace" not in columns:
+            self._db.execute("ALTER TABLE documents ADD COLUMN namespace TEXT NOT NULL DEFAULT ''")
+        self._db.commit()
+        self._load()
+
+    def _load(self):
+        # Read before the rows, so a commit that lands in between triggers another reload
+        self._version = self._data_version()
+        self._rows = {}        # id -> row
+        self._ids = []         # row -> id (None when free)
+        self._metadata = []    # row -> metadata
+        self._terms = []       # row -> Counter
+        self._lengths = np.zeros(0, dtype=np.float32)
+        self._namespace_codes = np.zeros(0, dtype=np.int32)  # row -> namespace code
+        self._codes = {}       # namespace -> code
+        self._free = []
+        self._postings = {}    # term -> {row: tf}
+        self._arrays = {}      # term -> (rows, tfs), rebuilt when the term changes
+        self._total_length = 0
+        for doc_id, terms, metadata, namespace in self._db.execute(
+                "SELECT id, terms, metadata, namespace FROM documents"):
+            self._insert(doc_id, Counter(json.loads(terms)), json.loads(metadata), namespace)
+
+    def _data_version(self):
+        # Changes whenever another connection (e.g. ingest.py) commits to the file, never on our own
+        # commits: only _load() may record it, or another process's writes would be skipped.
+        return self._db.execute("PRAGMA data_version").fetchone()[0]
+
+    def _refresh(self):
+        if self._data_version() != self._version:
+            self._load()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def has(self, doc_id):
+        return doc_id in self._rows
+
+    def add(self, chunks, namespace=""):
+        """Index chunks ([{"id", "text", "metadata"}]); re-adding an id replaces it."""
+        rows = []
+        with self._lock:
+            self._refresh()
+            for chunk in chunks:
+                terms = Counter(tokenize(chunk["text"]))
+                self._delete(chunk["id"])
+                self._insert(chunk["id"], terms, chunk["metadata"], namespace)
+                rows.append((chunk["id"], json.dumps(terms), json.dumps(chunk["metadata"]), namespace))
+            self._db.executemany(
+                "INSERT OR REPLACE INTO documents (id, terms, metadata, namespace) VALUES (?, ?, ?, ?)", rows
+            )
+            self._db.commit()
+
+    def remove(self, ids):
+        with self._lock:
+            self._refresh()
+            for doc_id in ids:
+                self._delete(doc_id)
+            self._db.executemany("DELETE FROM documents WHERE id = ?", [(doc_id,) for doc_id in ids])
+            self._db.commit()
+
+    def _insert(self, doc_id, terms, metadata, namespace=""):
+        if self._free:
+            row = self._free.pop()
+        else:
+            row = len(self._ids)
+            self._ids.append(None)
+            self._metadata.append(None)
+            self._terms.append(None)
+            if row >= len(self._lengths):
+                self._lengths = np.concatenate([self._lengths, np.zeros(max(64, row), dtype=np.float32)])
+                self._namespace_codes = np.concatenate(
+                    [self._namespace_codes, np.zeros(len(self._lengths) - len(self._namespace_codes), dtype=np.int32)]
+                )
+        self._rows[doc_id] = row
+        self._ids[row] = doc_id
+        self._metadata[row] = metadata
+        self._terms[row] = terms
+        self._namespace_codes[row] = self._codes.setdefault(namespace, len(self._codes))
+        length = sum(terms.values())
+        self._lengths[row] = length
+        self._total_length += length
+        for term, tf in terms.items():
+            self._postings.setdefault(term, {})[row] = tf
+            self._arrays.pop(term, None)
+
+    def _delete(self, doc_id):
+        row = self._rows.pop(doc_id, None)
+        if row is None:
+            return
+        for term in self._terms[row]:
+            postings = self._postings[term]
+            del postings[row]
+            if not postings:
+                del self._postings[term]
+            self._arrays.pop(term, None)
+        self._total_length -= self._lengths[row]
+        self._lengths[row] = 0
+        self._ids[row] = self._metadata[row] = self._terms[row] = None
+        self._free.append(row)
+
+    def _posting_arrays(self, term):
+        arrays = self._arrays.get(term)
+        if arrays is None:
+            postings = self._postings[term]
+            arrays = (np.fromiter(postings.keys(), dtype=np.int64, count=len(postings)),
+                      np.fromiter(postings.values(), dtype=np.float32, count=len(postings)))
+            self._arrays[term] = arrays
+        return arrays
+
+    def search(self, query, top_k=10, namespace="", filter=None):
+        """[{"id", "score", "metadata"}] for the best BM25 matches in `namespace`, best first."""
+        if filter:
+            validate_filter(filter)
+        terms = list(dict.fromkeys(tokenize(query)))
+        with self._lock:
+            self._refresh()
+            terms = [term for term in terms if term in self._postings]
+            if not terms or not self._rows or namespace not in self._codes:
+                return []
+            n = len(self._rows)
+            average_length = self._total_length / n
+            scores = np.zeros(len(self._ids), dtype=np.float32)
+            for term in terms:
+                rows, tfs = self._posting_arrays(term)
+                idf = math.log(1 + (n - len(rows) + 0.5) / (len(rows) + 0.5))
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[rows] / average_length)
+                scores[rows] += idf * tfs * (self.k1 + 1) / (tfs + norm)
+
+            hits = np.flatnonzero(scores)
+            hits = hits[self._namespace_codes[hits] == self._codes[namespace]]
+            if filter:
+                hits = np.array([row for row in hits if filter_matches(self._metadata[row], filter)], dtype=np.int64)
+            if len(hits) > top_k:
+                hits = hits[np.argpartition(-scores[hits], top_k - 1)[:top_k]]
+            hits = hits[np.argsort(-scores[hits])]
+            return [{"id": self._ids[row], "score": float(scores[row]), "metadata": self._metadata[row]}
+                    for row in hits]
+
+
+def reciprocal_rank_fusion(rankings, top_k=3, k=60):
+    """
+    Merge ranked match lists (dense and BM25 matches, each with "id" and
+    "metadata") into [{"id", "score", "metadata"}], score = sum(1 / (k + rank)).
+    """
+    fused = {}
+    for ranking in rankings:
+        for rank, match in enumerate(ranking, start=1):
+            entry = fused.setdefault(match["id"], {"id": match["id"], "score": 0.0, "metadata": match["metadata"]})
+            entry["score"] += 1.0 / (k + rank)
+    return sorted(fused.values(), key=lambda match: match["score"], reverse=True)[:top_k]
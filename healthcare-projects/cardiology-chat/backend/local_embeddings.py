@@ -0,0 +1,107 @@
+"""
+Local CPU embeddings with all-MiniLM-L6-v2 (384 dimensions), used instead of
+the Gemini embedding API with EMBEDDING_BACKEND=local.
+
+- The model is loaded from model_cache/ (download_model.py fetches the
+  weights once) with the Hugging Face hub offline, so embedding never leaves
+  the machine.
+- embed_documents() encodes in batches of LOCAL_EMBED_BATCH texts sorted by
+  length, so each batch pads to about the same length. Concurrent /chat
+  questions already reach it as one batch (see batcher.py).
+- LOCAL_EMBED_WORKERS > 1 spreads the batches over a process pool, one model
+  copy with one thread per worker. Small batches scale across cores better
+  that way than through torch's intra-op threads. With 0 (the default) torch
+  encodes in-process on LOCAL_EMBED_THREADS threads (0 = all cores).
+- LOCAL_EMBED_RUNTIME picks the runtime: torch (float32), int8 (torch
+  dynamic quantization of the Linear layers) or onnx (onnxruntime through
+  sentence-transformers' ONNX backend, needs `optimum[onnxruntime]`).
+  benchmarks/embed_local.py reports speed and agreement with float32.
+
+MiniLM embeds queries and documents the same way, so Gemini's task_type is
+ignored.
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+LOCAL_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+LOCAL_DIMENSION = 384
+MODEL_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "model_cache")
+LOCAL_EMBED_RUNTIME = os.getenv("LOCAL_EMBED_RUNTIME", "torch")
+LOCAL_EMBED_BATCH = int(os.getenv("LOCAL_EMBED_BATCH", "32"))
+LOCAL_EMBED_WORKERS = int(os.getenv("LOCAL_EMBED_WORKERS", "0"))
+LOCAL_EMBED_THREADS = int(os.getenv("LOCAL_EMBED_THREADS", "0"))
+
+_worker_model = None
+
+
+def load_model(runtime=LOCAL_EMBED_RUNTIME, threads=LOCAL_EMBED_THREADS):
+    if runtime not in ("torch", "int8", "onnx"):
+        raise ValueError(f"Unknown LOCAL_EMBED_RUNTIME {runtime!r} (use 'torch', 'int8' or 'onnx')")
+    # Read by huggingface_hub at import time
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    if threads:
+        torch.set_num_threads(threads)
+    try:
+        if runtime == "onnx":
+            return SentenceTransformer(LOCAL_MODEL, cache_folder=MODEL_CACHE, device="cpu", backend="onnx")
+        model = SentenceTransformer(LOCAL_MODEL, cache_folder=MODEL_CACHE, device="cpu")
+    except OSError as e:
+        raise RuntimeError(f"{LOCAL_MODEL} is not in {MODEL_CACHE}; run "
+                           f"`EMBEDDING_BACKEND=local python download_model.py` first") from e
+    if runtime == "int8":
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return model
+
+
+def _init_worker(runtime):
+    global _worker_model
+    _worker_model = load_model(runtime, threads=1)
+
+
+def _encode(texts, batch_size):
+    return _worker_model.encode(texts, batch_size=batch_size, normalize_embeddings=True)
+
+
+class LocalEmbeddings:
+    def __init__(self, runtime=LOCAL_EMBED_RUNTIME, batch_size=LOCAL_EMBED_BATCH, workers=LOCAL_EMBED_WORKERS,
+                 threads=LOCAL_EMBED_THREADS):
+        self.runtime = runtime
+        self.batch_size = batch_size
+        self.workers = workers
+        self._model = None
+        self._pool = None
+        if workers > 1:
+            # spawn: torch's thread pools don't survive a fork
+            self._pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"),
+                                             initializer=_init_worker, initargs=(runtime,))
+        else:
+            self._model = load_model(runtime, threads)
+
+    def embed_documents(self, texts, **kwargs):
+        texts = list(texts)
+        if not texts:
+            return []
+        if self._pool is None:
+            # encode() sorts by length and batches internally
+            return self._model.encode(texts, batch_size=self.batch_size, normalize_embeddings=True).tolist()
+
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        batches = [order[i:i + self.batch_size] for i in range(0, len(order), self.batch_size)]
+        results = self._pool.map(_encode, [[texts[i] for i in batch] for batch in batches],
+                                 [self.batch_size] * len(batches))
+        vectors = [None] * len(texts)
+        for batch, encoded in zip(batches, results):
+            for i, vector in zip(batch, encoded):
+                vectors[i] = vector.tolist()
+        return vectors
+
+    def embed_query(self, text, **kwargs):
+        return self.embed_documents([text])[0]
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
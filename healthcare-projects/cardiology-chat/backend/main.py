@@ -1,18 +1,58 @@
 import os
-import io
+import json
 import uuid
-from fastapi import FastAPI, HTTPException, UploadFile, File
+import shutil
+import asyncio
+import time
+from typing import Optional
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, field_validator
 from dotenv import load_dotenv
-import google.generativeai as genai
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from pinecone import Pinecone
-from pypdf import PdfReader
 
 # 1. Setup
+# Before the local modules: they read their settings from the environment on import
 load_dotenv()
-app = FastAPI()
+
+from batcher import EmbeddingBatcher
+from cache import EmbeddingCache, SemanticCache
+from clients import Clients, EMBEDDING_MODEL, EMBEDDING_RPM, WARMUP
+from filters import validate as validate_filter
+from jobs import JobStore, PageTracker, UPLOAD_DIR
+from lexical import LexicalIndex, reciprocal_rank_fusion
+from manifest import Manifest, content_hash, delete_vectors
+from metrics import STAGE_SECONDS, TraceMiddleware, UpstreamError, get_logger, registry, request_id, request_stages, stage
+from pdf_text import iter_pages, page_count
+from prompt import SYSTEM_INSTRUCTIONS, build_context, build_prompt
+from pipeline import IngestPipeline
+from sessions import open_sessions
+from scheduler import EmbeddingScheduler, TokenBucket, EMBED_MAX_IN_FLIGHT
+from vectorstore import check_namespace
+
+@asynccontextmanager
+async def lifespan(app):
+    # Build the upstream clients (SDK imports, connection pools) before serving,
+    # and optionally open their connections with one cheap call each
+    await asyncio.to_thread(clients.start)
+    logger.info("clients ready: " + " ".join(f"{name}={seconds * 1000:.0f}ms" for name, seconds in clients.startup.items()))
+    if WARMUP:
+        for name, seconds, error in await clients.warm_up():
+            if error is None:
+                logger.info(f"warm-up {name}: {seconds * 1000:.0f}ms")
+            else:
+                logger.warning(f"warm-up {name} failed: {error}")
+    # Start the upload workers and pick up jobs a previous process didn't finish
+    workers = [asyncio.create_task(upload_worker()) for _ in range(UPLOAD_WORKERS)]
+    for job_id in jobs.unfinished():
+        upload_queue.put_nowait(job_id)
+    yield
+    for worker in workers:
+        worker.cancel()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -20,7 +60,11 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID"],
 )
+# Trace ID per request (X-Request-ID) and request counts by route and status
+app.add_middleware(TraceMiddleware)
+logger = get_logger()
 
 @app.get("/")
 @app.head("/")
@@ -28,145 +72,399 @@ def read_root():
     return {"message": "Cardiology AI Backend is Running!"}
 
 # Initialize Tools
-# Pinecone
-pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
-index = pc.Index("medical-chatbot-local")
-
-# Gemini (Direct SDK)
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-model = genai.GenerativeModel('gemini-2.0-flash')
-
-# Embeddings (Gemini API - Lightweight)
-# Embeddings (HuggingFace - Local/Server-Side)
-# Embeddings (Gemini API - Multilingual & Serverless)
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-# No local model to download, uses the API
-embeddings = GoogleGenerativeAIEmbeddings(
-    model="models/text-embedding-004",
-    google_api_key=os.getenv("GOOGLE_API_KEY")
+# Vector index, Gemini model and embeddings; built at startup by lifespan() or on first use (see clients.py)
+clients = Clients(system_instruction=SYSTEM_INSTRUCTIONS)
+
+# Query embedding cache (LRU + TTL). Set EMBED_CACHE_PATH to keep it across restarts.
+embedding_cache = EmbeddingCache(
+    namespace=EMBEDDING_MODEL,
+    max_entries=int(os.getenv("EMBED_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("EMBED_CACHE_TTL", "86400")),
+    path=os.getenv("EMBED_CACHE_PATH") or None,
+)
+
+# Concurrent questions are embedded together in one batched call (see batcher.py).
+# RETRIEVAL_QUERY gives the same vectors as embed_query.
+query_batcher = EmbeddingBatcher(lambda texts: clients.embeddings.embed_documents(texts, task_type="RETRIEVAL_QUERY"))
+
+# Semantic answer cache: paraphrases that retrieve the same context reuse the answer.
+# Cleared whenever /upload or DELETE /documents changes the index.
+semantic_cache = SemanticCache(
+    threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95")),
+    max_entries=int(os.getenv("SEMANTIC_CACHE_SIZE", "512")),
 )
 
+# Conversation memory per conversation_id: recent turns + a rolling summary (see sessions.py)
+sessions = open_sessions()
+
+# Tracks what is already in the index, so re-uploading a PDF doesn't duplicate it
+manifest = Manifest(model=EMBEDDING_MODEL)
+# BM25 index over the same chunks, fused with the dense results (see lexical.py)
+lexical = LexicalIndex()
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "1") == "1"
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "10"))
+# All uploads draw from the same embedding quota
+embed_bucket = TokenBucket(EMBEDDING_RPM, capacity=EMBED_MAX_IN_FLIGHT)
+
+# Concurrency
+# The Pinecone and embedding clients are blocking, so they run in the threadpool
+# instead of on the event loop. The semaphore caps how many questions are in
+# flight against the upstream APIs at once; the rest wait their turn.
+MAX_CONCURRENT_CHATS = int(os.getenv("MAX_CONCURRENT_CHATS", "16"))
+chat_slots = asyncio.Semaphore(MAX_CONCURRENT_CHATS)
+
+# Uploads are indexed in the background by UPLOAD_WORKERS workers; /upload only
+# saves the file and queues a job.
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", "2"))
+upload_queue = asyncio.Queue()
+jobs = JobStore()
+os.makedirs(UPLOAD_DIR, exist_ok=True)
+
 class ChatRequest(BaseModel):
     question: str
+    # Optional: turns sent with the same ID share the conversation history
+    conversation_id: Optional[str] = None
+    # Optional: search this tenant's / patient's uploads instead of the shared knowledge base,
+    # and only chunks whose metadata matches `filter` (source, doc_type, uploaded_at, page; see filters.py)
+    namespace: Optional[str] = None
+    filter: Optional[dict] = None
 
-@app.post("/upload")
-async def upload_pdf(file: UploadFile = File(...)):
-    try:
-        # 1. Read PDF
-        content = await file.read()
-        pdf_reader = PdfReader(io.BytesIO(content))
-        
-        text_chunks = []
-        for i, page in enumerate(pdf_reader.pages):
-            text = page.extract_text()
-            if text:
-                text_chunks.append(text)
-        
-        if not text_chunks:
-            return {"message": "No text found in PDF"}
+    @field_validator("namespace")
+    @classmethod
+    def valid_namespace(cls, value):
+        return check_namespace(value)
+
+    @field_validator("filter")
+    @classmethod
+    def valid_filter(cls, value):
+        return validate_filter(value) if value else None
+
+async def embed_question(question):
+    vector = embedding_cache.get(question)
+    if vector is None:
+        with stage("embed", service="embedding"):
+            vector = await query_batcher.embed(question)
+        # With EMBED_CACHE_PATH set, put() is a SQLite write and commit; keep it off the event loop
+        await run_in_threadpool(embedding_cache.put, question, vector)
+    return vector
+
+async def search_index(vector, question, top_k=3, namespace="", filter=None):
+    # The namespace and the metadata filter are applied inside both searches, before their top-k
+    scope = {"namespace": namespace or "", "filter": filter or None}
+    if not HYBRID_SEARCH:
+        with stage("retrieve", service="vector_index"):
+            return await run_in_threadpool(clients.index.query, vector=vector, top_k=top_k, include_metadata=True,
+                                           **scope)
+    # Dense and BM25 candidates, merged with reciprocal rank fusion
+    with stage("retrieve", service="vector_index"):
+        dense = await run_in_threadpool(clients.index.query, vector=vector, top_k=HYBRID_CANDIDATES,
+                                        include_metadata=True, **scope)
+    with stage("lexical"):
+        keyword = lexical.search(question, HYBRID_CANDIDATES, **scope)
+    return {"matches": reciprocal_rank_fusion([dense['matches'], keyword], top_k=top_k)}
+
+async def generate_answer(prompt):
+    with stage("generate", service="llm"):
+        response = await clients.model.generate_content_async(prompt)
+        return response.text
+
+async def stream_answer(prompt):
+    start = time.perf_counter()
+    first = True
+    with stage("generate", service="llm"):
+        response = await clients.model.generate_content_async(prompt, stream=True)
+        async for chunk in response:
+            if chunk.text:
+                if first:
+                    STAGE_SECONDS.observe(time.perf_counter() - start, "first_token")
+                    first = False
+                yield chunk.text
+
+async def retrieve_context(question, namespace="", filter=None):
+    # 1. Embed the user's question
+    vector = await embed_question(question)
+    
+    # 2. Search the index for similar info (vector + keyword), within the namespace and filter
+    search_results = await search_index(vector, question, namespace=namespace, filter=filter)
+    return vector, search_results['matches']
+
+def make_prompt(matches, question, session=None):
+    # 3. Combine info into a "Context" (deduplicated, within the token budget), after the earlier turns
+    with stage("prompt"):
+        context = build_context([match['metadata']['text'] for match in matches])
+        return build_prompt(context, question, session.history() if session else "")
+
+def load_session(request):
+    # The conversation so far, and the text to retrieve with: follow-ups like "what about its
+    # side effects?" are searched together with the previous questions
+    session = sessions.get(request.conversation_id) if request.conversation_id else None
+    query = session.condensed_query(request.question) if session else request.question
+    return session, query
+
+def log_request(endpoint, status, stages, start):
+    # One line per question with where the time went, tagged with the request ID
+    total = time.perf_counter() - start
+    STAGE_SECONDS.observe(total, "total")
+    timings = " ".join(f"{name}={seconds * 1000:.0f}ms" for name, seconds in stages.items())
+    logger.info(f"{endpoint} {status} total={total * 1000:.0f}ms {timings}")
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def page_chunks(job, page):
+    i, text = page
+    if not text:
+        return []
+    # Stable ID per page: [namespace/]filename_page_contenthash. The namespace prefix keeps
+    # IDs unique across tenants in the manifest, the BM25 index and the answer cache.
+    prefix = f"{job['namespace']}/" if job["namespace"] else ""
+    metadata = {"text": text, "source": job["filename"], "page": i, "uploaded_at": job["created_at"]}
+    if job["doc_type"]:
+        metadata["doc_type"] = job["doc_type"]
+    return [{"id": f"{prefix}{job['filename']}_p{i}_{content_hash(text)[:12]}", "text": text, "metadata": metadata}]
+
+def save_upload(src, path):
+    # Stream to disk in chunks instead of holding the whole PDF in memory
+    with open(path, "wb") as dst:
+        shutil.copyfileobj(src, dst, 1024 * 1024)
 
-        # 2. Embed Chunks
-        vectors = embeddings.embed_documents(text_chunks)
+def job_progress(job_id, tracker, stage, items):
+    if stage == "load":
+        page, text = items
+        jobs.add(job_id, "pages_parsed")
+        if not text:
+            tracker.page_done(page)
+    elif stage == "embed":
+        jobs.add(job_id, "pages_embedded", len(items))
+    elif stage in ("upsert", "skip"):
+        jobs.add(job_id, "pages_upserted" if stage == "upsert" else "pages_unchanged", len(items))
+        for chunk in items:
+            tracker.page_done(chunk["metadata"]["page"], [chunk["id"]])
+
+def process_upload(job_id):
+    job = jobs.get(job_id)
+    # Resume after the last page that was fully indexed (0 for a new job)
+    start = job["last_page"] + 1
+    try:
+        jobs.update(job_id, status="running", pages_parsed=start)
+        jobs.update(job_id, pages_total=page_count(job["path"]))
         
-        # 3. Upsert to Pinecone
-        to_upsert = []
-        for i, (text, vector) in enumerate(zip(text_chunks, vectors)):
-            # Create unique ID: filename_page_uuid
-            chunk_id = f"{file.filename}_p{i}_{str(uuid.uuid4())[:8]}"
-            to_upsert.append((chunk_id, vector, {"text": text, "source": file.filename}))
+        # Parse -> embed -> upsert, pipelined (only pages that are new or changed)
+        tracker = PageTracker(jobs, job_id, job["last_page"])
+        pipeline = IngestPipeline(
+            clients.index,
+            manifest,
+            clients.embeddings.embed_documents,
+            chunk_fn=lambda page: page_chunks(job, page),
+            scheduler=EmbeddingScheduler(clients.embeddings.embed_documents, bucket=embed_bucket),
+            progress=lambda stage, items: job_progress(job_id, tracker, stage, items),
+            lexical=lexical,
+            namespace=job["namespace"],
+        )
+        done_ids = jobs.page_ids(job_id)
+        # Pages are extracted lazily (by a process pool for long files), in order, so embedding
+        # starts while later pages are still being parsed. Empty pages are yielded too, so job
+        # progress can count them as done.
+        result = pipeline.run(iter_pages(job["path"], start), seen={job["filename"]: done_ids})
         
-        index.upsert(vectors=to_upsert)
+        if result["upserted"] or result["deleted"]:
+            semantic_cache.clear()
         
-        return {"message": f"Successfully processed {len(text_chunks)} pages from {file.filename}"}
+        if result["failed"]:
+            raise RuntimeError(f"{result['failed']} of {result['chunks']} pages could not be indexed")
         
+        if not result["chunks"] and not done_ids:
+            message = "No text found in PDF"
+        else:
+            message = (f"Successfully processed {result['chunks'] + len(done_ids)} pages from {job['filename']} "
+                       f"({result['upserted']} new or changed, {result['deleted']} removed)")
+        jobs.update(job_id, status="done", message=message)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Upload Error: {str(e)}")
+        jobs.update(job_id, status="failed", error=f"Upload Error: {str(e)}")
+    if os.path.exists(job["path"]):
+        os.remove(job["path"])
 
-@app.post("/chat")
-async def chat(request: ChatRequest):
+async def upload_worker():
+    while True:
+        job_id = await upload_queue.get()
+        try:
+            await run_in_threadpool(process_upload, job_id)
+        finally:
+            upload_queue.task_done()
+
+@registry.collector
+def cache_metrics():
+    caches = {"embeddings": embedding_cache.stats(), "answers": semantic_cache.stats()}
+    session_stats = sessions.stats()
+    return [
+        ("cache_hits_total", "counter", "Cache hits.", [({"cache": name}, s["hits"]) for name, s in caches.items()]),
+        ("cache_misses_total", "counter", "Cache misses.", [({"cache": name}, s["misses"]) for name, s in caches.items()]),
+        ("cache_hit_ratio", "gauge", "Cache hits / lookups.", [({"cache": name}, s["hit_ratio"]) for name, s in caches.items()]),
+        ("cache_entries", "gauge", "Entries held by each cache.", [({"cache": name}, s["entries"]) for name, s in caches.items()]),
+        ("embedding_batch_requests_total", "counter", "Questions sent to the query embedding batcher.",
+         [({}, query_batcher.stats["requests"])]),
+        ("embedding_batch_calls_total", "counter", "Batched query embedding calls.", [({}, query_batcher.stats["calls"])]),
+        ("chat_sessions", "gauge", "Conversations held in the session store.", [({}, session_stats["sessions"])]),
+        ("chat_session_bytes", "gauge", "Bytes of conversation text held.", [({}, session_stats["bytes"])]),
+        ("upload_queue_depth", "gauge", "Upload jobs waiting for a worker.", [({}, upload_queue.qsize())]),
+    ]
+
+@app.get("/metrics")
+def metrics():
+    # Prometheus text format
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/cache/stats")
+def cache_stats():
+    return {"embeddings": embedding_cache.stats(), "answers": semantic_cache.stats(),
+            "embedding_batches": query_batcher.stats, "sessions": sessions.stats()}
+
+@app.post("/upload", status_code=202)
+async def upload_pdf(file: UploadFile = File(...), namespace: str = Form(""), doc_type: Optional[str] = Form(None)):
+    # Optional form fields: the tenant / patient namespace to index the report into, and its
+    # document type ("echo", "ecg", "lab", ...), both usable in /chat filters
     try:
-        # 1. Embed the user's question
-        vector = embeddings.embed_query(request.question)
-        
-        # 2. Search Pinecone for similar info
-        search_results = index.query(vector=vector, top_k=3, include_metadata=True)
-        
-        # 3. Combine info into a "Context"
-        context = ""
-        for match in search_results['matches']:
-            context += match['metadata']['text'] + "\n\n"
-        
-        # 4. Ask Gemini
-        prompt = f"""You are a medical educational assistant. Follow these rules strictly in every response:
-
-        1. Language Consistency
-        - Always respond in the same language used in the user's most recent message.
-        - Never switch languages unless the user explicitly switches.
-        - The disclaimer must always be in the same language as the answer.
-
-        2. No Meta Statements
-        - Do NOT use phrases such as: "Based on general knowledge…", "As an AI model…", "According to my training data…", "I cannot diagnose…"
-        - Just answer directly and educationally.
-
-        3. Simple Language
-        - Explain medical concepts using clear, simple, everyday language.
-        - Avoid unnecessary medical jargon.
-        - If you must use a medical term, explain it briefly and plainly.
-        - Keep sentences short and easy to understand.
-
-        4. Diagnostic Reasoning
-        - When given clinical information (EKG, symptoms, labs, reports):
-        - Identify the most likely specific diagnosis, not a broad category.
-        - Base the reasoning only on the information provided.
-        - Do not add or assume data that is not in the case.
-        - If the diagnosis is uncertain, state the most likely possibilities and why.
-
-        5. Treatment Explanations
-        - You may explain general treatment concepts for educational purposes.
-        - Do NOT provide medication doses, specific medical instructions, or personalized treatment plans.
-        - Never tell the user what they “should” do medically.
-
-        6. Style Consistency
-        - Be clear, direct, and concise.
-        - No long introductions.
-        - No filler or unnecessary repetition.
-        - Maintain the same tone across the whole conversation.
-
-        7. Conversation Memory
-        - Maintain context from previous turns.
-        - Do not restart the conversation unless the user requests it.
-        - Keep the language, style, and tone consistent across multiple messages.
-
-        8. Always End with a Disclaimer
-        - If the answer is about health, illness, diagnosis, treatment, symptoms, labs, EKG, tests, or anything medical, add this exact sentence at the end:
+        namespace = check_namespace(namespace)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    try:
+        # 1. Save the PDF to disk
+        job_id = uuid.uuid4().hex
+        path = os.path.join(UPLOAD_DIR, f"{job_id}.pdf")
+        await run_in_threadpool(save_upload, file.file, path)
         
-        Spanish:
-        "Este contenido es solo educativo y no sustituye una evaluación médica profesional."
+        # 2. Queue it; the workers parse, embed and upsert it
+        jobs.create(file.filename, path, job_id, namespace=namespace, doc_type=doc_type or None)
+        await upload_queue.put(job_id)
         
-        English:
-        "This content is for educational purposes only and does not replace professional medical evaluation."
+        return {"job_id": job_id, "status": "queued",
+                "message": f"Processing {file.filename} in the background"}
         
-        Use only the version that matches the language of the response.
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Upload Error: {str(e)}")
 
-        9. Context Usage (CRITICAL)
-        - The 'Medical Context' may contain specific patient reports (e.g., "John Doe").
-        - If the user asks a GENERAL question (e.g., "How long do heart attacks last?"), answer using GENERAL medical knowledge. Do NOT mention the specific patient from the context.
-        - If the user asks about THE PATIENT (e.g., "What is his diagnosis?", "How long has he had symptoms?"), strictly use the 'Medical Context'.
-        - Do not confuse general medical facts with the specific patient's history.
+@app.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    job.pop("path")
+    job["pages_done"] = job.pop("last_page") + 1
+    return job
 
-        Medical Context:
-        {context}
+@app.get("/documents")
+def list_documents(namespace: str = ""):
+    # Indexed sources in a namespace, with their chunk counts
+    try:
+        namespace = check_namespace(namespace)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return {"namespace": namespace, "sources": manifest.sources(namespace)}
 
-        Question: {request.question}
-        """
-        
-        response = model.generate_content(prompt)
+@app.delete("/documents")
+def delete_documents(source: str, namespace: str = ""):
+    # Removes every chunk of a source (e.g. an uploaded report) from the vector index,
+    # the BM25 index and the manifest, in batches
+    try:
+        namespace = check_namespace(namespace)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    ids = list(manifest.known(source, namespace))
+    if not ids:
+        raise HTTPException(status_code=404, detail=f"No chunks from {source!r} in namespace {namespace!r}")
+    try:
+        delete_vectors(clients.index, ids, namespace=namespace)
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Delete Error: {str(e)}")
+    lexical.remove(ids)
+    manifest.forget(ids)
+    semantic_cache.clear()
+    return {"source": source, "namespace": namespace, "deleted": len(ids)}
+
+@app.post("/chat")
+async def chat(request: ChatRequest):
+    stages = {}
+    request_stages.set(stages)
+    start = time.perf_counter()
+    status = 200
+    try:
+        async with chat_slots:
+            generation = semantic_cache.generation
+            session, query = load_session(request)
+            vector, matches = await retrieve_context(query, request.namespace, request.filter)
+            context_ids = [match['id'] for match in matches]
+            
+            # Cached answers are only reused for the first turn; later ones depend on the history
+            answer = semantic_cache.lookup(vector, context_ids) if session is None else None
+            if answer is None:
+                # 4. Ask Gemini
+                answer = await generate_answer(make_prompt(matches, request.question, session))
+                if session is None:
+                    semantic_cache.store(vector, context_ids, answer, generation)
+            if request.conversation_id:
+                sessions.add_turn(request.conversation_id, request.question, answer)
         
-        return {"answer": response.text}
+        return {"answer": answer}
     except Exception as e:
-        # Return the actual error message to help debugging
-        return {"answer": f"**System Error:** {str(e)}"}
+        # 502 when an upstream service (embeddings, index, Gemini) failed, 500 for our own bugs.
+        # The body still carries the message, plus the request ID to find it in the logs.
+        status = 502 if isinstance(e, UpstreamError) else 500
+        logger.exception("chat failed")
+        return JSONResponse(status_code=status,
+                            content={"answer": f"**System Error:** {str(e)}", "request_id": request_id.get()})
+    finally:
+        log_request("/chat", status, stages, start)
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    # Server-sent events: a "retrieval" event with the matched sources first,
+    # then one "token" event per generated chunk, then "done" (or "error").
+    async def events():
+        stages = {}
+        request_stages.set(stages)
+        start = time.perf_counter()
+        status = "done"
+        try:
+            async with chat_slots:
+                generation = semantic_cache.generation
+                session, query = load_session(request)
+                vector, matches = await retrieve_context(query, request.namespace, request.filter)
+                context_ids = [match['id'] for match in matches]
+                yield sse_event("retrieval", {"matches": [
+                    {"id": match['id'], "score": match.get('score'), "source": match['metadata'].get('source')}
+                    for match in matches
+                ]})
+                
+                answer = semantic_cache.lookup(vector, context_ids) if session is None else None
+                if answer is not None:
+                    yield sse_event("token", {"text": answer})
+                else:
+                    parts = []
+                    async for text in stream_answer(make_prompt(matches, request.question, session)):
+                        parts.append(text)
+                        yield sse_event("token", {"text": text})
+                    answer = "".join(parts)
+                    if session is None:
+                        semantic_cache.store(vector, context_ids, answer, generation)
+                if request.conversation_id:
+                    sessions.add_turn(request.conversation_id, request.question, answer)
+            yield sse_event("done", {})
+        except Exception as e:
+            # The 200 status is already sent; the event says whether an upstream service failed
+            status = "error"
+            logger.exception("chat stream failed")
+            yield sse_event("error", {"detail": str(e), "upstream": isinstance(e, UpstreamError),
+                                      "request_id": request_id.get()})
+        finally:
+            log_request("/chat/stream", status, stages, start)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    # Keep idle client connections open longer than the load balancer's idle timeout
+    uvicorn.run(app, host="0.0.0.0", port=8000, timeout_keep_alive=int(os.getenv("KEEPALIVE_TIMEOUT", "75")))
\ No newline at end of file
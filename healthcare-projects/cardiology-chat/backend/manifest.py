@@ -0,0 +1,96 @@
+"""
+Ingestion manifest.
+
+A small SQLite file that remembers which chunks are already in the vector
+index, with a content hash per chunk. Before embedding, a source's fresh
+chunks are diffed against it: only new or changed chunks get embedded and
+upserted, and chunks that disappeared are deleted from the index. Re-ingesting
+an unchanged corpus (or re-uploading the same PDF) makes no embedding calls.
+
+Chunks are recorded only after their upsert succeeds, so a failed run simply
+picks them up again next time. The manifest also remembers which embedding
+model produced the vectors: opening it with another model forgets every
+chunk, so the next ingest re-embeds the whole corpus.
+
+Sources are tracked per namespace (see vectorstore.check_namespace()): two
+patients' uploads named "echo.pdf" are two different sources.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+MANIFEST_PATH = os.getenv("MANIFEST_PATH", "index_manifest.db")
+# The only embedding model before the manifest recorded it
+LEGACY_MODEL = "models/text-embedding-004"
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class Manifest:
+    def __init__(self, path=MANIFEST_PATH, model=None):
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS chunks ("
+                "id TEXT PRIMARY KEY, source TEXT NOT NULL, content_hash TEXT NOT NULL, updated_at REAL)"
+            )
+            columns = [row[1] for row in self._db.execute("PRAGMA table_info(chunks)")]
+            if "namespace" not in columns:
+                self._db.execute("ALTER TABLE chunks ADD COLUMN namespace TEXT NOT NULL DEFAULT ''")
+            self._db.execute("DROP INDEX IF EXISTS chunks_source")
+            self._db.execute("CREATE INDEX IF NOT EXISTS chunks_namespace_source ON chunks (namespace, source)")
+            self._db.execute("CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value TEXT)")
+            if model:
+                stored = self._db.execute("SELECT value FROM info WHERE key = 'model'").fetchone()
+                if (stored[0] if stored else LEGACY_MODEL) != model:
+                    print(f"Embedding model changed to {model}: every chunk will be re-embedded")
+                    self._db.execute("DELETE FROM chunks")
+                self._db.execute("INSERT OR REPLACE INTO info VALUES ('model', ?)", (model,))
+            self._db.commit()
+
+    def known(self, source, namespace=""):
+        with self._lock:
+            rows = self._db.execute("SELECT id, content_hash FROM chunks WHERE namespace = ? AND source = ?",
+                                    (namespace, source))
+            return dict(rows.fetchall())
+
+    def sources(self, namespace=""):
+        """{source: chunk count} in a namespace."""
+        with self._lock:
+            rows = self._db.execute("SELECT source, COUNT(*) FROM chunks WHERE namespace = ? GROUP BY source",
+                                    (namespace,))
+            return dict(rows.fetchall())
+
+    def plan(self, source, chunks, namespace=""):
+        """Split `chunks` ([{"id", "text", ...}]) into (to_upsert, ids_to_delete) for this source."""
+        known = self.known(source, namespace)
+        to_upsert = [c for c in chunks if known.get(c["id"]) != content_hash(c["text"])]
+        current = {c["id"] for c in chunks}
+        to_delete = [chunk_id for chunk_id in known if chunk_id not in current]
+        return to_upsert, to_delete
+
+    def record(self, chunks, namespace=""):
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO chunks (id, source, content_hash, updated_at, namespace) VALUES (?, ?, ?, ?, ?)",
+                [(c["id"], c["metadata"]["source"], content_hash(c["text"]), now, namespace) for c in chunks],
+            )
+            self._db.commit()
+
+    def forget(self, ids):
+        with self._lock:
+            self._db.executemany("DELETE FROM chunks WHERE id = ?", [(chunk_id,) for chunk_id in ids])
+            self._db.commit()
+
+
+def delete_vectors(index, ids, batch_size=1000, namespace=""):
+    # Pinecone caps deletes at 1000 IDs per call.
+    ids = list(ids)
+    for i in range(0, len(ids), batch_size):
+        index.delete(ids=ids[i:i + batch_size], namespace=namespace)
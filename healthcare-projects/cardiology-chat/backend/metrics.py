@@ -0,0 +1,207 @@
+"""
+Request metrics and trace IDs.
+
+- Histograms of per-stage latency (embed, retrieve, prompt, generate, ...),
+  counters of requests by status and of upstream errors by service and
+  exception type, rendered in the Prometheus text format for GET /metrics.
+  Observing a value is a bisect and two additions under a lock, so the hot
+  path cost is negligible; no client library is needed.
+- A trace ID per request (the caller's X-Request-ID, or a new one), kept in a
+  context variable so every log line of the request carries it, and echoed
+  back in the response header.
+"""
+import bisect
+import contextvars
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+request_id = contextvars.ContextVar("request_id", default="-")
+# Stage timings of the current request, for its summary log line.
+request_stages = contextvars.ContextVar("request_stages", default=None)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._values = {}  # labels -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            entry[i] += 1
+            entry[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            values = {labels: list(entry) for labels, entry in self._values.items()}
+        for labels, entry in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), entry[:-1]):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames + ('le',), labels + (bound,))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {entry[-1]}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def collector(self, fn):
+        """fn() -> [(name, type, help, [(labels dict, value)])], read at scrape time (e.g. cache stats)."""
+        self.collectors.append(fn)
+        return fn
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines += metric.render()
+        for fn in self.collectors:
+            for name, kind, help, samples in fn():
+                lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+                lines += [f"{name}{_labels(tuple(labels), tuple(labels.values()))} {value}" for labels, value in samples]
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+STAGE_SECONDS = registry.add(Histogram("chat_stage_seconds", "Time spent per request stage.", ("stage",)))
+REQUESTS = registry.add(Counter("chat_requests_total", "Requests by endpoint and status code.", ("endpoint", "status")))
+UPSTREAM_ERRORS = registry.add(Counter(
+    "upstream_errors_total", "Failed calls to external services, by service and exception type.", ("service", "type")
+))
+
+
+class UpstreamError(Exception):
+    """An embedding / vector index / LLM call failed; the API answers 502 instead of 500."""
+
+    def __init__(self, service, error):
+        super().__init__(f"{service}: {error}")
+        self.service = service
+        self.error = error
+
+
+@contextmanager
+def stage(name, service=None):
+    """Time a stage into STAGE_SECONDS. With `service`, failures are counted and raised as UpstreamError."""
+    start = time.perf_counter()
+    try:
+        yield
+    except UpstreamError:
+        raise
+    except Exception as e:
+        if service is None:
+            raise
+        UPSTREAM_ERRORS.inc(service, type(e).__name__)
+        raise UpstreamError(service, e) from e
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, name)
+        stages = request_stages.get()
+        if stages is not None:
+            stages[name] = stages.get(name, 0.0) + elapsed
+
+
+def new_request_id(header=None):
+    # Accept the caller's ID if it looks sane, so traces can be joined across services.
+    if header and len(header) <= 64 and header.replace("-", "").replace("_", "").isalnum():
+        return header
+    return uuid.uuid4().hex[:16]
+
+
+class TraceMiddleware:
+    """
+    ASGI middleware: sets the request's trace ID, returns it as X-Request-ID and
+    counts the response status per route (the route template, so /jobs/{job_id}
+    is one series).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        header = dict(scope["headers"]).get(b"x-request-id", b"").decode("latin-1")
+        trace_id = new_request_id(header)
+        token = request_id.set(trace_id)
+        status = 500
+
+        async def send_with_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-request-id", trace_id.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            REQUESTS.inc(getattr(scope.get("route"), "path", "unmatched"), status)
+            request_id.reset(token)
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record):
+        record.request_id = request_id.get()
+        return True
+
+
+def get_logger(name="cardiology"):
+    logger = logging.getLogger(name)
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.addFilter(RequestIdFilter())
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return logger
@@ -0,0 +1,101 @@
+"""
+PDF text extraction, optionally spread over a process pool.
+
+pypdf's extract_text() is pure Python and CPU bound, so threads don't help:
+for long uploads (300-page discharge packets) the pages are split into
+ranges of PDF_PAGES_PER_TASK and extracted by PDF_WORKERS processes. Each
+worker opens the uploaded file from disk itself, so only the path and the
+extracted text cross process boundaries. Pages are still yielded lazily and
+in page order, with a bounded number of ranges in flight, so the ingest
+pipeline's back-pressure keeps working.
+"""
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "0")) or min(4, os.cpu_count() or 1)
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "16"))
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+_reader = None
+
+
+def _open(path):
+    # Worker side: keep the last file open, so consecutive ranges don't re-parse it.
+    global _reader
+    key = (path, os.path.getmtime(path))
+    if _reader is None or _reader[0] != key:
+        _reader = (key, _pdf_reader(path))
+    return _reader[1]
+
+
+def _pdf_reader(path):
+    # pypdf is only needed once a PDF is uploaded; importing it lazily keeps it off API startup.
+    from pypdf import PdfReader
+
+    return PdfReader(path)
+
+
+def extract_range(path, start, stop):
+    pages = _open(path).pages
+    return [(i, pages[i].extract_text() or "") for i in range(start, stop)]
+
+
+def get_pool(workers):
+    # One pool per process, shared by all uploads, created on first use.
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            # Not fork: the pool is created inside the running server, whose event loop, threadpool,
+            # pipeline threads and SQLite connections would be copied mid-use (a child can deadlock
+            # on a lock another thread held). Workers are forked from a small single-threaded
+            # forkserver process that has only this module loaded.
+            if "forkserver" in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context("forkserver")
+                context.set_forkserver_preload([__name__])
+            else:
+                context = multiprocessing.get_context("spawn")
+            _pool = ProcessPoolExecutor(workers, mp_context=context)
+            _pool_workers = workers
+        return _pool
+
+
+def page_count(path):
+    return len(_pdf_reader(path).pages)
+
+
+def iter_pages(path, start=0, workers=None, pages_per_task=None):
+    """
+    Yield (page index, text) for every page from `start` on, in order. Empty
+    pages give "". Small files (one range or less) are extracted in-process.
+    """
+    workers = workers or PDF_WORKERS
+    pages_per_task = pages_per_task or PDF_PAGES_PER_TASK
+    total = page_count(path)
+    if workers <= 1 or total - start <= pages_per_task:
+        yield from extract_range(path, start, total)
+        return
+
+    pool = get_pool(workers)
+    ranges = iter(range(start, total, pages_per_task))
+    in_flight = deque()
+    try:
+        while True:
+            # Keep every worker busy plus one range queued each, but no more.
+            while len(in_flight) < 2 * workers:
+                first = next(ranges, None)
+                if first is None:
+                    break
+                in_flight.append(pool.submit(extract_range, path, first, min(first + pages_per_task, total)))
+            if not in_flight:
+                return
+            yield from in_flight.popleft().result()
+    finally:
+        for future in in_flight:
+            future.cancel()
@@ -0,0 +1,233 @@
+"""
+Producer/consumer ingestion pipeline: load -> chunk -> embed -> upsert.
+
+Each stage runs in its own thread and hands work to the next one through a
+bounded queue, so the upsert of batch N overlaps with embedding batch N+1,
+and a slow stage applies back-pressure instead of the whole corpus piling
+up in memory. Embedding goes through EmbeddingScheduler (rate limits,
+retries); upserts are coalesced into batches of UPSERT_BATCH vectors.
+
+StageTimer keeps busy time and item counts per stage, so report() shows
+which stage is the bottleneck.
+"""
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+from manifest import content_hash, delete_vectors
+from scheduler import EmbeddingScheduler, write_dead_letter
+
+UPSERT_BATCH = int(os.getenv("UPSERT_BATCH", "100"))
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "8"))
+UPSERT_RETRIES = 3
+
+_END = object()
+
+
+class StageTimer:
+    def __init__(self):
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def track(self, stage, items=1):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start, items)
+
+    def add(self, stage, seconds, items=1):
+        with self._lock:
+            entry = self._stages.setdefault(stage, {"seconds": 0.0, "items": 0, "calls": 0})
+            entry["seconds"] += seconds
+            entry["items"] += items
+            entry["calls"] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {stage: dict(entry) for stage, entry in self._stages.items()}
+
+    def report(self):
+        lines = [f"{'stage':>8} {'items':>7} {'calls':>6} {'busy s':>8} {'items/s':>9}"]
+        for stage, entry in self.snapshot().items():
+            rate = entry["items"] / entry["seconds"] if entry["seconds"] else 0.0
+            lines.append(f"{stage:>8} {entry['items']:>7} {entry['calls']:>6} {entry['seconds']:>8.2f} {rate:>9.1f}")
+        return "\n".join(lines)
+
+
+class IngestPipeline:
+    def __init__(self, index, manifest, embed_fn, chunk_fn, scheduler=None,
+                 upsert_batch_size=UPSERT_BATCH, queue_size=PIPELINE_QUEUE_SIZE, progress=None, lexical=None,
+                 namespace=""):
+        """
+        chunk_fn(document) -> [{"id", "text", "metadata": {"source", ...}}]
+        Chunks the manifest already has are skipped; chunks it has for a source
+        that didn't show up this time are deleted once everything is upserted.
+
+        A LexicalIndex passed as `lexical` is kept in sync with the vector index
+        (unchanged chunks it is missing are added without re-embedding).
+
+        Everything goes to `namespace` ("" is the default one): the index
+        upserts and deletes, the manifest and the lexical index.
+
+        progress(stage, items), if given, is called from the stage threads with
+        "load" (one document), "skip" (unchanged chunks), "embed" and "upsert"
+        (chunk batches).
+        """
+        self.index = index
+        self.manifest = manifest
+        self.chunk_fn = chunk_fn
+        self.progress = progress or (lambda stage, items: None)
+        self.lexical = lexical
+        self.namespace = namespace
+        self.timer = StageTimer()
+        self.scheduler = scheduler or EmbeddingScheduler(embed_fn)
+        self.scheduler.embed_fn = self._timed(embed_fn)
+        self.upsert_batch_size = upsert_batch_size
+        self.queue_size = queue_size
+        self.result = {"chunks": 0, "skipped": 0, "upserted": 0, "deleted": 0, "failed": 0}
+
+    def run(self, documents, seen=None):
+        """
+        `seen` ({source: ids}) lists chunks that are part of the sources even though
+        they are not in `documents`, e.g. pages done before a resumed run.
+        """
+        started = time.perf_counter()
+        docs = queue.Queue(maxsize=self.queue_size)
+        vectors = queue.Queue(maxsize=self.queue_size)
+        errors = []
+        known = {}
+        seen = {source: set(ids) for source, ids in (seen or {}).items()}
+
+        loader = threading.Thread(target=self._load, args=(documents, docs, errors), daemon=True)
+        upserter = threading.Thread(target=self._upsert, args=(vectors,), daemon=True)
+        loader.start()
+        upserter.start()
+
+        def embedded(items, vecs):
+            self.progress("embed", items)
+            vectors.put((items, vecs))
+
+        try:
+            self.scheduler.run(self._chunks(docs, known, seen), embedded)
+        finally:
+            vectors.put(_END)
+            upserter.join()
+            # If chunking failed the loader may be stuck on a full queue.
+            while loader.is_alive():
+                try:
+                    docs.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+        if errors:
+            raise errors[0]
+
+        # Drop chunks that no longer exist, now that their replacements are in.
+        stale = [chunk_id for source, ids in known.items() for chunk_id in ids if chunk_id not in seen.get(source, ())]
+        if stale:
+            with self.timer.track("delete", len(stale)):
+                delete_vectors(self.index, stale, namespace=self.namespace)
+                self.manifest.forget(stale)
+                if self.lexical is not None:
+                    self.lexical.remove(stale)
+        self.result["deleted"] = len(stale)
+        self.result["failed"] = self.scheduler.stats["dead_lettered"] + self.result["failed"]
+        self.result["elapsed"] = time.perf_counter() - started
+        return self.result
+
+    def _timed(self, embed_fn):
+        def embed(texts):
+            with self.timer.track("embed", len(texts)):
+                return embed_fn(texts)
+        return embed
+
+    def _load(self, documents, docs, errors):
+        try:
+            iterator = iter(documents)
+            while True:
+                start = time.perf_counter()
+                try:
+                    document = next(iterator)
+                except StopIteration:
+                    break
+                self.timer.add("load", time.perf_counter() - start)
+                self.progress("load", document)
+                docs.put(document)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            docs.put(_END)
+
+    def _chunks(self, docs, known, seen):
+        # Runs in the scheduler's feeder thread.
+        while True:
+            document = docs.get()
+            if document is _END:
+                return
+            with self.timer.track("chunk"):
+                chunks = self.chunk_fn(document)
+                fresh = []
+                skipped = []
+                for chunk in chunks:
+                    source = chunk["metadata"]["source"]
+                    if source not in known:
+                        known[source] = self.manifest.known(source, self.namespace)
+                    seen.setdefault(source, set()).add(chunk["id"])
+                    if known[source].get(chunk["id"]) != content_hash(chunk["text"]):
+                        fresh.append(chunk)
+                    else:
+                        skipped.append(chunk)
+            if skipped:
+                if self.lexical is not None:
+                    # Backfill chunks indexed before the lexical index existed.
+                    missing = [chunk for chunk in skipped if not self.lexical.has(chunk["id"])]
+                    if missing:
+                        self.lexical.add(missing, self.namespace)
+                self.progress("skip", skipped)
+            self.result["chunks"] += len(chunks)
+            self.result["skipped"] += len(chunks) - len(fresh)
+            yield from fresh
+
+    def _upsert(self, vectors):
+        done = False
+        while not done:
+            # Coalesce whatever the embed stage has finished into one bigger upsert.
+            batch = []
+            item = vectors.get()
+            while True:
+                if item is _END:
+                    done = True
+                    break
+                batch.extend(zip(*item))
+                if len(batch) >= self.upsert_batch_size:
+                    break
+                try:
+                    item = vectors.get_nowait()
+                except queue.Empty:
+                    break
+            for i in range(0, len(batch), self.upsert_batch_size):
+                self._upsert_batch(batch[i:i + self.upsert_batch_size])
+
+    def _upsert_batch(self, batch):
+        chunks = [chunk for chunk, _ in batch]
+        for attempt in range(1, UPSERT_RETRIES + 1):
+            try:
+                with self.timer.track("upsert", len(batch)):
+                    self.index.upsert(vectors=[(c["id"], vector, c["metadata"]) for c, vector in batch],
+                                      namespace=self.namespace)
+                    self.manifest.record(chunks, self.namespace)
+                    if self.lexical is not None:
+                        self.lexical.add(chunks, self.namespace)
+                self.result["upserted"] += len(batch)
+                self.progress("upsert", chunks)
+                return
+            except Exception as e:
+                error = e
+                if attempt < UPSERT_RETRIES:
+                    time.sleep(2 ** attempt)
+        # Not recorded in the manifest, so the next run picks these up again.
+        self.result["failed"] += len(batch)
+        write_dead_letter(self.scheduler.dead_letter_path, chunks, error, UPSERT_RETRIES)
@@ -0,0 +1,177 @@
+"""
+Prompt assembly for /chat.
+
+The rules block is static, so it is built once and the model sends it once
+per request as system_instruction instead of inside every prompt: the
+per-question prompt is just the context and the question.
+
+Retrieved chunks are cleaned up before they go into the context:
+
+- exact duplicates (the same page uploaded twice under another name) and
+  chunks contained in an earlier one are dropped,
+- consecutive chunks of a section are merged into one passage, so the
+  overlap the splitter leaves between them (CHUNK_OVERLAP characters) and the
+  repeated section heading are sent once,
+- chunks are added best-first until CONTEXT_TOKEN_BUDGET tokens (tiktoken's
+  cl100k estimate, or characters / 4 without it); the chunk that crosses the
+  budget is cut at a word boundary.
+"""
+import os
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "2000"))
+MIN_OVERLAP = 40
+MIN_PARTIAL_TOKENS = 50
+
+_encoding = None
+
+
+def _load_encoding():
+    # get_encoding() downloads the BPE file on first use, so it is loaded on the
+    # first count instead of at import; without tiktoken, or offline, any failure
+    # falls back to characters / 4 for the rest of the process.
+    global _encoding
+    try:
+        import tiktoken
+
+        _encoding = tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        _encoding = False
+    return _encoding
+
+
+def count_tokens(text):
+    encoding = _encoding if _encoding is not None else _load_encoding()
+    if not encoding:
+        return len(text) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+SYSTEM_INSTRUCTIONS = """You are a medical educational assistant. Follow these rules strictly in every response:
+
+1. Language Consistency
+- Always respond in the same language used in the user's most recent message.
+- Never switch languages unless the user explicitly switches.
+- The disclaimer must always be in the same language as the answer.
+
+2. No Meta Statements
+- Do NOT use phrases such as: "Based on general knowledge…", "As an AI model…", "According to my training data…", "I cannot diagnose…"
+- Just answer directly and educationally.
+
+3. Simple Language
+- Explain medical concepts using clear, simple, everyday language.
+- Avoid unnecessary medical jargon.
+- If you must use a medical term, explain it briefly and plainly.
+- Keep sentences short and easy to understand.
+
+4. Diagnostic Reasoning
+- When given clinical information (EKG, symptoms, labs, reports):
+- Identify the most likely specific diagnosis, not a broad category.
+- Base the reasoning only on the information provided.
+- Do not add or assume data that is not in the case.
+- If the diagnosis is uncertain, state the most likely possibilities and why.
+
+5. Treatment Explanations
+- You may explain general treatment concepts for educational purposes.
+- Do NOT provide medication doses, specific medical instructions, or personalized treatment plans.
+- Never tell the user what they “should” do medically.
+
+6. Style Consistency
+- Be clear, direct, and concise.
+- No long introductions.
+- No filler or unnecessary repetition.
+- Maintain the same tone across the whole conversation.
+
+7. Conversation Memory
+- Maintain context from previous turns.
+- Do not restart the conversation unless the user requests it.
+- Keep the language, style, and tone consistent across multiple messages.
+
+8. Always End with a Disclaimer
+- If the answer is about health, illness, diagnosis, treatment, symptoms, labs, EKG, tests, or anything medical, add this exact sentence at the end:
+
+Spanish:
+"Este contenido es solo educativo y no sustituye una evaluación médica profesional."
+
+English:
+"This content is for educational purposes only and does not replace professional medical evaluation."
+
+Use only the version that matches the language of the response.
+
+9. Context Usage (CRITICAL)
+- The 'Medical Context' may contain specific patient reports (e.g., "John Doe").
+- If the user asks a GENERAL question (e.g., "How long do heart attacks last?"), answer using GENERAL medical knowledge. Do NOT mention the specific patient from the context.
+- If the user asks about THE PATIENT (e.g., "What is his diagnosis?", "How long has he had symptoms?"), strictly use the 'Medical Context'.
+- Do not confuse general medical facts with the specific patient's history.
+"""
+
+
+def _overlap(previous, text):
+    # Length of the longest suffix of `previous` that `text` starts with.
+    probe = text[:MIN_OVERLAP]
+    if len(probe) < MIN_OVERLAP:
+        return 0
+    start = previous.find(probe)
+    while start != -1:
+        if text.startswith(previous[start:]):
+            return len(previous) - start
+        start = previous.find(probe, start + 1)
+    return 0
+
+
+def _body(text, other):
+    # Chunks of the same section both start with its heading (see chunking.py).
+    first, _, rest = text.partition("\n")
+    return rest if rest and other.startswith(first + "\n") else text
+
+
+def _merge(kept, text):
+    # Join `text` with a kept chunk it continues (or that continues it). Returns False if none.
+    for i, other in enumerate(kept):
+        cut = _overlap(other, _body(text, other))
+        if cut:
+            kept[i] = other + _body(text, other)[cut:]
+            return True
+        cut = _overlap(text, _body(other, text))
+        if cut:
+            kept[i] = text + _body(other, text)[cut:]
+            return True
+    return False
+
+
+def dedupe_chunks(texts):
+    """
+    Drop duplicate / contained chunks and merge consecutive chunks of a section
+    (sending their shared overlap once), keeping rank order.
+    """
+    kept = []
+    for text in texts:
+        text = text.strip()
+        if not text or text in kept or (len(text) >= MIN_OVERLAP and any(text in other for other in kept)):
+            continue
+        if not _merge(kept, text):
+            kept.append(text)
+    return kept
+
+
+def build_context(texts, budget=None):
+    """Join retrieved chunk texts (best first) into the context block, within the token budget."""
+    budget = CONTEXT_TOKEN_BUDGET if budget is None else budget
+    parts = []
+    used = 0
+    for text in dedupe_chunks(texts):
+        tokens = count_tokens(text)
+        if used + tokens > budget:
+            remaining = budget - used
+            if remaining >= MIN_PARTIAL_TOKENS:
+                # Cut proportionally, then back to the last whole word.
+                cut = text[:len(text) * remaining // tokens]
+                parts.append(cut.rsplit(" ", 1)[0] + " ...")
+            break
+        parts.append(text)
+        used += tokens
+    return "\n\n".join(parts)
+
+
+def build_prompt(context, question, history=""):
+    if history:
+        return f"Conversation so far:\n{history}\n\nMedical Context:\n{context}\n\nQuestion: {question}"
+    return f"Medical Context:\n{context}\n\nQuestion: {question}"
@@ -0,0 +1,106 @@
+"""
+Vector quantizers for the local index (see vectorstore.py).
+
+Both keep a compact code per vector in RAM and score float32 queries against
+the codes directly (asymmetric distance computation: only the stored vectors
+are quantized, never the query):
+
+- ScalarQuantizer ("int8"): one byte per dimension, with a per-dimension
+  offset and scale learned from the data. 768 bytes per vector (4x smaller).
+  q . x ~= (q * scale) . code + q . offset
+- ProductQuantizer ("pq"): the vector is cut into `subspaces` slices and each
+  slice is replaced by the id of its nearest of 256 k-means centroids, one
+  byte per slice; 96 bytes per vector at the default 96 subspaces (32x
+  smaller). A query builds a (subspaces x 256) table of slice-centroid dot
+  products once, and a vector's score is the sum of its table entries.
+
+Scores are approximate, so the index re-ranks the best candidates with the
+float32 vectors (read from the memory-mapped file) when VECTOR_RERANK > 0.
+"""
+import numpy as np
+
+# Codes are widened to float32 this many rows at a time: 256 x 768 floats
+# (768 KB) stay in cache for the matrix product that follows, where widening
+# a whole scan block first (8192 rows, 24 MB) cost more than the product.
+WIDEN_ROWS = 256
+
+
+class ScalarQuantizer:
+    def __init__(self, dimension):
+        self.dimension = dimension
+        self.bytes_per_vector = dimension
+
+    def train(self, data):
+        low, high = data.min(axis=0), data.max(axis=0)
+        self.offset = low.astype(np.float32)
+        self.scale = np.maximum((high - low) / 255.0, 1e-12).astype(np.float32)
+
+    def encode(self, data):
+        return np.clip(np.rint((data - self.offset) / self.scale), 0, 255).astype(np.uint8)
+
+    def scores(self, queries, codes):
+        weighted = (queries * self.scale).astype(np.float32)
+        scores = np.empty((len(queries), len(codes)), dtype=np.float32)
+        # Each slice is widened once for the whole batch of queries
+        for start in range(0, len(codes), WIDEN_ROWS):
+            block = codes[start:start + WIDEN_ROWS].astype(np.float32)
+            scores[:, start:start + len(block)] = weighted @ block.T
+        scores += (queries @ self.offset)[:, None]
+        return scores
+
+
+class ProductQuantizer:
+    def __init__(self, dimension, subspaces=96, centroids=256, iterations=12, seed=0):
+        if dimension % subspaces:
+            raise ValueError(f"dimension {dimension} is not divisible into {subspaces} subspaces")
+        self.dimension = dimension
+        self.subspaces = subspaces
+        self.centroids = centroids
+        self.iterations = iterations
+        self.seed = seed
+        self.bytes_per_vector = subspaces
+
+    def _slices(self, data):
+        # (n, dimension) -> (subspaces, n, dimension / subspaces)
+        return data.reshape(len(data), self.subspaces, -1).transpose(1, 0, 2)
+
+    def train(self, data):
+        rng = np.random.default_rng(self.seed)
+        slices = self._slices(data.astype(np.float32))
+        k = min(self.centroids, len(data))
+        self.codebook = np.stack([self._kmeans(part, k, rng) for part in slices])  # (subspaces, k, sub_dim)
+        self._norms = (self.codebook ** 2).sum(axis=2)
+        # codes + offsets index the flattened (subspaces x k) lookup table
+        self._offsets = (np.arange(self.subspaces) * k).astype(np.min_scalar_type(self.subspaces * k))
+
+    def _kmeans(self, points, k, rng):
+        centers = points[rng.choice(len(points), k, replace=False)].copy()
+        for _ in range(self.iterations):
+            assign = np.argmin((centers ** 2).sum(axis=1) - 2 * points @ centers.T, axis=1)
+            onehot = np.zeros((k, len(points)), dtype=np.float32)
+            onehot[assign, np.arange(len(points))] = 1.0
+            sums = onehot @ points
+            counts = np.bincount(assign, minlength=k)
+            filled = counts > 0
+            centers[filled] = sums[filled] / counts[filled, None]
+        return centers
+
+    def encode(self, data):
+        codes = np.empty((len(data), self.subspaces), dtype=np.uint8)
+        for j, part in enumerate(self._slices(data.astype(np.float32))):
+            codes[:, j] = np.argmin(self._norms[j] - 2 * part @ self.codebook[j].T, axis=1)
+        return codes
+
+    def scores(self, queries, codes):
+        # Lookup tables: (queries, subspaces, k) slice . centroid products.
+        tables = np.einsum("jqd,jkd->qjk", self._slices(queries), self.codebook)
+        positions = codes + self._offsets
+        return np.stack([np.take(table.ravel(), positions).sum(axis=1) for table in tables])
+
+
+def make_quantizer(kind, dimension, subspaces=96):
+    if kind == "int8":
+        return ScalarQuantizer(dimension)
+    if kind == "pq":
+        return ProductQuantizer(dimension, subspaces)
+    raise ValueError(f"Unknown VECTOR_QUANTIZATION {kind!r} (use 'int8', 'pq' or leave it empty)")
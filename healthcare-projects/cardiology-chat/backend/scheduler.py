@@ -0,0 +1,235 @@
+"""
+Rate-limit-aware batch scheduler for embedding ingestion.
+
+Replaces the old "10 texts, sleep 2s, sleep 10s on error and drop the batch"
+loop in ingest.py:
+
+- a token bucket keeps requests under EMBED_RPM,
+- batches grow towards the provider maximum (EMBED_MAX_BATCH) while calls
+  succeed; when the provider says we are rate limited the batch size and the
+  request rate are halved, then recover as calls succeed again (AIMD),
+- up to EMBED_MAX_IN_FLIGHT requests run concurrently,
+- failed batches are retried with exponential backoff and full jitter, and
+  after EMBED_MAX_RETRIES attempts they are written to a dead-letter JSONL
+  file instead of being silently dropped.
+"""
+import json
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+EMBED_RPM = float(os.getenv("EMBED_RPM", "60"))
+EMBED_MAX_BATCH = int(os.getenv("EMBED_MAX_BATCH", "100"))
+EMBED_MAX_IN_FLIGHT = int(os.getenv("EMBED_MAX_IN_FLIGHT", "4"))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "5"))
+DEAD_LETTER_PATH = os.getenv("DEAD_LETTER_PATH", "ingest_dead_letter.jsonl")
+
+
+class TokenBucket:
+    def __init__(self, rate_per_minute, capacity=1):
+        self.max_rate = rate_per_minute / 60.0
+        self.rate = self.max_rate
+        self.capacity = max(1.0, float(capacity))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_for = (1 - self.tokens) / self.rate
+            time.sleep(wait_for)
+
+    def slow_down(self):
+        # The provider's real quota is lower than configured: halve the rate and drain the burst.
+        with self._lock:
+            self.rate = max(self.max_rate / 64, self.rate / 2)
+            self.tokens = 0.0
+            self.updated = time.monotonic()
+
+    def speed_up(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate * 1.1)
+
+
+def write_dead_letter(path, items, error, attempts):
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps({
+            "time": time.time(),
+            "error": f"{type(error).__name__}: {error}",
+            "attempts": attempts,
+            "ids": [item["id"] for item in items],
+            "sources": sorted({item["metadata"].get("source", "") for item in items}),
+        }) + "\n")
+
+
+def is_rate_limit(error):
+    text = f"{type(error).__name__} {error}".lower()
+    return any(marker in text for marker in ("429", "resourceexhausted", "resource exhausted", "quota", "rate limit"))
+
+
+_END = object()
+
+
+class Batch:
+    def __init__(self, items, attempt=0, not_before=0.0):
+        self.items = items
+        self.attempt = attempt
+        self.not_before = not_before
+
+
+class EmbeddingScheduler:
+    def __init__(self, embed_fn, requests_per_minute=EMBED_RPM, max_batch_size=EMBED_MAX_BATCH,
+                 max_in_flight=EMBED_MAX_IN_FLIGHT, max_retries=EMBED_MAX_RETRIES,
+                 initial_batch_size=10, base_delay=1.0, max_delay=60.0, dead_letter_path=DEAD_LETTER_PATH,
+                 bucket=None):
+        self.embed_fn = embed_fn
+        # Pass a shared bucket when several schedulers draw from the same quota.
+        self.bucket = bucket or TokenBucket(requests_per_minute, capacity=max_in_flight)
+        self.max_batch_size = max_batch_size
+        self.batch_size = min(initial_batch_size, max_batch_size)
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.dead_letter_path = dead_letter_path
+        self.stats = {"embedded": 0, "calls": 0, "retries": 0, "rate_limited": 0, "dead_lettered": 0}
+
+    def run(self, items, on_batch):
+        """
+        Embed `items` ([{"id", "text", "metadata"}], or any iterable of them, e.g. a
+        generator fed by another pipeline stage) and call on_batch(items, vectors)
+        for every batch that succeeds. on_batch runs in the caller's thread; if it
+        raises, the batch is retried like a failed embedding call.
+        """
+        # A feeder thread pulls from `items`, so a slow producer never blocks
+        # handling of finished requests.
+        inbox = queue.Queue(maxsize=2 * self.max_batch_size)
+        self._producer_error = None
+        feeder = threading.Thread(target=self._feed, args=(items, inbox), daemon=True)
+        feeder.start()
+        exhausted = False
+        pending = deque()
+        retries = []
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as pool:
+            in_flight = {}
+            while True:
+                exhausted = self._drain(inbox, pending, block=False) or exhausted
+                while len(in_flight) < self.max_in_flight:
+                    # Hold back partial batches while more input is coming, unless we'd sit idle.
+                    allow_partial = exhausted or not in_flight
+                    batch = self._next_batch(pending, retries, allow_partial)
+                    if batch is None:
+                        break
+                    in_flight[pool.submit(self._embed, batch.items)] = batch
+                    self.stats["calls"] += 1
+
+                if exhausted and not pending and not retries and not in_flight:
+                    break
+
+                next_retry = min((b.not_before for b in retries), default=None)
+                if not in_flight:
+                    if pending and not retries:
+                        continue
+                    if not exhausted and not pending:
+                        # Nothing to do until the producer hands us something.
+                        timeout = None if next_retry is None else max(0.0, next_retry - time.monotonic())
+                        exhausted = self._drain(inbox, pending, block=True, timeout=timeout)
+                    elif next_retry is not None:
+                        # Only backed-off retries left; sleep until the first one is due.
+                        time.sleep(max(0.0, next_retry - time.monotonic()))
+                    continue
+
+                timeout = None if exhausted else 0.05
+                if next_retry is not None:
+                    timeout = min(timeout or 60.0, max(0.0, next_retry - time.monotonic()))
+                done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    batch = in_flight.pop(future)
+                    try:
+                        vectors = future.result()
+                        on_batch(batch.items, vectors)
+                    except Exception as e:
+                        self._failed(batch, e, retries)
+                    else:
+                        self.stats["embedded"] += len(batch.items)
+                        # Additive increase while the provider keeps up.
+                        self.batch_size = min(self.max_batch_size, self.batch_size + max(1, self.batch_size // 4))
+                        self.bucket.speed_up()
+        self.stats["elapsed"] = time.monotonic() - started
+        if self._producer_error is not None:
+            raise self._producer_error
+        return self.stats
+
+    def _feed(self, items, inbox):
+        try:
+            for item in items:
+                inbox.put(item)
+        except Exception as e:
+            self._producer_error = e
+        finally:
+            inbox.put(_END)
+
+    def _drain(self, inbox, pending, block, timeout=None):
+        # Move what the producer has ready into `pending`. Returns True once the input is exhausted.
+        while len(pending) < 2 * self.max_batch_size:
+            try:
+                item = inbox.get(block=block, timeout=timeout)
+            except queue.Empty:
+                return False
+            if item is _END:
+                return True
+            pending.append(item)
+            block = False
+        return False
+
+    def _next_batch(self, pending, retries, allow_partial=True):
+        now = time.monotonic()
+        for batch in retries:
+            if batch.not_before <= now:
+                retries.remove(batch)
+                return batch
+        if len(pending) >= self.batch_size or (pending and allow_partial):
+            return Batch([pending.popleft() for _ in range(min(self.batch_size, len(pending)))])
+        return None
+
+    def _embed(self, items):
+        self.bucket.acquire()
+        return self.embed_fn([item["text"] for item in items])
+
+    def _failed(self, batch, error, retries):
+        if is_rate_limit(error):
+            # Multiplicative decrease.
+            self.stats["rate_limited"] += 1
+            self.batch_size = max(1, self.batch_size // 2)
+            self.bucket.slow_down()
+
+        attempt = batch.attempt + 1
+        if attempt > self.max_retries:
+            self._dead_letter(batch, error)
+            return
+
+        self.stats["retries"] += 1
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        not_before = time.monotonic() + delay
+        print(f"Batch of {len(batch.items)} failed (attempt {attempt}/{self.max_retries}), "
+              f"retrying in {delay:.1f}s: {error}")
+        # Re-split to the current batch size, so a shrunk window applies to retries too.
+        for i in range(0, len(batch.items), self.batch_size):
+            retries.append(Batch(batch.items[i:i + self.batch_size], attempt, not_before))
+
+    def _dead_letter(self, batch, error):
+        self.stats["dead_lettered"] += len(batch.items)
+        print(f"Giving up on a batch of {len(batch.items)} after {self.max_retries} retries: {error}")
+        write_dead_letter(self.dead_letter_path, batch.items, error, batch.attempt + 1)
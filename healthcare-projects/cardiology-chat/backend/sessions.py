@@ -0,0 +1,203 @@
+"""
+Conversation memory for /chat.
+
+Requests that send a conversation_id get the earlier turns of that
+conversation back in the prompt. Per conversation we keep:
+
+- the last SESSION_TURNS question/answer pairs in a ring buffer, each answer
+  cut to SESSION_ANSWER_CHARS (the model only needs the gist to resolve "it"
+  or "that medicine"),
+- a rolling summary of older turns: when a turn drops out of the ring buffer
+  its question and the first sentence of its answer are appended, and the
+  oldest lines go once it passes SESSION_SUMMARY_CHARS. It is extractive, so
+  memory costs no extra LLM call.
+
+The history lives on the server, so the client only sends the new question,
+and it is never embedded in full: retrieval embeds condensed_query(), the
+question plus the previous SESSION_QUERY_TURNS questions, one short text that
+goes through the same embedding cache and batcher as before.
+
+Sessions are evicted least-recently-used past SESSION_MAX_SESSIONS or
+SESSION_MAX_MB of stored text, and after SESSION_TTL seconds idle.
+SESSION_STORE=sqlite keeps them in a SQLite file (SESSION_PATH) instead of
+process memory, so they survive restarts and are shared between workers.
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+
+SESSION_STORE = os.getenv("SESSION_STORE", "memory")
+SESSION_PATH = os.getenv("SESSION_PATH", "sessions.db")
+SESSION_TURNS = int(os.getenv("SESSION_TURNS", "6"))
+SESSION_ANSWER_CHARS = int(os.getenv("SESSION_ANSWER_CHARS", "600"))
+SESSION_SUMMARY_CHARS = int(os.getenv("SESSION_SUMMARY_CHARS", "1500"))
+SESSION_QUERY_TURNS = int(os.getenv("SESSION_QUERY_TURNS", "2"))
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "1000"))
+SESSION_MAX_MB = float(os.getenv("SESSION_MAX_MB", "64"))
+SESSION_TTL = float(os.getenv("SESSION_TTL", "3600"))
+
+
+def _clip(text, limit):
+    text = " ".join(text.split())
+    if len(text) <= limit:
+        return text
+    return text[:limit].rsplit(" ", 1)[0] + " ..."
+
+
+def _first_sentence(text):
+    text = re.sub(r"[*#_`>]", "", text)
+    return _clip(re.split(r"(?<=[.!?])\s", text.strip(), maxsplit=1)[0], 200)
+
+
+class Session:
+    def __init__(self, turns=(), summary="", max_turns=SESSION_TURNS):
+        self.turns = deque(turns, maxlen=max_turns)  # (question, clipped answer)
+        self.summary = summary
+
+    def add(self, question, answer, answer_chars=SESSION_ANSWER_CHARS, summary_chars=SESSION_SUMMARY_CHARS):
+        if len(self.turns) == self.turns.maxlen:
+            old_question, old_answer = self.turns[0]
+            lines = self.summary.splitlines() + [f"- {_clip(old_question, 200)} -> {_first_sentence(old_answer)}"]
+            while len(lines) > 1 and sum(len(line) + 1 for line in lines) > summary_chars:
+                lines.pop(0)
+            self.summary = "\n".join(lines)
+        self.turns.append((question, _clip(answer, answer_chars)))
+
+    def condensed_query(self, question, turns=SESSION_QUERY_TURNS):
+        """Retrieval text for a follow-up: the previous questions give "it" and "those" their subject."""
+        previous = [q for q, _ in list(self.turns)[-turns:]] if turns > 0 else []
+        return " ".join(previous + [question])
+
+    def history(self):
+        lines = []
+        if self.summary:
+            lines += ["Earlier turns (summary):", self.summary]
+        for question, answer in self.turns:
+            lines += [f"User: {question}", f"Assistant: {answer}"]
+        return "\n".join(lines)
+
+    def size(self):
+        # Bytes of stored text, for the memory cap
+        return len(self.summary.encode()) + sum(len(q.encode()) + len(a.encode()) for q, a in self.turns)
+
+    def copy(self):
+        return Session(self.turns, self.summary, self.turns.maxlen)
+
+    def dumps(self):
+        return json.dumps({"turns": list(self.turns), "summary": self.summary})
+
+    @classmethod
+    def loads(cls, data, max_turns=SESSION_TURNS):
+        data = json.loads(data)
+        return cls([tuple(turn) for turn in data["turns"]], data["summary"], max_turns)
+
+
+class MemorySessionStore:
+    def __init__(self, max_sessions=SESSION_MAX_SESSIONS, max_bytes=SESSION_MAX_MB * 1024 * 1024,
+                 ttl=SESSION_TTL, max_turns=SESSION_TURNS):
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.max_turns = max_turns
+        self.evicted = 0
+        self._sessions = OrderedDict()  # id -> (updated, session, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, conversation_id):
+        """A snapshot of the conversation, or None if it is new or expired."""
+        with self._lock:
+            entry = self._sessions.get(conversation_id)
+            if entry is None:
+                return None
+            if time.time() - entry[0] > self.ttl:
+                self._remove(conversation_id)
+                return None
+            self._sessions.move_to_end(conversation_id)
+            return entry[1].copy()
+
+    def add_turn(self, conversation_id, question, answer):
+        now = time.time()
+        with self._lock:
+            entry = self._sessions.get(conversation_id)
+            # An expired conversation starts over, as get() already treats it as gone
+            expired = entry is None or now - entry[0] > self.ttl
+            session = Session(max_turns=self.max_turns) if expired else entry[1]
+            self._remove(conversation_id)
+            session.add(question, answer)
+            size = session.size()
+            self._sessions[conversation_id] = (now, session, size)
+            self._bytes += size
+            while self._sessions and (len(self._sessions) > self.max_sessions or self._bytes > self.max_bytes):
+                self._remove(next(iter(self._sessions)))
+                self.evicted += 1
+
+    def _remove(self, conversation_id):
+        entry = self._sessions.pop(conversation_id, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+    def stats(self):
+        return {"sessions": len(self._sessions), "bytes": self._bytes, "evicted": self.evicted}
+
+
+class SQLiteSessionStore:
+    def __init__(self, path=SESSION_PATH, max_sessions=SESSION_MAX_SESSIONS,
+                 max_bytes=SESSION_MAX_MB * 1024 * 1024, ttl=SESSION_TTL, max_turns=SESSION_TURNS):
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.max_turns = max_turns
+        self.evicted = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, updated REAL, size INTEGER, data TEXT)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (updated)")
+        self._db.commit()
+
+    def get(self, conversation_id):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT data FROM sessions WHERE id = ? AND updated >= ?", (conversation_id, time.time() - self.ttl)
+            ).fetchone()
+        return Session.loads(row[0], self.max_turns) if row else None
+
+    def add_turn(self, conversation_id, question, answer):
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT data FROM sessions WHERE id = ? AND updated >= ?", (conversation_id, now - self.ttl)
+            ).fetchone()
+            session = Session.loads(row[0], self.max_turns) if row else Session(max_turns=self.max_turns)
+            session.add(question, answer)
+            self._db.execute("INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?)",
+                             (conversation_id, now, session.size(), session.dumps()))
+            # Expired, then least recently used past the session and byte caps
+            self._db.execute("DELETE FROM sessions WHERE updated < ?", (now - self.ttl,))
+            evicted = self._db.execute(
+                "DELETE FROM sessions WHERE id IN (SELECT id FROM ("
+                "SELECT id, ROW_NUMBER() OVER (ORDER BY updated DESC) AS n, "
+                "SUM(size) OVER (ORDER BY updated DESC) AS total FROM sessions"
+                ") WHERE n > ? OR total > ?)", (self.max_sessions, self.max_bytes)
+            ).rowcount
+            self.evicted += max(evicted, 0)
+            self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            sessions, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM sessions").fetchone()
+        return {"sessions": sessions, "bytes": size, "evicted": self.evicted}
+
+
+def open_sessions(store=SESSION_STORE):
+    if store == "sqlite":
+        return SQLiteSessionStore()
+    return MemorySessionStore()
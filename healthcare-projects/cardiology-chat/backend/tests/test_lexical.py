@@ -0,0 +1,43 @@
+"""
+LexicalIndex shared between processes: the API's index must pick up what
+ingest.py wrote, including when the API writes (an /upload) before its next
+search.
+
+Usage (from the backend folder):
+    python -m pytest -q tests
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lexical import LexicalIndex
+
+
+def chunk(doc_id, text, source="kb"):
+    return {"id": doc_id, "text": text, "metadata": {"source": source, "text": text}}
+
+
+def ids(index, query):
+    return sorted(hit["id"] for hit in index.search(query, top_k=10))
+
+
+def test_search_sees_other_connection_writes(tmp_path):
+    api = LexicalIndex(str(tmp_path / "lexical.db"))
+    ingest = LexicalIndex(str(tmp_path / "lexical.db"))
+    api.add([chunk("a", "atrial fibrillation")])
+    ingest.add([chunk("b", "fibrillation treatment")])
+    assert ids(api, "fibrillation") == ["a", "b"]
+
+
+def test_own_write_does_not_hide_other_connection_writes(tmp_path):
+    api = LexicalIndex(str(tmp_path / "lexical.db"))
+    ingest = LexicalIndex(str(tmp_path / "lexical.db"))
+    api.search("warm up")
+    ingest.add([chunk("kb-1", "heart failure symptoms")])
+    # An /upload on the API side before its next search
+    api.add([chunk("upload-1", "heart failure report", source="upload.pdf")])
+    assert ids(api, "heart failure") == ["kb-1", "upload-1"]
+    ingest.remove(["kb-1"])
+    api.remove(["upload-1"])
+    assert ids(api, "heart failure") == []
@@ -0,0 +1,43 @@
+"""
+Token counting: importing prompt.py never loads the tiktoken encoding, and a
+failed load (not installed, or offline) falls back to characters / 4.
+
+Usage (from the backend folder):
+    python -m pytest -q tests
+"""
+import os
+import sys
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import prompt
+
+
+def offline_tiktoken():
+    module = types.ModuleType("tiktoken")
+
+    def get_encoding(name):
+        raise ConnectionError(f"could not download {name}")
+
+    module.get_encoding = get_encoding
+    return module
+
+
+def test_encoding_is_not_loaded_at_import(monkeypatch):
+    calls = []
+    module = types.ModuleType("tiktoken")
+    module.get_encoding = lambda name: calls.append(name)
+    monkeypatch.setitem(sys.modules, "tiktoken", module)
+    monkeypatch.delitem(sys.modules, "prompt")
+    import prompt as reloaded
+
+    assert calls == []
+    assert reloaded._encoding is None
+
+
+def test_failed_download_falls_back_to_characters(monkeypatch):
+    monkeypatch.setitem(sys.modules, "tiktoken", offline_tiktoken())
+    monkeypatch.setattr(prompt, "_encoding", None)
+    assert prompt.count_tokens("a" * 40) == 10
+    assert prompt._encoding is False
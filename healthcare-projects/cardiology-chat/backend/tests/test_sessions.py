@@ -0,0 +1,53 @@
+"""
+Session store expiry: a conversation idle past the TTL is gone for get()
+and starts over on the next add_turn(), in both stores.
+
+Usage (from the backend folder):
+    python -m pytest -q tests
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sessions
+from sessions import MemorySessionStore, SQLiteSessionStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteSessionStore(str(tmp_path / "sessions.db"), ttl=60)
+    return MemorySessionStore(ttl=60)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(sessions.time, "time", lambda: now[0])
+    return now
+
+
+def test_live_conversation_keeps_its_history(store, clock):
+    store.add_turn("c1", "What is angina?", "Chest pain from reduced blood flow.")
+    clock[0] += 30
+    store.add_turn("c1", "Is it dangerous?", "It can signal heart disease.")
+    assert [turn[0] for turn in store.get("c1").turns] == ["What is angina?", "Is it dangerous?"]
+
+
+def test_expired_conversation_is_hidden(store, clock):
+    store.add_turn("c1", "What is angina?", "Chest pain from reduced blood flow.")
+    clock[0] += 61
+    assert store.get("c1") is None
+
+
+def test_expired_conversation_starts_over(store, clock):
+    store.add_turn("c1", "What is angina?", "Chest pain from reduced blood flow.")
+    clock[0] += 61
+    # No get() in between: add_turn() itself must not extend the expired history
+    store.add_turn("c1", "What is a stent?", "A small mesh tube that holds an artery open.")
+    session = store.get("c1")
+    assert [turn[0] for turn in session.turns] == ["What is a stent?"]
+    assert "angina" not in session.summary
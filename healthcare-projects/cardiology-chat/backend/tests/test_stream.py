@@ -0,0 +1,88 @@
+"""
+/chat/stream against the stub backends (benchmarks/stubs.py): the events
+arrive as retrieval -> token... -> done and the tokens add up to the stub
+model's answer; an upstream failure, before or during generation, ends the
+stream with an "error" event instead.
+
+Usage (from the backend folder):
+    python -m pytest -q tests
+"""
+import json
+import os
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(1, os.path.join(BACKEND_DIR, "benchmarks"))
+
+import stubs
+
+stubs.install()
+
+from fastapi.testclient import TestClient
+
+import main
+
+QUESTION = "What are the symptoms of heart failure?"
+
+
+@pytest.fixture
+def client(monkeypatch):
+    for name in stubs.latency:
+        monkeypatch.setitem(stubs.latency, name, 0.0)
+    # A cached answer would come back as one token without calling the model
+    monkeypatch.setattr(main.embedding_cache, "max_entries", 0)
+    monkeypatch.setattr(main.semantic_cache, "max_entries", 0)
+    with TestClient(main.app) as client:
+        yield client
+
+
+def stream(client, question=QUESTION):
+    response = client.post("/chat/stream", json={"question": question})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = []
+    for block in response.text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_events_arrive_in_order(client):
+    events = stream(client)
+    names = [name for name, _ in events]
+    assert names[0] == "retrieval"
+    assert names[-1] == "done"
+    assert set(names[1:-1]) == {"token"}
+    assert len(names) > 3
+    assert "matches" in events[0][1]
+
+    text = "".join(data["text"] for name, data in events if name == "token")
+    expected = stubs.fake_answer(f"Question: {QUESTION}")
+    assert text.split() == expected
+
+
+def test_failed_generation_sends_error_event(client, monkeypatch):
+    async def unavailable(self, prompt, stream=False, **kwargs):
+        raise ConnectionError("model unavailable")
+
+    monkeypatch.setattr(stubs.FakeGenerativeModel, "generate_content_async", unavailable)
+    events = stream(client)
+    assert [name for name, _ in events] == ["retrieval", "error"]
+    error = events[-1][1]
+    assert error["upstream"] is True
+    assert "model unavailable" in error["detail"]
+    assert error["request_id"]
+
+
+def test_failure_mid_stream_sends_error_event(client, monkeypatch):
+    async def interrupted(self):
+        yield stubs.FakeChunk(self.words[0] + " ")
+        raise ConnectionError("stream reset")
+
+    monkeypatch.setattr(stubs.FakeStream, "_chunks", interrupted)
+    events = stream(client)
+    assert [name for name, _ in events] == ["retrieval", "token", "error"]
+    assert events[-1][1]["upstream"] is True
@@ -0,0 +1,78 @@
+"""
+LocalIndex shared between processes (ingest.py and the API): writes through
+one instance are visible to the other, and concurrent writers never hand out
+the same row.
+
+Usage (from the backend folder):
+    python -m pytest -q tests
+"""
+import multiprocessing
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vectorstore import LocalIndex
+
+DIMENSION = 8
+
+
+def vector(seed):
+    return np.random.default_rng(seed).normal(size=DIMENSION)
+
+
+def top_match(index, seed):
+    return index.query(vector(seed), top_k=1, include_metadata=True)["matches"][0]
+
+
+def test_reader_sees_other_instance_writes(tmp_path):
+    api = LocalIndex(str(tmp_path), DIMENSION)
+    ingest = LocalIndex(str(tmp_path), DIMENSION)
+    api.upsert([("a", vector(0), {"text": "A"})])
+    ingest.upsert([("b", vector(1), {"text": "B"})])
+    assert top_match(api, 1)["id"] == "b"
+    # "c" reuses the row "b" had
+    ingest.delete(["b"])
+    ingest.upsert([("c", vector(2), {"text": "C"})])
+    match = top_match(api, 2)
+    assert (match["id"], match["metadata"]) == ("c", {"text": "C"})
+
+
+def test_stale_writers_get_distinct_rows(tmp_path):
+    first = LocalIndex(str(tmp_path), DIMENSION)
+    second = LocalIndex(str(tmp_path), DIMENSION)
+    first.upsert([("a", vector(0), {}), ("b", vector(1), {})])
+    second.delete(["a"])
+    # Both instances last saw row 0 as free or taken differently; each write refreshes first
+    first.upsert([("c", vector(2), {})])
+    second.upsert([("d", vector(3), {})])
+    fresh = LocalIndex(str(tmp_path), DIMENSION)
+    assert len(fresh) == 3
+    for seed, vector_id in [(1, "b"), (2, "c"), (3, "d")]:
+        assert top_match(fresh, seed)["id"] == vector_id
+
+
+def _write(path, prefix, count):
+    index = LocalIndex(path, DIMENSION)
+    for i in range(count):
+        index.upsert([(f"{prefix}-{i}", vector(i + (1000 if prefix == "upload" else 0)), {"writer": prefix})])
+        if i % 3 == 2:
+            index.delete([f"{prefix}-{i - 1}"])
+
+
+def test_concurrent_processes_keep_every_id(tmp_path):
+    path = str(tmp_path)
+    LocalIndex(path, DIMENSION)
+    writers = [multiprocessing.get_context("spawn").Process(target=_write, args=(path, prefix, 30))
+               for prefix in ("ingest", "upload")]
+    for writer in writers:
+        writer.start()
+    for writer in writers:
+        writer.join()
+        assert writer.exitcode == 0
+    index = LocalIndex(path, DIMENSION)
+    expected = {f"{prefix}-{i}" for prefix in ("ingest", "upload") for i in range(30) if i % 3 != 1}
+    assert set(index._rows) == expected
+    assert len(set(index._rows.values())) == len(expected)
@@ -0,0 +1,486 @@
+"""
+Vector store backends.
+
+main.py and ingest.py only use the Pinecone index interface: upsert(vectors=...),
+query(vector=..., top_k=..., include_metadata=..., namespace=..., filter=...)
+and delete(ids=..., namespace=...). open_index() returns either the Pinecone
+index (VECTOR_STORE=pinecone, the default) or a LocalIndex with the same methods:
+
+- vectors are unit-normalized float32 rows of a memory-mapped file, so cosine
+  similarity is a dot product, and search is an exact, batched matrix product
+  with a top-k partial sort (block by block, to bound memory),
+- ids and metadata live in a small SQLite file next to it; when another
+  process (e.g. ingest.py while the API runs) commits to it, the next
+  search or write reloads the id/row maps and remaps the vector file,
+- with VECTOR_ANN=hnsw (needs the optional `hnswlib` package) an HNSW graph is
+  built once the index holds ANN_MIN_VECTORS vectors and kept in sync on
+  upsert/delete; below that exact search is both faster and exact,
+- with VECTOR_QUANTIZATION=int8 or pq (see quantize.py), past the same size
+  the scan runs over compact codes held in RAM instead of the float32 file,
+  and the best VECTOR_RERANK x top_k candidates are re-scored exactly,
+- each namespace (one per tenant or patient, see check_namespace()) is a
+  LocalIndex of its own under namespaces/<name>/, so a query scoped to one
+  patient's reports only ever scans that patient's vectors; the default
+  namespace "" is the top-level index,
+- a metadata `filter` (see filters.py) is applied before scoring: only the
+  matching rows are searched, exactly (or through the HNSW graph with a row
+  filter when many match), so a filtered query still returns top_k matches.
+
+The cardiology corpus fits in RAM many times over, so the local backend
+answers queries in microseconds instead of a network round-trip, and works
+offline.
+"""
+import json
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+from filters import matches as filter_matches, validate as validate_filter
+from quantize import make_quantizer
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+VECTOR_STORE = os.getenv("VECTOR_STORE", "pinecone")
+INDEX_NAME = "medical-chatbot-local"
+DIMENSION = 768  # Gemini text-embedding-004; MiniLM (EMBEDDING_BACKEND=local) is 384
+LOCAL_INDEX_PATH = os.getenv("LOCAL_INDEX_PATH", "local_index")
+VECTOR_ANN = os.getenv("VECTOR_ANN", "")
+ANN_MIN_VECTORS = int(os.getenv("ANN_MIN_VECTORS", "20000"))
+HNSW_EF = int(os.getenv("HNSW_EF", "64"))
+VECTOR_QUANTIZATION = os.getenv("VECTOR_QUANTIZATION", "")
+VECTOR_RERANK = int(os.getenv("VECTOR_RERANK", "10"))
+PQ_SUBSPACES = int(os.getenv("PQ_SUBSPACES", "96"))
+# Persistent HTTPS connections to Pinecone. urllib3 keeps 5 per CPU by default and
+# drops the rest, so concurrent chats kept redoing TLS handshakes.
+PINECONE_POOL_SIZE = int(os.getenv("PINECONE_POOL_SIZE", "16"))
+PINECONE_HOST = os.getenv("PINECONE_HOST")  # skips the describe_index lookup on startup
+QUANTIZER_TRAIN_SAMPLE = 50000
+SEARCH_BLOCK_ROWS = 65536
+CODE_BLOCK_ROWS = 8192
+FILTER_CACHE_SIZE = 256
+# Namespaces are folder names for the local index, so they are kept to a safe alphabet
+NAMESPACE_PATTERN = re.compile(r"[A-Za-z0-9_.-]{1,64}")
+
+
+class DimensionMismatch(ValueError):
+    pass
+
+
+def check_namespace(namespace):
+    """The namespace, or ValueError if it isn't 1-64 letters, digits, '_', '.' or '-' ("" is the default)."""
+    namespace = namespace or ""
+    if namespace and (not NAMESPACE_PATTERN.fullmatch(namespace) or namespace.strip(".") == ""):
+        raise ValueError(f"Invalid namespace {namespace!r}: use 1-64 letters, digits, '_', '.' or '-'")
+    return namespace
+
+
+def open_index(create=False, dimension=DIMENSION):
+    if VECTOR_STORE == "local":
+        try:
+            return LocalIndex(LOCAL_INDEX_PATH, dimension, ann=VECTOR_ANN, quantization=VECTOR_QUANTIZATION)
+        except DimensionMismatch:
+            if not create:
+                raise
+            print("Deleting old local index (wrong dimension)...")
+            shutil.rmtree(LOCAL_INDEX_PATH)
+            return LocalIndex(LOCAL_INDEX_PATH, dimension, ann=VECTOR_ANN, quantization=VECTOR_QUANTIZATION)
+    if VECTOR_STORE != "pinecone":
+        raise ValueError(f"Unknown VECTOR_STORE {VECTOR_STORE!r} (use 'pinecone' or 'local')")
+    return pinecone_index(create, dimension)
+
+
+def pinecone_index(create=False, dimension=DIMENSION):
+    from pinecone import Pinecone, ServerlessSpec
+
+    pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"), pool_threads=PINECONE_POOL_SIZE)
+    pool = {"pool_threads": PINECONE_POOL_SIZE, "connection_pool_maxsize": PINECONE_POOL_SIZE}
+    if PINECONE_HOST and not create:
+        return pc.Index(host=PINECONE_HOST, **pool)
+    if create:
+        # Check if index exists and delete it if dimensions are wrong (MiniLM is 384, Gemini 768)
+        if INDEX_NAME in pc.list_indexes().names():
+            print(f"Checking index '{INDEX_NAME}'...")
+            if pc.describe_index(INDEX_NAME).dimension != dimension:
+                print("Deleting old index (wrong dimension)...")
+                pc.delete_index(INDEX_NAME)
+                time.sleep(5)  # Wait for deletion
+
+        if INDEX_NAME not in pc.list_indexes().names():
+            print(f"Creating index '{INDEX_NAME}'...")
+            pc.create_index(
+                name=INDEX_NAME,
+                dimension=dimension,  # Embedding size of the EMBEDDING_BACKEND
+                metric="cosine",
+                spec=ServerlessSpec(cloud="aws", region="us-east-1"),
+            )
+            # Wait for index to be ready
+            while not pc.describe_index(INDEX_NAME).status['ready']:
+                time.sleep(1)
+    return pc.Index(INDEX_NAME, **pool)
+
+
+def _unit_rows(vectors):
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix[None, :]
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1.0, norms)
+
+
+def top_k_indices(scores, k):
+    """Row-wise indices of the k largest scores, best first."""
+    if k >= scores.shape[1]:
+        order = np.argsort(-scores, axis=1)
+    else:
+        part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        order = np.take_along_axis(part, np.argsort(-np.take_along_axis(scores, part, axis=1), axis=1), axis=1)
+    return order[:, :k]
+
+
+class LocalIndex:
+    def __init__(self, path=LOCAL_INDEX_PATH, dimension=DIMENSION, ann="", ann_min_vectors=ANN_MIN_VECTORS,
+                 quantization="", rerank=VECTOR_RERANK):
+        if ann and ann != "hnsw":
+            raise ValueError(f"Unknown VECTOR_ANN {ann!r} (use 'hnsw' or leave it empty)")
+        if ann and hnswlib is None:
+            raise ImportError("VECTOR_ANN=hnsw needs the hnswlib package (pip install hnswlib)")
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.dimension = dimension
+        self.ann = ann
+        self.ann_min_vectors = ann_min_vectors
+        self.rerank = rerank
+        self._options = {"ann": ann, "ann_min_vectors": ann_min_vectors, "quantization": quantization, "rerank": rerank}
+        self._namespaces = {}    # name -> LocalIndex, opened on first use
+        self._filter_rows = {}   # filter (as JSON) -> matching rows, cleared on every write
+        # Trained (and every vector encoded) on the first search that needs it
+        self._quantizer = make_quantizer(quantization, dimension, PQ_SUBSPACES) if quantization else None
+        self._codes = None
+        self._lock = threading.RLock()
+        self._vectors_path = os.path.join(path, "vectors.f32")
+        open(self._vectors_path, "ab").close()
+        self._db = sqlite3.connect(os.path.join(path, "metadata.db"), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS vectors (id TEXT PRIMARY KEY, row INTEGER UNIQUE NOT NULL, metadata TEXT)"
+        )
+        self._db.execute("CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value TEXT)")
+        stored = self._db.execute("SELECT value FROM info WHERE key = 'dimension'").fetchone()
+        if stored is None:
+            # Indexes from before the dimension was recorded hold Gemini vectors
+            has_vectors = self._db.execute("SELECT 1 FROM vectors LIMIT 1").fetchone()
+            stored = (DIMENSION if has_vectors else dimension,)
+            self._db.execute("INSERT INTO info VALUES ('dimension', ?)", (str(stored[0]),))
+        self._db.commit()
+        if int(stored[0]) != dimension:
+            self._db.close()
+            raise DimensionMismatch(
+                f"{path} holds {stored[0]}-dimensional vectors but the embeddings are {dimension}-dimensional; "
+                "run ingest.py to rebuild it, or point LOCAL_INDEX_PATH at another folder"
+            )
+
+        self._capacity = 0
+        self._matrix = np.zeros((0, dimension), dtype=np.float32)
+        self._load()
+
+    def _load(self):
+        # Read before the rows, so a commit that lands in between triggers another reload
+        self._version = self._data_version()
+        self._rows = {}      # id -> row
+        self._ids = {}       # row -> id
+        self._metadata = {}  # row -> metadata
+        for vector_id, row, metadata in self._db.execute("SELECT id, row, metadata FROM vectors"):
+            self._rows[vector_id] = row
+            self._ids[row] = vector_id
+            self._metadata[row] = json.loads(metadata)
+        self._size = max(self._ids, default=-1) + 1
+        self._free = [row for row in range(self._size) if row not in self._ids]
+        # Another process may have grown the file; its vectors are visible through the shared mapping
+        self._map(os.path.getsize(self._vectors_path) // (4 * self.dimension))
+        self._alive = np.zeros(self._capacity, dtype=bool)
+        self._alive[list(self._ids)] = True
+        # Rebuilt from the current rows on the next search that needs them
+        self._hnsw = None
+        self._codes = None
+        self._filter_rows.clear()
+
+    def _data_version(self):
+        # Changes whenever another connection (e.g. ingest.py) commits to metadata.db
+        return self._db.execute("PRAGMA data_version").fetchone()[0]
+
+    def _refresh(self):
+        if self._data_version() != self._version:
+            self._load()
+
+    @contextmanager
+    def _write(self):
+        # Holds SQLite's write lock from the refresh through the commit, so two processes
+        # (ingest.py and an /upload) can't both hand out the same free row.
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            self._refresh()
+            yield
+            self._db.commit()
+        except BaseException:
+            self._db.rollback()
+            # The maps may already hold this write's rows
+            self._load()
+            raise
+
+    def __len__(self):
+        with self._lock:
+            self._refresh()
+            return len(self._rows)
+
+    @property
+    def bytes_per_vector(self):
+        # What a search keeps in RAM per vector.
+        return self._quantizer.bytes_per_vector if self._quantizer else 4 * self.dimension
+
+    def _map(self, capacity):
+        self._capacity = capacity
+        if capacity:
+            self._matrix = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self.dimension))
+
+    def _grow(self, rows):
+        if rows <= self._capacity:
+            return
+        capacity = max(rows, 2 * self._capacity, 1024)
+        if self._capacity:
+            self._matrix.flush()
+        with open(self._vectors_path, "r+b") as f:
+            f.truncate(capacity * self.dimension * 4)
+        self._map(capacity)
+        self._alive = np.concatenate([self._alive, np.zeros(capacity - len(self._alive), dtype=bool)])
+        if self._hnsw is not None:
+            self._hnsw.resize_index(capacity)
+        if self._codes is not None:
+            self._codes = np.concatenate([self._codes, np.zeros((capacity - len(self._codes), self._codes.shape[1]), np.uint8)])
+
+    def namespace(self, name):
+        """The LocalIndex holding namespace `name` ("" is this one)."""
+        name = check_namespace(name)
+        if not name:
+            return self
+        with self._lock:
+            child = self._namespaces.get(name)
+            if child is None:
+                child = LocalIndex(os.path.join(self.path, "namespaces", name), self.dimension, **self._options)
+                self._namespaces[name] = child
+            return child
+
+    def namespaces(self):
+        folder = os.path.join(self.path, "namespaces")
+        return sorted(os.listdir(folder)) if os.path.isdir(folder) else []
+
+    def upsert(self, vectors, namespace="", **kwargs):
+        if namespace:
+            return self.namespace(namespace).upsert(vectors)
+        ids, values, metadata = [], [], []
+        for item in vectors:
+            if isinstance(item, dict):
+                item = (item["id"], item["values"], item.get("metadata", {}))
+            ids.append(item[0])
+            values.append(item[1])
+            metadata.append(item[2] if len(item) > 2 else {})
+        if not ids:
+            return {"upserted_count": 0}
+        matrix = _unit_rows(values)
+        if matrix.shape[1] != self.dimension:
+            raise ValueError(f"Vector dimension {matrix.shape[1]} does not match index dimension {self.dimension}")
+
+        with self._lock, self._write():
+            self._filter_rows.clear()
+            rows = []
+            inserted, updated = {}, {}  # id -> (row, metadata); the last one wins for repeated ids
+            for vector_id, meta in zip(ids, metadata):
+                row = self._rows.get(vector_id)
+                if row is None:
+                    row = self._free.pop() if self._free else self._size
+                    self._size = max(self._size, row + 1)
+                    self._rows[vector_id] = row
+                    self._ids[row] = vector_id
+                    inserted[vector_id] = (row, meta)
+                elif vector_id in inserted:
+                    inserted[vector_id] = (row, meta)
+                else:
+                    updated[vector_id] = (row, meta)
+                rows.append(row)
+            self._grow(self._size)
+            self._matrix[rows] = matrix
+            self._matrix.flush()
+            self._alive[rows] = True
+            for row, meta in zip(rows, metadata):
+                self._metadata[row] = meta
+            # A plain INSERT: a row another writer already took fails loudly instead of
+            # INSERT OR REPLACE silently deleting that writer's id.
+            self._db.executemany("INSERT INTO vectors VALUES (?, ?, ?)",
+                                 [(vector_id, row, json.dumps(meta)) for vector_id, (row, meta) in inserted.items()])
+            self._db.executemany("UPDATE vectors SET metadata = ? WHERE id = ?",
+                                 [(json.dumps(meta), vector_id) for vector_id, (row, meta) in updated.items()])
+            if self._hnsw is not None:
+                self._hnsw.add_items(matrix, rows)
+            if self._codes is not None:
+                self._codes[rows] = self._quantizer.encode(matrix)
+        return {"upserted_count": len(ids)}
+
+    def delete(self, ids=None, delete_all=False, namespace="", **kwargs):
+        if namespace:
+            return self.namespace(namespace).delete(ids, delete_all)
+        with self._lock, self._write():
+            self._filter_rows.clear()
+            if delete_all:
+                ids = list(self._rows)
+            rows = [self._rows.pop(vector_id) for vector_id in ids or [] if vector_id in self._rows]
+            for row in rows:
+                del self._ids[row]
+                del self._metadata[row]
+                self._free.append(row)
+                if self._hnsw is not None:
+                    self._hnsw.mark_deleted(row)
+            self._alive[rows] = False
+            self._db.executemany("DELETE FROM vectors WHERE row = ?", [(row,) for row in rows])
+        return {}
+
+    def search(self, queries, top_k=3, filter=None):
+        """
+        Top-k rows for a batch of query vectors: (scores, rows), both shaped
+        (queries, k), best first, with k capped at the number of vectors
+        (that match `filter`, if given).
+        """
+        queries = _unit_rows(queries)
+        with self._lock:
+            self._refresh()
+            if filter:
+                return self._search_filtered(queries, top_k, filter)
+            k = min(top_k, len(self._rows))
+            if k == 0:
+                return np.zeros((len(queries), 0), np.float32), np.zeros((len(queries), 0), np.int64)
+            if self.ann and len(self._rows) >= self.ann_min_vectors:
+                return self._search_hnsw(queries, k)
+            if self._quantizer and len(self._rows) >= self.ann_min_vectors:
+                return self._search_quantized(queries, k)
+            return self._search_exact(queries, k)
+
+    def _matching_rows(self, filter):
+        key = json.dumps(filter, sort_keys=True)
+        rows = self._filter_rows.get(key)
+        if rows is None:
+            validate_filter(filter)
+            rows = np.fromiter((row for row, meta in self._metadata.items() if filter_matches(meta, filter)),
+                               dtype=np.int64)
+            rows.sort()
+            if len(self._filter_rows) >= FILTER_CACHE_SIZE:
+                self._filter_rows.clear()
+            self._filter_rows[key] = rows
+        return rows
+
+    def _search_filtered(self, queries, top_k, filter):
+        rows = self._matching_rows(filter)
+        k = min(top_k, len(rows))
+        if k == 0:
+            return np.zeros((len(queries), 0), np.float32), np.zeros((len(queries), 0), np.int64)
+        if self.ann and len(rows) >= self.ann_min_vectors:
+            allowed = set(rows.tolist())
+            return self._search_hnsw(queries, k, allowed.__contains__)
+        # Exact scores over the matching rows only, block by block
+        best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+        best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+        for start in range(0, len(rows), SEARCH_BLOCK_ROWS):
+            block = rows[start:start + SEARCH_BLOCK_ROWS]
+            scores = np.concatenate([best_scores, queries @ self._matrix[block].T], axis=1)
+            candidates = np.concatenate([best_rows, np.broadcast_to(block, (len(queries), len(block)))], axis=1)
+            keep = top_k_indices(scores, k)
+            best_scores = np.take_along_axis(scores, keep, axis=1)
+            best_rows = np.take_along_axis(candidates, keep, axis=1)
+        return best_scores, best_rows
+
+    def _search_exact(self, queries, k):
+        return self._scan(queries, k, lambda start, stop: queries @ self._matrix[start:stop].T, SEARCH_BLOCK_ROWS)
+
+    def _search_quantized(self, queries, k):
+        if self._codes is None:
+            rows = np.flatnonzero(self._alive)
+            sample = np.random.default_rng(0).choice(rows, min(len(rows), QUANTIZER_TRAIN_SAMPLE), replace=False)
+            self._quantizer.train(np.asarray(self._matrix[np.sort(sample)]))
+            self._codes = np.zeros((self._capacity, self._quantizer.bytes_per_vector), dtype=np.uint8)
+            for start in range(0, self._size, SEARCH_BLOCK_ROWS):
+                stop = min(start + SEARCH_BLOCK_ROWS, self._size)
+                self._codes[start:stop] = self._quantizer.encode(np.asarray(self._matrix[start:stop]))
+
+        candidates = min(len(self._rows), k * max(1, self.rerank))
+        scores, rows = self._scan(
+            queries, candidates, lambda start, stop: self._quantizer.scores(queries, self._codes[start:stop]), CODE_BLOCK_ROWS
+        )
+        if not self.rerank:
+            return scores, rows
+        # Re-rank the candidates with the float32 vectors; only these rows are read from disk.
+        exact = np.stack([self._matrix[np.sort(r)] @ q for q, r in zip(queries, rows)])
+        rows = np.sort(rows, axis=1)
+        keep = top_k_indices(exact, k)
+        return np.take_along_axis(exact, keep, axis=1), np.take_along_axis(rows, keep, axis=1)
+
+    def _scan(self, queries, k, score_block, block_rows):
+        # Score the rows block by block and keep a running top-k per query.
+        best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+        best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+        for start in range(0, self._size, block_rows):
+            stop = min(start + block_rows, self._size)
+            scores = score_block(start, stop)
+            scores[:, ~self._alive[start:stop]] = -np.inf
+            # Merge this block's candidates with the best so far.
+            scores = np.concatenate([best_scores, scores], axis=1)
+            rows = np.concatenate([best_rows, np.broadcast_to(np.arange(start, stop), (len(queries), stop - start))], axis=1)
+            keep = top_k_indices(scores, min(k, scores.shape[1]))
+            best_scores = np.take_along_axis(scores, keep, axis=1)
+            best_rows = np.take_along_axis(rows, keep, axis=1)
+        return best_scores, best_rows
+
+    def _search_hnsw(self, queries, k, row_filter=None):
+        if self._hnsw is None:
+            self._hnsw = hnswlib.Index(space="ip", dim=self.dimension)
+            self._hnsw.init_index(max_elements=self._capacity, ef_construction=200, M=16)
+            rows = np.flatnonzero(self._alive)
+            self._hnsw.add_items(self._matrix[rows], rows)
+        self._hnsw.set_ef(max(HNSW_EF, k))
+        if row_filter is None:
+            rows, distances = self._hnsw.knn_query(queries, k=k)
+        else:
+            # A Python filter is called with the GIL held, so one thread
+            rows, distances = self._hnsw.knn_query(queries, k=k, num_threads=1, filter=row_filter)
+        # "ip" distance is 1 - dot product, and the vectors are unit length.
+        return 1.0 - distances, rows.astype(np.int64)
+
+    def query(self, vector, top_k=3, include_metadata=False, include_values=False, namespace="", filter=None,
+              **kwargs):
+        if namespace:
+            return self.namespace(namespace).query(vector, top_k, include_metadata, include_values, filter=filter)
+        matches = []
+        # One lock for both, so a reload can't remap the rows between search and lookup
+        with self._lock:
+            scores, rows = self.search([vector], top_k, filter)
+            for score, row in zip(scores[0], rows[0]):
+                if row not in self._ids:
+                    continue
+                match = {"id": self._ids[row], "score": float(score)}
+                if include_metadata:
+                    match["metadata"] = self._metadata[row]
+                if include_values:
+                    match["values"] = self._matrix[row].tolist()
+                matches.append(match)
+        return {"matches": matches}
+
+    def describe_index_stats(self, **kwargs):
+        namespaces = {"": {"vector_count": len(self)}}
+        for name in self.namespaces():
+            namespaces[name] = {"vector_count": len(self.namespace(name))}
+        return {"dimension": self.dimension, "namespaces": namespaces,
+                "total_vector_count": sum(n["vector_count"] for n in namespaces.values())}
@@ -7,6 +7,8 @@ export default function Home() {
   const [input, setInput] = useState('');
   const [isLoading, setIsLoading] = useState(false);
   const messagesEndRef = useRef<null | HTMLDivElement>(null);
+  // Identifies this chat to the backend, which keeps the recent turns for follow-up questions
+  const conversationId = useRef('');
 
   // Use environment variable for API URL, fallback to localhost for development
   const API_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000';
@@ -38,7 +40,16 @@ export default function Home() {
 
       if (!response.ok) throw new Error("Upload failed");
 
-      const data = await response.json();
+      // The backend indexes the file in the background; poll the job until it finishes
+      let data = await response.json();
+      while (data.job_id && (data.status === "queued" || data.status === "running")) {
+        await new Promise(resolve => setTimeout(resolve, 1000));
+        const jobResponse = await fetch(`${API_URL}/jobs/${data.job_id}`);
+        if (!jobResponse.ok) throw new Error("Upload failed");
+        data = { ...(await jobResponse.json()), job_id: data.job_id };
+      }
+      if (data.status === "failed") throw new Error(data.error || "Upload failed");
+
       setMessages(prev => [...prev, {
         role: "assistant",
         content: `✅ **Analysis Complete:** I have read *${file.name}*. You can now ask me questions about this report.`
@@ -65,11 +76,13 @@ export default function Home() {
     setInput('');
     setIsLoading(true);
 
+    if (!conversationId.current) conversationId.current = crypto.randomUUID();
+
     try {
       const response = await fetch(`${API_URL}/chat`, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ question: input }),
+        body: JSON.stringify({ question: input, conversation_id: conversationId.current }),
       });
 
       const data = await response.json();
@@ -110,7 +123,7 @@ export default function Home() {
                 <strong className="text-gray-100">1. AI Processing:</strong> Your messages are processed by Google Gemini AI. This is a cloud-based service.
               </p>
               <p>
-                <strong className="text-gray-100">2. No Storage:</strong> We do not save your chat history after you close this window.
+                <strong className="text-gray-100">2. Limited Storage:</strong> We do not keep your chat history long-term. Recent messages are stored on our server (in memory or in a server-side database, depending on how it is deployed) so follow-up questions have context, and are discarded after an hour without new messages.
               </p>
               <p>
                 <strong className="text-gray-100">3. Do Not Share:</strong> Please do <span className="text-red-400 font-bold">NOT</span> share real names, addresses, or private medical records.